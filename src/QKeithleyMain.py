@@ -85,14 +85,14 @@ class QKeithleyMain(QMainWindow):
 
 		if q.text() == "Hardware Config" and self.ui_stack.currentIndex() != 0: 
 
-			if len( threading.enumerate() ) > 1:
+			if self.measurement_running():
 				self.thread_running_msg()
 			else:
 				self.ui_stack.setCurrentIndex(0)
 
 		if q.text() == "IV-Bias Control" and self.ui_stack.currentIndex() != 1: 		
 		
-			if len( threading.enumerate() ) > 1:
+			if self.measurement_running():
 				self.thread_running_msg()
 			else:		
 				self.ui_bias.refresh()
@@ -100,7 +100,7 @@ class QKeithleyMain(QMainWindow):
 
 		if q.text() == "IV-Sweep Control" and self.ui_stack.currentIndex() != 2:
 
-			if len( threading.enumerate() ) > 1:
+			if self.measurement_running():
 				self.thread_running_msg()
 			else:					
 				self.ui_sweep.refresh()
@@ -108,7 +108,7 @@ class QKeithleyMain(QMainWindow):
 
 		if q.text() == "PV-Tracking" and self.ui_stack.currentIndex() != 3:
 
-			if len( threading.enumerate() ) > 1:
+			if self.measurement_running():
 				self.thread_running_msg()
 			else: 	
 				self.ui_solar.refresh()
@@ -116,7 +116,7 @@ class QKeithleyMain(QMainWindow):
 
 		if q.text() == "Exit":
 
-			if len( threading.enumerate() ) > 1:
+			if self.measurement_running():
 				self.thread_running_msg()
 
 			# Otherwise enter the close dialog
@@ -124,6 +124,11 @@ class QKeithleyMain(QMainWindow):
 				self.ui_config.close_devices()
 				self.app.exit()	
 
+	# Check for measurement threads. Insturment server threads run for the 
+	# lifetime of the server and are not counted.
+	def measurement_running(self):
+		return len( [ _ for _ in threading.enumerate() if not _.name.startswith("QKeithleyBroker") ] ) > 1
+
 	# Message box for thread running
 	def thread_running_msg(self):
 
@@ -157,7 +162,7 @@ class QKeithleyMain(QMainWindow):
 
 		# Check to see if there are any threads running 
 		# other than main thread
-		if len( threading.enumerate() ) > 1:
+		if self.measurement_running():
 
 			# Dialogue to check quit
 			msg = QMessageBox()
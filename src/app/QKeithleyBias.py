@@ -33,6 +33,9 @@ from PyQtVisa import QVisaApplication
 # Import QKeithleyWidget
 from src.widgets.QKeithleyBiasWidget import QKeithleyBiasWidget
 
+# Import QKeithleyRender
+from src.utils.QKeithleyRender import QKeithleyRender
+
 # Import QT backends
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QStackedWidget, QLabel
 from PyQt5.QtGui import QIcon
@@ -46,6 +49,9 @@ class QKeithleyBias(QVisaApplication.QVisaApplication):
 		# Inherits QVisaApplication -> QWidget
 		super(QKeithleyBias, self).__init__(_config)
 
+		# Render queue (measurement threads -> GUI thread)
+		self.render = QKeithleyRender(self)
+
 		# Generate Main Layout
 		self.gen_main_layout()
 
@@ -110,6 +116,9 @@ class QKeithleyBias(QVisaApplication.QVisaApplication):
 		# Create Icon for QMessageBox
 		self._set_icon( QIcon(os.path.join(os.path.dirname(os.path.realpath(__file__)), "python.ico")))
 
+		# Reading elements consumed by the application
+		self._set_app_metadata("__elements__", ["VOLT", "CURR"])
+
 		# Dictionary to hold QKeithleyBiasWidgets
 		self.bias_widgets = {}
 		
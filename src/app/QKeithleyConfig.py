@@ -25,24 +25,42 @@
 #
 
 #!/usr/bin/env python 
+import re
 import time
 import pyvisa
 import numpy as np
+import concurrent.futures
 
 # Import device drivers
-from PyQtVisa.drivers import keithley2400
+from src.drivers import keithley2400
+from src.drivers import keithley2400sim
+from src.drivers import keithley2400replay
+from src.drivers import devicemodels
 
 # Import QVisaConfigure
 from PyQtVisa import QVisaConfigure
 
 # Import QKeithleyWidget
 from src.widgets.QKeithleyConfigWidget import QKeithleyConfigWidget
+from src.widgets.QKeithleyTraceWidget import QKeithleyTraceWidget
+
+# Import QKeithleyTrace
+from src.utils.QKeithleyTrace import QKeithleyTrace
+
+# Import QKeithleyProfiles
+from src.utils.QKeithleyProfiles import QKeithleyProfiles
+
+# Import QKeithleyBroker
+from src.utils.QKeithleyBroker import QKeithleyBroker
+
+# Import QKeithleyRecorder
+from src.utils.QKeithleyRecorder import QKeithleyRecorder
 
 # Import QT backends
 import os
 import sys
-from PyQt5.QtWidgets import QWidget, QMessageBox, QVBoxLayout, QHBoxLayout, QComboBox, QSpinBox, QPushButton, QLabel, QStackedWidget, QDoubleSpinBox
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtWidgets import QWidget, QMessageBox, QVBoxLayout, QHBoxLayout, QComboBox, QSpinBox, QPushButton, QLabel, QStackedWidget, QDoubleSpinBox, QCheckBox, QLineEdit, QFileDialog
+from PyQt5.QtCore import Qt, QSize, pyqtSignal
 from PyQt5.QtGui import QIcon
 
 # Configuration application to initalize and manage multiple Keithley insturments 
@@ -50,11 +68,28 @@ from PyQt5.QtGui import QIcon
 # built-ins
 class QKeithleyConfig(QVisaConfigure.QVisaConfigure):
 
+	# Signals from address scan workers (delivered in GUI thread)
+	scan_found = pyqtSignal(object)
+	scan_done  = pyqtSignal()
+
 	def __init__(self):
 
 		# Inherits QVisaConfigure -> QWidget
 		super(QKeithleyConfig, self).__init__()	
 
+		# Insturment traffic tracing (opt-in)
+		self._trace = QKeithleyTrace()
+		self._trace_widget = None
+
+		# Record and replay of insturment traffic (opt-in)
+		self._recorder = QKeithleyRecorder()
+
+		# Throughput profiles (shared by all device pages)
+		self._profiles = QKeithleyProfiles()
+
+		# Insturment server (opt-in)
+		self._broker = None
+
 		# Create Icon for QMessageBox
 		self.gen_main_layout()
 
@@ -72,11 +107,31 @@ class QKeithleyConfig(QVisaConfigure.QVisaConfigure):
 		self._device_widget.set_init_callback("init_keithley")
 		self._device_widget.set_select_callback("update_device_pages")
 
+		# Address scan widget
+		self._scan_widget = self._gen_scan_control()
+
+		# Simulated insturment initialization widget
+		self._sim_widget = self._gen_sim_control()
+
+		# Trace control widget
+		self._trace_ctrl = self._gen_trace_control()
+
+		# Record and replay widget
+		self._record_ctrl = self._gen_record_control()
+
+		# Insturment server widget
+		self._server_ctrl = self._gen_server_control()
+
 		# QStackedWidget for insturment configurations
 		self.device_pages = QStackedWidget()
 
 		# Add comm widget and inst pages
 		self._layout.addWidget(self._device_widget)
+		self._layout.addWidget(self._scan_widget)
+		self._layout.addWidget(self._sim_widget)
+		self._layout.addWidget(self._trace_ctrl)
+		self._layout.addWidget(self._record_ctrl)
+		self._layout.addWidget(self._server_ctrl)
 		self._layout.addStretch(1)
 		self._layout.addWidget(self.device_pages)
 
@@ -93,8 +148,549 @@ class QKeithleyConfig(QVisaConfigure.QVisaConfigure):
 
 		# Build configuration widget for Keithley
 		if Device is not None:
-			self.device_pages.addWidget( QKeithleyConfigWidget( self, Device.get_property("name") ) )
+			self._build_keithley(Device)
+
+
+	# Add an initialized Keithley to the configuration and build its page
+	def add_keithley(self, Device):
+
+		self.add_device(Device)
+		self._device_widget.refresh()
+		self._build_keithley(Device)
+
+
+	# Attach recorder and tracing to a Keithley in the configuration and build
+	# its page. Shared by all initialization paths (manual, scan, sim, replay)
+	def _build_keithley(self, Device):
+
+		self._recorder.attach(Device)
+		self._trace.attach(Device)
+		self.device_pages.addWidget( QKeithleyConfigWidget( self, Device.get_property("name") ) )
+		self.update_device_pages()
+
+
+	#####################################
+	#  ADDRESS SCAN
+	#
+
+	# Scan control. Probes a list of addresses concurrently and initializes
+	# every responding Keithley 2400.
+	def _gen_scan_control(self):
+
+		self.scan_label = QLabel("<b>Scan Addresses</b>")
+		self.scan_note  = QLabel("<i>e.g. GPIB0::1-30, ASRL3 (empty scans all)</i>")
+		self.scan_addr  = QLineEdit("GPIB0::1-30")
+
+		self.scan_button = QPushButton("Scan and Initialize")
+		self.scan_button.clicked.connect(self.exec_scan)
+
+		self.scan_status = QLabel("")
+
+		# Scan workers report back to GUI thread via signals 
+		self.scan_found.connect(self.exec_scan_found)
+		self.scan_done.connect(self.exec_scan_done)
+
+		# Probe timeout (ms) and worker pool size
+		self._scan_timeout = 500
+		self._scan_workers = 8
+
+		return self._gen_vbox_widget([
+			self.scan_label, 
+			self.scan_note, 
+			self.scan_addr, 
+			self._gen_hbox_widget([self.scan_button, self.scan_status])
+		])
+
+	# Expand address specification into resource strings. Accepts comma 
+	# separated GPIB ranges ("GPIB0::1-30", "5-10" on board 0), serial ports 
+	# ("ASRL3") and full resource strings. An empty specification selects 
+	# all GPIB and serial resources known to VISA.
+	def get_scan_resources(self, _spec):
+
+		if _spec.strip() == "":
+			return [ _ for _ in pyvisa.ResourceManager().list_resources() if re.match(r'(GPIB|ASRL)', _) ]
+
+		_resources = []
+		for _token in [ _.strip().upper() for _ in _spec.split(",") if _.strip() != "" ]:
+
+			# GPIB address or address range
+			m = re.match(r'^(?:GPIB(\d+)::)?(\d+)(?:-(\d+))?(?:::INSTR)?$', _token)
+			if m:
+				_board = m[1] if m[1] is not None else "0"
+				_stop = int(m[3]) if m[3] is not None else int(m[2])
+				_resources += [ "GPIB%s::%d::INSTR"%(_board, _) for _ in range(int(m[2]), _stop + 1) ]
+				continue
+
+			# Serial port
+			m = re.match(r'^ASRL(\d+)(?:::INSTR)?$', _token)
+			if m:
+				_resources.append( "ASRL%s::INSTR"%m[1] )
+				continue
+
+			_resources.append(_token)
+
+		return _resources
+
+	# Probe a single address (worker thread). Returns an initialized driver 
+	# if a Keithley 2400 responds, otherwise None. 
+	def probe_keithley(self, _resource):
+
+		Device = None
+
+		try:
+
+			Device = keithley2400.keithley2400(_resource)
+
+			# Resource not present
+			if Device.get_property("inst") is None:
+				return None
+
+			# Short timeout for identification
+			_timeout = Device.get_property("inst").timeout
+			Device.get_property("inst").timeout = self._scan_timeout
+
+			if not Device.check_idn():
+				Device.close()
+				return None
+
+			Device.get_property("inst").timeout = _timeout
+			Device.rst()
+			return Device
+
+		except ( pyvisa.VisaIOError, UnicodeDecodeError, ValueError, OSError ):
+
+			# Close the session of a device which did not identify
+			if ( Device is not None ) and ( Device.get_property("inst") is not None ):
+
+				try:
+					Device.close()
+
+				except ( pyvisa.VisaIOError, OSError ):
+					pass
+
+			return None
+
+	# Start address scan. Probes run in a worker pool so that the GUI thread 
+	# never waits on a timeout.
+	def exec_scan(self):
+
+		# Skip addresses which are already initialized
+		_resources = [ _ for _ in self.get_scan_resources( self.scan_addr.text() ) if self.get_device(_) is None ]
+
+		self.scan_button.setEnabled(False)
+		self.scan_status.setText("Scanning %d ..."%len(_resources))
+		self._scan_found = []
+
+		# Pool is shut down without waiting. Workers signal results as they 
+		# complete and a final signal once all probes have returned.
+		self._scan_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self._scan_workers)
+		_futures = [ self._scan_pool.submit(self.probe_keithley, _) for _ in _resources ]
+		self._scan_pool.submit(self._scan_wait, _futures)
+		self._scan_pool.shutdown(wait=False)
+
+	def _scan_wait(self, _futures):
+
+		for _future in concurrent.futures.as_completed(_futures):
+			if _future.result() is not None:
+				self.scan_found.emit(_future.result())
+
+		self.scan_done.emit()
+
+	# Register device found by scan (GUI thread)
+	def exec_scan_found(self, Device):
+
+		if self.get_device( Device.get_property("resource") ) is None:
+			self.add_keithley(Device)
+			self._scan_found.append( Device.get_property("name") )
+			self.scan_status.setText("Found %d"%len(self._scan_found))
+
+	# Scan complete (GUI thread)
+	def exec_scan_done(self):
+
+		self.scan_button.setEnabled(True)
+		self.scan_status.setText("Found %d"%len(self._scan_found))
+
+		# Message box to display results
+		msg = QMessageBox()
+		msg.setIcon(QMessageBox.Information)
+		msg.setText("Initialized devices:\n%s"%"\n".join(self._scan_found) if self._scan_found != [] else "No devices found")
+		msg.setWindowTitle("pyVISA Connection")
+		msg.setWindowIcon(self._icon)
+		msg.setStandardButtons(QMessageBox.Ok)
+		msg.exec_()
+
+
+	#####################################
+	#  SIMULATED DEVICES
+	#
+
+	# Simulated device control. Simulated Keithleys are initialized on a 
+	# "SIM::<addr>::INSTR" resource and are connected to a device model.
+	def _gen_sim_control(self):
+
+		# Device models shared between simulated insturments
+		self._sim_models = {}
+
+		self.sim_label = QLabel("<b>Simulated Device</b>")
+
+		# Device model and terminal
+		self.sim_model_label = QLabel("<b>Model</b>")
+		self.sim_model = QComboBox()
+		self.sim_model.addItems(list(devicemodels.models.keys()))
+		self.sim_model.currentTextChanged.connect(self.update_sim_model)
+
+		self.sim_terminal_label = QLabel("<b>Terminal</b>")
+		self.sim_terminal = QComboBox()
+
+		# Address, bus latency and line frequency 
+		self.sim_addr_label = QLabel("<b>Address</b>")
+		self.sim_addr = QSpinBox()
+		self.sim_addr.setMinimum(0)
+		self.sim_addr.setMaximum(30)
+		self.sim_addr.setValue(1)
+
+		self.sim_latency_label = QLabel("<b>Latency (ms)</b>")
+		self.sim_latency = QDoubleSpinBox()
+		self.sim_latency.setDecimals(2)
+		self.sim_latency.setMinimum(0.0)
+		self.sim_latency.setMaximum(100.0)
+		self.sim_latency.setSingleStep(0.1)
+		self.sim_latency.setValue(1.0)
+
+		self.sim_freq_label = QLabel("<b>Line (Hz)</b>")
+		self.sim_freq = QComboBox()
+		self.sim_freq.addItems(["50", "60"])
+
+		# Irradiance (solar cell model)
+		self.sim_irradiance_label = QLabel("<b>Irradiance (suns)</b>")
+		self.sim_irradiance = QDoubleSpinBox()
+		self.sim_irradiance.setDecimals(2)
+		self.sim_irradiance.setMinimum(0.0)
+		self.sim_irradiance.setMaximum(10.0)
+		self.sim_irradiance.setSingleStep(0.1)
+		self.sim_irradiance.setValue(1.0)
+
+		# Initialize button
+		self.sim_button = QPushButton("Initialize Simulated Device")
+		self.sim_button.clicked.connect(self.init_keithley_sim)
+
+		# Populate terminals
+		self.update_sim_model()
+
+		return self._gen_vbox_widget([
+			self.sim_label,
+			self._gen_hbox_widget([
+				self._gen_vbox_widget([self.sim_model_label, self.sim_model]),
+				self._gen_vbox_widget([self.sim_terminal_label, self.sim_terminal])
+			]),
+			self._gen_hbox_widget([
+				self._gen_vbox_widget([self.sim_addr_label, self.sim_addr]),
+				self._gen_vbox_widget([self.sim_latency_label, self.sim_latency]),
+				self._gen_vbox_widget([self.sim_freq_label, self.sim_freq])
+			]),
+			self._gen_vbox_widget([self.sim_irradiance_label, self.sim_irradiance]),
+			self.sim_button
+		])
+
+	# Update terminal selector for device model
+	def update_sim_model(self):
+
+		_model = devicemodels.models[ self.sim_model.currentText() ]
+
+		self.sim_terminal.clear()
+		self.sim_terminal.addItems(_model.terminals)
+		self.sim_terminal.setEnabled( len(_model.terminals) > 1 )
+		self.sim_irradiance.setEnabled( _model is devicemodels.solar_cell )
+
+	# Device model for a simulated insturment. Multi-terminal models are shared
+	# so that each sourcemeter drives one terminal of the same device.
+	def get_sim_model(self, _name):
+
+		_model = devicemodels.models[_name]
+
+		if len(_model.terminals) > 1:
+
+			if _name not in self._sim_models:
+				self._sim_models[_name] = _model()
+
+			return self._sim_models[_name]
 
+		if _model is devicemodels.solar_cell:
+			return _model(_irradiance = self.sim_irradiance.value())
+
+		return _model()
+
+	# Callback to handle simulated device initialization
+	def init_keithley_sim(self):
+
+		_resource = "SIM::%s::INSTR"%str(self.sim_addr.value())
+
+		# Check if insturement has already been initialized
+		if self.get_device(_resource) is not None:
+
+			msg = QMessageBox()
+			msg.setIcon(QMessageBox.Warning)
+			msg.setText("Device Error: %s aready initialized"%(_resource))
+			msg.setWindowTitle("pyVISA Error")
+			msg.setWindowIcon(self._icon)
+			msg.setStandardButtons(QMessageBox.Ok)
+			msg.exec_()
+			return
+
+		# Initialize simulated Keithley
+		Device = keithley2400sim.keithley2400sim(
+			_resource, 
+			self.get_sim_model( self.sim_model.currentText() ), 
+			self.sim_terminal.currentText(),
+			self.sim_latency.value() / 1000.0, 
+			float( self.sim_freq.currentText() )
+		)
+		Device.rst()
+
+		# Add insturment to configuraion object and build its page
+		self.add_keithley(Device)
+
+		# Message box to display success
+		msg = QMessageBox()
+		msg.setIcon(QMessageBox.Information)
+		msg.setText("Initialized simulated device at %s"%(Device.get_property("name")))
+		msg.setWindowTitle("pyVISA Connection")
+		msg.setWindowIcon(self._icon)
+		msg.setStandardButtons(QMessageBox.Ok)
+		msg.exec_()
+
+	# Trace control. Tracing records timing of all insturment traffic and of
+	# application loop stages (see QKeithleyTrace).
+	def _gen_trace_control(self):
+
+		self.trace_label = QLabel("<b>VISA Trace</b>")
+
+		self.trace_enable = QCheckBox("Enable Trace")
+		self.trace_enable.stateChanged.connect(self.update_trace)
+
+		self.trace_button = QPushButton("View Trace")
+		self.trace_button.clicked.connect(self.show_trace)
+
+		return self._gen_vbox_widget([
+			self.trace_label, 
+			self._gen_hbox_widget([self.trace_enable, self.trace_button])
+		])
+
+	# Enable/disable tracing on all devices
+	def update_trace(self):
+
+		if self.trace_enable.isChecked():
+			self._trace.enable(self.Devices)
+
+		else:
+			self._trace.disable()
+
+	# Show trace viewer
+	def show_trace(self):
+
+		if self._trace_widget is None:
+			self._trace_widget = QKeithleyTraceWidget(self._trace, self._icon)
+
+		self._trace_widget.show()
+		self._trace_widget.raise_()
+
+	# Get trace object
+	def get_trace(self):
+		return self._trace
+
+	# Record and replay control. Recording saves all insturment traffic with 
+	# its timing. Replay initializes one device per recorded insturment which 
+	# answers with the recorded responses (see QKeithleyRecorder).
+	def _gen_record_control(self):
+
+		self.record_label = QLabel("<b>Record and Replay</b>")
+
+		self.record_enable = QCheckBox("Record")
+		self.record_enable.stateChanged.connect(self.update_recorder)
+
+		self.record_button = QPushButton("Save Recording")
+		self.record_button.clicked.connect(self.save_recording)
+
+		self.replay_button = QPushButton("Load Replay")
+		self.replay_button.clicked.connect(self.load_replay)
+
+		# Replay speed (factor applied to recorded bus time, 0 = no delay)
+		self.replay_speed = QComboBox()
+		self.replay_speed.addItems(["Recorded", "10x", "Max"])
+
+		return self._gen_vbox_widget([
+			self.record_label, 
+			self._gen_hbox_widget([self.record_enable, self.record_button]),
+			self._gen_hbox_widget([self.replay_speed, self.replay_button])
+		])
+
+	# Start/stop recording on all devices
+	def update_recorder(self):
+
+		if self.record_enable.isChecked():
+			self._recorder.start(self.Devices)
+
+		else:
+			self._recorder.stop()
+
+	# Get replay speed
+	def get_replay_speed(self):
+		return {"Recorded" : 1.0, "10x" : 10.0, "Max" : 0.0}[ self.replay_speed.currentText() ]
+
+	# Save recording
+	def save_recording(self):
+
+		dialog = QFileDialog(self)
+		dialog.setFileMode(QFileDialog.AnyFile)
+		dialog.setViewMode(QFileDialog.Detail)
+		dialog.setAcceptMode(QFileDialog.AcceptSave)
+		filenames = []
+
+		# Select file
+		if dialog.exec_():
+			filenames = dialog.selectedFiles()
+
+		# Check if filenames is not empty 
+		if filenames != []:
+			self._recorder.write_to_file(filenames[0])
+
+	# Load recording and initialize a replay device for each recorded insturment
+	def load_replay(self):
+
+		dialog = QFileDialog(self)
+		dialog.setFileMode(QFileDialog.ExistingFile)
+		dialog.setViewMode(QFileDialog.Detail)
+		filenames = []
+
+		# Select file
+		if dialog.exec_():
+			filenames = dialog.selectedFiles()
+
+		if filenames == []:
+			return
+
+		try:
+			_devices = QKeithleyRecorder.read_from_file(filenames[0])
+
+		except ( OSError, ValueError, KeyError ) as e:
+
+			msg = QMessageBox()
+			msg.setIcon(QMessageBox.Warning)
+			msg.setText("Could not read recording %s: %s"%(filenames[0], str(e)))
+			msg.setWindowTitle("QKeithleyControl")
+			msg.setWindowIcon(self._icon)
+			msg.setStandardButtons(QMessageBox.Ok)
+			msg.exec_()
+			return
+
+		for _name, _data in _devices.items():
+			self.init_keithley_replay(_data)
+
+	# Initialize a replay device on the first free replay address
+	def init_keithley_replay(self, _data):
+
+		_addr = 1
+		while self.get_device("REPLAY::%d::INSTR"%_addr) is not None:
+			_addr += 1
+
+		Device = keithley2400replay.keithley2400replay(
+			"REPLAY::%d::INSTR"%_addr, 
+			_data["records"], 
+			self.get_replay_speed(), 
+			_data["line_freq"]
+		)
+
+		# Add insturment to configuraion object and build its page
+		self.add_keithley(Device)
+		return Device
+
+	# Get recorder object
+	def get_recorder(self):
+		return self._recorder
+
+	# Insturment server control. The server shares initialized devices with 
+	# other processes on the local machine (see QKeithleyBroker).
+	def _gen_server_control(self):
+
+		self.server_label = QLabel("<b>Instrument Server</b>")
+
+		self.server_enable = QCheckBox("Enable Server")
+		self.server_enable.stateChanged.connect(self.update_server)
+
+		self.server_port = QSpinBox()
+		self.server_port.setMinimum(1024)
+		self.server_port.setMaximum(65535)
+		self.server_port.setValue(5025)
+		self.server_port_label = QLabel("Port")
+
+		return self._gen_vbox_widget([
+			self.server_label, 
+			self._gen_hbox_widget([self.server_enable, self.server_port, self.server_port_label])
+		])
+
+	# Start/stop insturment server
+	def update_server(self):
+
+		if self.server_enable.isChecked():
+
+			try:
+				self._broker = QKeithleyBroker(self, _port=self.server_port.value())
+				self._broker.start()
+				self.server_port.setEnabled(False)
+
+			except OSError as e:
+
+				self._broker = None
+				self.server_enable.blockSignals(True)
+				self.server_enable.setChecked(False)
+				self.server_enable.blockSignals(False)
+
+				msg = QMessageBox()
+				msg.setIcon(QMessageBox.Warning)
+				msg.setText("Could not start server on port %d: %s"%(self.server_port.value(), str(e)))
+				msg.setWindowTitle("QKeithleyControl")
+				msg.setWindowIcon(self._icon)
+				msg.setStandardButtons(QMessageBox.Ok)
+				msg.exec_()
+
+		else:
+
+			if self._broker is not None:
+				self._broker.stop()
+				self._broker = None
+
+			self.server_port.setEnabled(True)
+
+	# Stop server before closing device sessions
+	def close_devices(self):
+
+		if self._broker is not None:
+			self._broker.stop()
+			self._broker = None
+
+		super(QKeithleyConfig, self).close_devices()
+
+	# Get throughput profiles
+	def get_profiles(self):
+		return self._profiles
+
+	# Reload profile names on all device pages
+	def update_profile_names(self):
+
+		for _page in list( self.device_pages.findChildren(QKeithleyConfigWidget) ):
+			_page.update_profile_names()
+
+	# Get QKeithleyConfigWidget by device name
+	def get_device_page(self, _name):
+
+		# Loop through QStacked widget children
+		for _page in list( self.device_pages.findChildren(QKeithleyConfigWidget) ):
+
+			# If insturment name matches page name
+			if _page.name == _name:
+				return _page
+
+		return None
 
 	# This will update the QStackedWidget to show the correct QKeithleyWidget
 	def update_device_pages(self):
@@ -102,12 +698,49 @@ class QKeithleyConfig(QVisaConfigure.QVisaConfigure):
 		# Get current text
 		Device = self._device_widget.get_current_device()
 		if Device is not None:
-			
-			# Loop through QStacked widget children
-			for _page in list( self.device_pages.findChildren(QKeithleyConfigWidget) ):
 
-				# If insturment name matches page name
-				if _page.name == Device.get_property("name"):
+			# Set widget page
+			_page = self.get_device_page( Device.get_property("name") )
+			if _page is not None:
+				self.device_pages.setCurrentWidget(_page)
+
+	# Offer to rewind replay devices which have already been (partly) replayed.
+	# Applications call this before starting a run on the devices _names. A
+	# replay only stays in step with the recording from its start.
+	def rewind_replay(self, _names):
+
+		for _name in list(dict.fromkeys(_names)):
+
+			Device = self.get_device_by_name(_name)
+			if ( Device is None ) or not hasattr(Device, "get_replay"):
+				continue
+
+			_stats = Device.get_replay().get_stats()
+			if _stats["position"] == 0:
+				continue
+
+			msg = QMessageBox()
+			msg.setIcon(QMessageBox.Question)
+			msg.setText("%s is at record %d of %d. Rewind replay?"%(_name, _stats["position"], _stats["length"]))
+			msg.setWindowTitle("QKeithleyControl")
+			msg.setWindowIcon(self._icon)
+			msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+
+			# Settings are sent again as in the recorded run
+			if msg.exec_() == QMessageBox.Yes:
+				Device.get_replay().rewind()
+				Device.invalidate()
+
+	# Program reading elements on a device. Applications pass the elements they
+	# consume, and optional elements enabled on the device page are appended.
+	def update_elements(self, _name, _elements):
+
+		Device = self.get_device_by_name(_name)
+		if Device is not None:
+
+			# Append optional elements from device page
+			_page = self.get_device_page(_name)
+			if _page is not None:
+				_elements = _elements + _page.get_elements()
 
-					# Set widget page
-					self.device_pages.setCurrentWidget(_page)
\ No newline at end of file
+			Device.set_elements(_elements)
\ No newline at end of file
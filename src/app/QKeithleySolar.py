@@ -41,6 +41,11 @@ from PyQtVisa import QVisaApplication
 from PyQtVisa.widgets import QVisaUnitSelector
 from PyQtVisa.widgets import QVisaDynamicPlot 
 
+# Import QKeithleyScheduler and QKeithleyCancel
+from src.utils.QKeithleyScheduler import QKeithleyScheduler
+from src.utils.QKeithleyCancel import QKeithleyCancel
+from src.utils.QKeithleyRender import QKeithleyRender
+
 # Import QT backends
 from PyQt5.QtWidgets import QApplication, QWidget, QStackedWidget, QVBoxLayout, QHBoxLayout, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox, QPushButton, QCheckBox, QLabel, QFileDialog, QSizePolicy, QLineEdit
 from PyQt5.QtCore import Qt, QStateMachine, QState, QObject
@@ -54,6 +59,13 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 		# Inherits QVisaApplication -> QWidget
 		super(QKeithleySolar, self).__init__(_config)
 
+		# Cancellation tokens for tracking threads
+		self.voc_thread_cancel = QKeithleyCancel()
+		self.mpp_thread_cancel = QKeithleyCancel()
+
+		# Render queue (measurement threads -> GUI thread)
+		self.render = QKeithleyRender(self)
+
 		# Generate Main Layout
 		self.gen_main_layout()
 
@@ -106,6 +118,9 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 	
 		# Create Icon for QMessageBox
 		self._set_icon( QIcon(os.path.join(os.path.dirname(os.path.realpath(__file__)), "python.ico")) )
+
+		# Reading elements consumed by the application
+		self._set_app_metadata("__elements__", ["VOLT", "CURR"])
 		
 		# Create layout objects and set layout
 		self.layout = QHBoxLayout()
@@ -508,19 +523,16 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 		data.set_subkeys(key, ["t", "Voc", "Ioc"])
 		data.set_metadata(key, "__type__", "pv-voc")
 
-		# Add key to meta widget
-		self.meta_widget.add_meta_key(key)
+		# Add key to meta widget (on GUI thread)
+		self.render.push(self.meta_widget.add_meta_key, key)
 
 		# Generate colors
 		_c0 = self.voc_plot.gen_next_color()
 		_c1 = self.voc_plot.gen_next_color()
 
 		# Clear plot and zero arrays
-		self.voc_plot.add_axes_handle('111' , key, _color=_c0)
-		self.voc_plot.add_axes_handle('111t', key, _color=_c1)
-
-		# Thread start time
-		start  = float(time.time())
+		self.render.push(self.voc_plot.add_axes_handle, '111' , key, _c0)
+		self.render.push(self.voc_plot.add_axes_handle, '111t', key, _c1)
 
 		# Set bias to initial value in voltas and turn output ON
 		self.keithley().set_voltage( self.voc_bias.value() )
@@ -536,75 +548,102 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 		# Initialize convergence
 		converged = False 
 
+		# Loop stage tracing
+		_trace = self._config.get_trace()
+		_lap   = _trace.clock()
+
+		# Sampling clock. Iterations are started on a fixed grid of deadlines
+		_clock = QKeithleyScheduler(self.voc_delay.value(), self.voc_thread_cancel)
+
 		# Ambipolar tracking algorithm (zero-crossing).	
 		# Need to adjust bias in direction of lower current. 
 		while self.voc_thread_running is True:
 
-			# Get data from buffer
-			_buffer = self.keithley().meas().split(",")
+			# Get data from buffer. None if aborted while waiting for reading
+			_buffer = self.keithley().meas_array()
+			if _buffer is None:
+				break
 			
 			# Create 1mV sense amplitude
 			_amplitude = self.voc_ampl.value()
-			_v, _i = np.add(float(_buffer[0]), np.linspace(-0.5 * _amplitude, 0.5 * _amplitude, 3)), []
+			_v, _i = np.add(_buffer[0], np.linspace(-0.5 * _amplitude, 0.5 * _amplitude, 3)), []
 			
 			# Measure current over sense amplitude array
 			for _ in _v:
-				self.keithley().set_voltage(_)
-				_b = self.keithley().meas().split(",")
-				_i.append( float( _b[1] ) )
+				_b = self.keithley().set_voltage_meas(_)
+				if _b is None:
+					break
+
+				_i.append( _b[1] )
+
+			# Aborted while waiting for reading
+			if len(_i) != len(_v):
+				break
 
 			# Reset the voltage
-			self.keithley().set_voltage( float(_buffer[0] ) )
+			self.keithley().set_voltage( _buffer[0] )
+			_lap = _trace.lap("pv-voc", "meas", _lap)
 			
 			# Normalization
-			_Inorm = max(_Inorm, abs( float(_buffer[1]) ) )
+			_Inorm = max(_Inorm, abs( _buffer[1] ) )
 
 			# Solar cell current is positive: bias is above Voc
 			if np.mean(_i) >= 0.0:
-				self.update_bias( float(_buffer[0]) - abs( float(_buffer[1]) / _Inorm ) * self.voc_gain.value() / 1000. ) 
+				self.update_bias( _buffer[0] - abs( _buffer[1] / _Inorm ) * self.voc_gain.value() / 1000. ) 
 
 			# Solar cell current is negative: bias is below Voc
 			else:
-				self.update_bias( float(_buffer[0]) + abs( float(_buffer[1]) / _Inorm ) * self.voc_gain.value() / 1000. )
+				self.update_bias( _buffer[0] + abs( _buffer[1] / _Inorm ) * self.voc_gain.value() / 1000. )
 
-			_now = float(time.time() - start)
+			_now = _clock.elapsed()
 
 			# Check convergence condition
-			if abs( float(_buffer[1]) / _Inorm ) < self.voc_conv.value():
+			if abs( _buffer[1] / _Inorm ) < self.voc_conv.value():
 
 				converged = True
 
+			_lap = _trace.lap("pv-voc", "track", _lap)
+
 			# Case of excluding convergence data
 			if ( self.meas_conv.isChecked() == False ) and converged:
 
 				data.append_subkey_data(key, "t"  , _now)
-				data.append_subkey_data(key, "Voc",  1.0 * float(_buffer[0]) )
-				data.append_subkey_data(key, "Ioc", -1.0 * float(_buffer[1]) ) # Sanity check
+				data.append_subkey_data(key, "Voc",  1.0 * _buffer[0] )
+				data.append_subkey_data(key, "Ioc", -1.0 * _buffer[1] ) # Sanity check
+				_lap = _trace.lap("pv-voc", "store", _lap)
 
-				# Append handle data and update canvas
-				self.voc_plot.append_handle_data("111" , key, _now,  1.0 * float(_buffer[0]) )
-				self.voc_plot.append_handle_data("111t", key, _now, -1.0 * float(_buffer[1]) )
-				self.voc_plot.update_canvas()	
+				# Append handle data. Canvas is updated on the GUI thread
+				self.render.append(self.voc_plot, "111" , key, _now,  1.0 * _buffer[0] )
+				self.render.append(self.voc_plot, "111t", key, _now, -1.0 * _buffer[1] )
+				_lap = _trace.lap("pv-voc", "plot", _lap)
 
 			# Case of including convergence data
 			if ( self.meas_conv.isChecked() == True ):
 
 				data.append_subkey_data(key, "t"  , _now)
-				data.append_subkey_data(key, "Voc",  1.0 * float(_buffer[0]) )
-				data.append_subkey_data(key, "Ioc", -1.0 * float(_buffer[1]) ) # Sanity check
+				data.append_subkey_data(key, "Voc",  1.0 * _buffer[0] )
+				data.append_subkey_data(key, "Ioc", -1.0 * _buffer[1] ) # Sanity check
+				_lap = _trace.lap("pv-voc", "store", _lap)
+
+				# Append handle data. Canvas is updated on the GUI thread
+				self.render.append(self.voc_plot, "111" , key, _now,  1.0 * _buffer[0] )
+				self.render.append(self.voc_plot, "111t", key, _now, -1.0 * _buffer[1] )
+				_lap = _trace.lap("pv-voc", "plot", _lap)
 
-				# Append handle data and update canvas
-				self.voc_plot.append_handle_data("111" , key, _now,  1.0 * float(_buffer[0]) )
-				self.voc_plot.append_handle_data("111t", key, _now, -1.0 * float(_buffer[1]) )
-				self.voc_plot.update_canvas()	
+			# Measurement interval. Wait for the next deadline
+			_clock.set_interval(self.voc_delay.value())
+			if not _clock.wait():
+				break
 
-			# Measurement delay	
-			if self.voc_delay.value() != 0: 
-				time.sleep(self.voc_delay.value())
+			_lap = _trace.lap("pv-voc", "delay", _lap)
 
 		# Cleanup after thread termination
 		self.keithley().set_voltage(0.0)
 		self.keithley().output_off()	
+
+		# Sampling statistics (missed deadlines and jitter) and abort latency
+		_clock.set_metadata(data, key)
+		self.voc_thread_cancel.set_metadata(data, key)
 		
 	# Tracking measurement ON
 	def exec_voc_run(self):
@@ -625,11 +664,17 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 			self.voc_plot.mpl_refresh_setEnabled(False)	
 			self.mpp_plot.mpl_refresh_setEnabled(False)
 
+			# Program reading elements. Waits for readings are cancelled on stop
+			self._config.rewind_replay([self.device_select.currentText()])
+			self._config.update_elements(self.device_select.currentText(), self._get_app_metadata("__elements__"))
+			self.voc_thread_cancel.reset()
+			self.keithley().set_cancel(self.voc_thread_cancel)
+
 			# Run the measurement thread function
 			self.voc_thread = threading.Thread(target=self.exec_voc_thread, args=())
 			self.voc_thread.daemon = True		# Daemonize thread
+			self.voc_thread_running = True		# Set execution flag
 			self.voc_thread.start()				# Start the execution
-			self.voc_thread_running = True		# Set execution flag	
 			
 
 	# Tracking measurement OFF
@@ -651,11 +696,15 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 			self.voc_plot.mpl_refresh_setEnabled(True)	
 			self.mpp_plot.mpl_refresh_setEnabled(True)
 	
-			# Set thread running to False. This will break the sweep measurements
-			# execution loop on next iteration.  
+			# Cancel waits and set thread running to False. This will break the 
+			# measurement execution loop on next iteration.  
+			self.voc_thread_cancel.cancel()
 			self.voc_thread_running = False	
 			self.voc_thread.join()  # Waits for thread to complete
 
+			# Draw remaining samples
+			self.render.drain()
+
 	
 	#####################################
 	#  MPP-TRACKING MEASUREMENT MODE
@@ -671,20 +720,17 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 		data.set_subkeys(key, ["t", "Vmpp", "Impp", "Pmpp"])
 		data.set_metadata(key, "__type__", "pv-mpp")
 
-		# Add key to meta widget
-		self.meta_widget.add_meta_key(key)
+		# Add key to meta widget (on GUI thread)
+		self.render.push(self.meta_widget.add_meta_key, key)
 
 		# Generate colors
 		_c0 = self.mpp_plot.gen_next_color()
 		_c1 = self.mpp_plot.gen_next_color()
 
 		# Clear plot and zero arrays
-		self.mpp_plot.add_axes_handle('111' , key, _color=_c0)
-		self.mpp_plot.add_axes_handle('111t', key, _color=_c1)
+		self.render.push(self.mpp_plot.add_axes_handle, '111' , key, _c0)
+		self.render.push(self.mpp_plot.add_axes_handle, '111t', key, _c1)
 		
-		# Thread start time
-		start  = float(time.time())
-
 		# Set bias to initial value in volts and turn output ON
 		self.keithley().set_voltage( self.mpp_bias.value() )
 		self.keithley().current_cmp( self.mpp_cmpl.value() )
@@ -699,24 +745,40 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 		# Initialize convergence
 		converged = False 
 
+		# Loop stage tracing
+		_trace = self._config.get_trace()
+		_lap   = _trace.clock()
+
+		# Sampling clock. Iterations are started on a fixed grid of deadlines
+		_clock = QKeithleyScheduler(self.mpp_delay.value(), self.mpp_thread_cancel)
+
 		# Thread loop
 		while self.mpp_thread_running is True:
 
-			# Get data from buffer
-			_buffer = self.keithley().meas().split(",")
+			# Get data from buffer. None if aborted while waiting for reading
+			_buffer = self.keithley().meas_array()
+			if _buffer is None:
+				break
 			
 			# Create 1mV sense amplitude
 			_amplitude = self.mpp_ampl.value()
-			_v, _i = np.add(float(_buffer[0]), np.linspace(-0.5 * _amplitude, 0.5 * _amplitude, 5)), []
+			_v, _i = np.add(_buffer[0], np.linspace(-0.5 * _amplitude, 0.5 * _amplitude, 5)), []
 
 			# Measure current over sense amplitude array
 			for _ in _v:
-				self.keithley().set_voltage(_)
-				_b = self.keithley().meas().split(",")
-				_i.append( -1.0 * float( _b[1] ) )
+				_b = self.keithley().set_voltage_meas(_)
+				if _b is None:
+					break
+
+				_i.append( -1.0 * _b[1] )
+
+			# Aborted while waiting for reading
+			if len(_i) != len(_v):
+				break
 
 			# Reset the voltage
-			self.keithley().set_voltage( float(_buffer[0] ) )
+			self.keithley().set_voltage( _buffer[0] )
+			_lap = _trace.lap("pv-mpp", "meas", _lap)
 
 			# Calculate derivative of current and power
 			_p  = np.multiply(_i, _v)
@@ -727,55 +789,66 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 
 			# Ambipolar tracking algorithm
 			if np.mean(_dp) <= 0.0:
-				self.update_bias( float(_buffer[0]) - abs( np.mean(_dp) / _dPnorm ) * self.voc_gain.value() / 1000. ) 
+				self.update_bias( _buffer[0] - abs( np.mean(_dp) / _dPnorm ) * self.voc_gain.value() / 1000. ) 
 
 			# Solar cell current is negative: bias is below Voc
 			else:
-				self.update_bias( float(_buffer[0]) + abs( np.mean(_dp) / _dPnorm ) * self.voc_gain.value() / 1000. )
+				self.update_bias( _buffer[0] + abs( np.mean(_dp) / _dPnorm ) * self.voc_gain.value() / 1000. )
 
 			# Extract data from buffer
-			_now = float(time.time() - start)
+			_now = _clock.elapsed()
 
 			# Check convergence condition
 			if abs( np.mean(_dp) / _dPnorm ) < self.mpp_conv.value():
 
 				converged = True
 
+			_lap = _trace.lap("pv-mpp", "track", _lap)
+
 			# Case of excluding convergence data
 			if ( self.meas_conv.isChecked() == False ) and converged:
 
 				data.append_subkey_data(key, "t"	, _now)
-				data.append_subkey_data(key, "Vmpp",  1.0 * float(_buffer[0]) )
-				data.append_subkey_data(key, "Impp", -1.0 * float(_buffer[1]) ) 
-				data.append_subkey_data(key, "Pmpp", -1.0 * float(_buffer[1]) * float(_buffer[0]) )
+				data.append_subkey_data(key, "Vmpp",  1.0 * _buffer[0] )
+				data.append_subkey_data(key, "Impp", -1.0 * _buffer[1] ) 
+				data.append_subkey_data(key, "Pmpp", -1.0 * _buffer[1] * _buffer[0] )
+				_lap = _trace.lap("pv-mpp", "store", _lap)
 
-				# Append handle data and update canvas
-				self.mpp_plot.append_handle_data("111" , key, _now, float(_buffer[0]))
-				self.mpp_plot.append_handle_data("111t", key, _now, float(_buffer[0]) * -1.0 * float(_buffer[1]) * 1000.)
-				self.mpp_plot.update_canvas()	
+				# Append handle data. Canvas is updated on the GUI thread
+				self.render.append(self.mpp_plot, "111" , key, _now, _buffer[0])
+				self.render.append(self.mpp_plot, "111t", key, _now, _buffer[0] * -1.0 * _buffer[1] * 1000.)
+				_lap = _trace.lap("pv-mpp", "plot", _lap)
 
 			# Case of including convergence data		
 			if ( self.meas_conv.isChecked() == True ):
 
 				data.append_subkey_data(key, "t"	, _now)
-				data.append_subkey_data(key, "Vmpp",  1.0 * float(_buffer[0]) )
-				data.append_subkey_data(key, "Impp", -1.0 * float(_buffer[1]) ) 
-				data.append_subkey_data(key, "Pmpp", -1.0 * float(_buffer[1]) * float(_buffer[0]) )
+				data.append_subkey_data(key, "Vmpp",  1.0 * _buffer[0] )
+				data.append_subkey_data(key, "Impp", -1.0 * _buffer[1] ) 
+				data.append_subkey_data(key, "Pmpp", -1.0 * _buffer[1] * _buffer[0] )
+				_lap = _trace.lap("pv-mpp", "store", _lap)
+
+				# Append handle data. Canvas is updated on the GUI thread
+				self.render.append(self.mpp_plot, "111" , key, _now, _buffer[0])
+				self.render.append(self.mpp_plot, "111t", key, _now, _buffer[0] * -1.0 * _buffer[1] * 1000.)
+				_lap = _trace.lap("pv-mpp", "plot", _lap)
 
-				# Append handle data and update canvas
-				self.mpp_plot.append_handle_data("111" , key, _now, float(_buffer[0]))
-				self.mpp_plot.append_handle_data("111t", key, _now, float(_buffer[0]) * -1.0 * float(_buffer[1]) * 1000.)
-				self.mpp_plot.update_canvas()	
 
+			# Measurement interval. Wait for the next deadline
+			_clock.set_interval(self.mpp_delay.value())
+			if not _clock.wait():
+				break
 
-			# Measurement delay	
-			if self.mpp_delay.value() != 0: 
-				time.sleep(self.mpp_delay.value())
+			_lap = _trace.lap("pv-mpp", "delay", _lap)
 
 		# Cleanup after thread termination
 		self.keithley().set_voltage(0.0)
 		self.keithley().output_off()	
 
+		# Sampling statistics (missed deadlines and jitter) and abort latency
+		_clock.set_metadata(data, key)
+		self.mpp_thread_cancel.set_metadata(data, key)
+
 	# Tracking measurement ON
 	def exec_mpp_run(self):
 		
@@ -795,11 +868,17 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 			self.voc_plot.mpl_refresh_setEnabled(False)	
 			self.mpp_plot.mpl_refresh_setEnabled(False)
 			
+			# Program reading elements. Waits for readings are cancelled on stop
+			self._config.rewind_replay([self.device_select.currentText()])
+			self._config.update_elements(self.device_select.currentText(), self._get_app_metadata("__elements__"))
+			self.mpp_thread_cancel.reset()
+			self.keithley().set_cancel(self.mpp_thread_cancel)
+
 			# Run the measurement thread function
 			self.mpp_thread = threading.Thread(target=self.exec_mpp_thread, args=())
 			self.mpp_thread.daemon = True		# Daemonize thread
+			self.mpp_thread_running = True		# Set execution flag
 			self.mpp_thread.start()				# Start the execution
-			self.mpp_thread_running = True		# Set execution flag				
 
 	# Tracking measurement OFF
 	def exec_mpp_stop(self):
@@ -820,7 +899,11 @@ class QKeithleySolar(QVisaApplication.QVisaApplication):
 			self.voc_plot.mpl_refresh_setEnabled(True)	
 			self.mpp_plot.mpl_refresh_setEnabled(True)
 
-			# Set thread running to False. This will break the sweep measurements
-			# execution loop on next iteration.  
+			# Cancel waits and set thread running to False. This will break the 
+			# measurement execution loop on next iteration.  
+			self.mpp_thread_cancel.cancel()
 			self.mpp_thread_running = False	
 			self.mpp_thread.join()  # Waits for thread to complete
+
+			# Draw remaining samples
+			self.render.drain()
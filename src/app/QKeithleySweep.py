@@ -40,8 +40,14 @@ from PyQtVisa import QVisaApplication
 from PyQtVisa.widgets import QVisaUnitSelector
 from PyQtVisa.widgets import QVisaDynamicPlot 
 
+# Import QKeithleyCancel
+from src.utils.QKeithleyCancel import QKeithleyCancel
+
+# Import QKeithleyRender
+from src.utils.QKeithleyRender import QKeithleyRender
+
 # Import QT backends
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox, QPushButton, QCheckBox, QLabel, QLineEdit, QStackedWidget, QSizePolicy
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox, QPushButton, QCheckBox, QLabel, QLineEdit, QStackedWidget, QSizePolicy, QListWidget, QListWidgetItem
 from PyQt5.QtCore import Qt, QStateMachine, QState, QObject
 from PyQt5.QtCore import Qt, QStateMachine, QState, QObject
 from PyQt5.QtGui import QIcon
@@ -54,6 +60,12 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		# Inherits QVisaApplication -> QWidget
 		super(QKeithleySweep, self).__init__(_config)
 
+		# Cancellation token for measurement threads
+		self.thread_cancel = QKeithleyCancel()
+
+		# Render queue (measurement threads -> GUI thread)
+		self.render = QKeithleyRender(self)
+
 		# Generate Main Layout
 		self.gen_main_layout()
 
@@ -77,6 +89,17 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			self.sweep_inst.refresh( self )
 			self.step_inst.refresh( self )
 
+			# Parallel sweep devices
+			_items = [ self.sweep_parallel_inst.item(_).text() for _ in range(self.sweep_parallel_inst.count()) ]
+			for _name in self.get_device_names():
+
+				if _name not in _items:
+
+					_item = QListWidgetItem(_name)
+					_item.setFlags(_item.flags() | Qt.ItemIsUserCheckable)
+					_item.setCheckState(Qt.Unchecked)
+					self.sweep_parallel_inst.addItem(_item)
+
 			# Plot control widgets
 			self.plot_x_inst.refresh( self )
 			self.plot_y_inst.refresh( self )
@@ -145,6 +168,53 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		sp = np.linspace(float(start), float(stop), int(npts) )
 		self._set_app_metadata("__step__", sp)
 
+	# Method to check if fixed ranges are used on the sweep keithley
+	def fixed_range_enabled(self):
+		return self.sweep_range.currentText() == "Fixed"
+
+	# Method to check if points are settled adaptively rather than by delay
+	def settle_enabled(self):
+		return self.sweep_settle.currentText() == "Adaptive"
+
+	# Relative settle tolerance
+	def get_settle_tolerance(self):
+		return self.sweep_settle_tol.value() / 100.0
+
+	# Number of consecutive compliance readings which end a sweep (0 = off)
+	def get_compliance_stop(self):
+		return self.sweep_cmpl_stop.value()
+
+	# Method to check if parallel sweeps are enabled. Step modes need the
+	# sweep keithley and step keithley on the same DUT, so parallel sweeps
+	# are only run without step bias.
+	def parallel_enabled(self):
+		return self.sweep_parallel.isChecked() and ( self._get_app_metadata("__exec_step__") != True )
+
+	# Names of swept devices. In parallel mode the sweep is run on the sweep
+	# keithley and all checked devices.
+	def get_sweep_names(self):
+
+		_names = [ self.sweep_inst.currentText() ]
+
+		if self.parallel_enabled():
+
+			for _index in range(self.sweep_parallel_inst.count()):
+
+				_item = self.sweep_parallel_inst.item(_index)
+				if ( _item.checkState() == Qt.Checked ) and ( _item.text() not in _names ):
+					_names.append( _item.text() )
+
+		return [ _ for _ in _names if self.get_device_by_name(_) is not None ]
+
+	# Method to check if sweep can be run by the insturment. Instrument sweeps 
+	# only read back the sweep keithley, so plot axes must also be assigned to 
+	# the sweep keithley.
+	def hw_sweep_enabled(self):
+
+		return ( ( self.sweep_mode.currentText() == "Instrument" ) and 
+			( self.plot_x_inst.currentText() == self.sweep_inst.currentText() ) and
+			( self.plot_y_inst.currentText() == self.sweep_inst.currentText() ) )
+
 
 	#####################################
 	# MAIN LAYOUT
@@ -154,6 +224,9 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 	
 		# Create Icon for QMessageBox
 		self._set_icon( QIcon(os.path.join(os.path.dirname(os.path.realpath(__file__)), "python.ico")))	
+
+		# Reading elements consumed by the application
+		self._set_app_metadata("__elements__", ["VOLT", "CURR"])
 		
 		# Create layout objects and set layout
 		self.layout = QHBoxLayout()
@@ -308,6 +381,57 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		self.sweep_hist.setFixedWidth(200)
 		self.sweep_hist.addItems(["None", "Reverse-sweep", "Zero-centered"])	
 
+		# Sweep mode. In instrument mode the sweep is programmed into the 
+		# source-sweep subsystem and triggered by the Keithley itself
+		self.sweep_mode_label = QLabel("Sweep Mode")
+		self.sweep_mode = QComboBox()
+		self.sweep_mode.setFixedWidth(200)
+		self.sweep_mode.addItems(["Software", "Instrument"])
+
+		# Range mode. In fixed mode the source range is fixed from the sweep 
+		# extents and the measure range is held at the compliance range. Only
+		# readings more than a decade below compliance are autoranged.
+		self.sweep_range_label = QLabel("Range Mode")
+		self.sweep_range = QComboBox()
+		self.sweep_range.setFixedWidth(200)
+		self.sweep_range.addItems(["Auto", "Fixed"])
+
+		# Settle mode. In delay mode each point waits the measurement interval. 
+		# In adaptive mode fast readings are taken after each level change until 
+		# the measured value drifts less than the settle tolerance, and the 
+		# measurement interval is the maximum wait.
+		self.sweep_settle_label = QLabel("Settle Mode")
+		self.sweep_settle = QComboBox()
+		self.sweep_settle.setFixedWidth(200)
+		self.sweep_settle.addItems(["Delay", "Adaptive"])
+
+		self.sweep_settle_tol_label = QLabel("Settle Tolerance (%)")
+		self.sweep_settle_tol = QDoubleSpinBox()
+		self.sweep_settle_tol.setFixedWidth(200)
+		self.sweep_settle_tol.setDecimals(3)
+		self.sweep_settle_tol.setMinimum(0.001)
+		self.sweep_settle_tol.setMaximum(10.0)
+		self.sweep_settle_tol.setSingleStep(0.01)
+		self.sweep_settle_tol.setValue(0.1)
+
+		# Compliance stop. Ends the sweep (or skips to the next step) after a 
+		# number of consecutive readings in compliance.
+		self.sweep_cmpl_stop_label = QLabel("Compliance Stop (pts)")
+		self.sweep_cmpl_stop = QSpinBox()
+		self.sweep_cmpl_stop.setFixedWidth(200)
+		self.sweep_cmpl_stop.setMinimum(0)
+		self.sweep_cmpl_stop.setMaximum(512)
+		self.sweep_cmpl_stop.setValue(0)
+		self.sweep_cmpl_stop.setSpecialValueText("Off")
+
+		# Parallel sweep. The sweep is run concurrently on the sweep keithley
+		# and all checked devices (one DUT per device). Each device reads back
+		# its own DUT, so plot devices are not used.
+		self.sweep_parallel = QCheckBox("Parallel Sweep")
+		self.sweep_parallel_inst = QListWidget()
+		self.sweep_parallel_inst.setFixedWidth(200)
+		self.sweep_parallel_inst.setFixedHeight(80)
+
 		#####################################
 		#  ADD CONTROLS
 		#
@@ -317,6 +441,12 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_inst,self.sweep_inst_label]))
 		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_src, self.sweep_src_label]))
 		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_hist, self.sweep_hist_label]))
+		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_mode, self.sweep_mode_label]))
+		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_range, self.sweep_range_label]))
+		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_settle, self.sweep_settle_label]))
+		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_settle_tol, self.sweep_settle_tol_label]))
+		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_cmpl_stop, self.sweep_cmpl_stop_label]))
+		self.sweep_ctrl_layout.addWidget(self._gen_hbox_widget([self.sweep_parallel_inst, self.sweep_parallel]))
 		self.sweep_ctrl_layout.addWidget(self.sweep_pages)
 		
 		# Positioning
@@ -354,6 +484,14 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		self.step_pages.addWidget(self.current_step)
 		self.step_pages.setCurrentIndex(0)
 
+		# Overlapped acquisition. Integration is started on all insturments 
+		# before results are fetched, so that insturments integrate concurrently
+		self.step_overlap = QCheckBox("Overlapped Acquisition")
+
+		# Trigger Link synchronization. Step keithley is slaved to the sweep
+		# keithley and both acquire on the same hardware trigger
+		self.step_sync = QCheckBox("Trigger Link Sync")
+
 		# Step control state machine
 		self.step_state = QStateMachine()
 		self.step_button = QPushButton()
@@ -384,6 +522,8 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		self.step_ctrl_layout.addWidget(self._gen_hbox_widget([self.step_inst,self.step_inst_label]))
 		self.step_ctrl_layout.addWidget(self._gen_hbox_widget([self.step_src, self.step_src_label]))
 		self.step_ctrl_layout.addWidget(self.step_pages)
+		self.step_ctrl_layout.addWidget(self.step_overlap)
+		self.step_ctrl_layout.addWidget(self.step_sync)
 		self.step_ctrl_layout.addWidget(self.step_button)
 		self.step_ctrl_layout.addStretch(1)
 
@@ -818,12 +958,12 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 				self.voltage_sweep_stop.value(), 
 				self.voltage_sweep_npts.value())
 
-			# Set keithley as voltage source
-			if self.keithley(self.sweep_inst) is not None:
-	
-				self.keithley(self.sweep_inst).voltage_src()
-				self.keithley(self.sweep_inst).set_voltage(0.0)
-				self.keithley(self.sweep_inst).current_cmp(self.voltage_sweep_cmpl.value())
+			# Set keithleys as voltage source
+			for _name in self.get_sweep_names():
+
+				self.get_device_by_name(_name).voltage_src()
+				self.get_device_by_name(_name).set_voltage(0.0)
+				self.get_device_by_name(_name).current_cmp(self.voltage_sweep_cmpl.value())
 	
 
 		# Set up i-source(v-compliance) on keithley 
@@ -836,12 +976,12 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 				self.current_sweep_npts.value())
 
 	
-			# Set keithley as voltage source
-			if self.keithley(self.sweep_inst) is not None:
-			
-				self.keithley(self.sweep_inst).current_src()
-				self.keithley(self.sweep_inst).set_current(0.0)
-				self.keithley(self.sweep_inst).voltage_cmp(self.current_sweep_cmpl.value())
+			# Set keithleys as current source
+			for _name in self.get_sweep_names():
+
+				self.get_device_by_name(_name).current_src()
+				self.get_device_by_name(_name).set_current(0.0)
+				self.get_device_by_name(_name).voltage_cmp(self.current_sweep_cmpl.value())
 
 
 		# Set step keithley as voltage source. Also ensure that we are not initializing
@@ -947,18 +1087,211 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		self._set_app_metadata("__exec_step__", False)
 
 	
+	# Method to check if sweep-step can be synchronized via Trigger Link. The
+	# sweep keithley is the Trigger Link master and runs the sweep, and the step
+	# keithley is slaved to it. Plot axes must be assigned to these devices.
+	def sync_enabled(self):
+
+		return ( self.step_sync.isChecked() and
+			( self.sweep_inst.currentText() != self.step_inst.currentText() ) and
+			( self.plot_x_inst.currentText() in [self.sweep_inst.currentText(), self.step_inst.currentText()] ) and
+			( self.plot_y_inst.currentText() in [self.sweep_inst.currentText(), self.step_inst.currentText()] ) )
+
+	# Execute Sweep-Step Measurement (Trigger Link). For each step, the sweep is
+	# run by the sweep keithley as in exec_hw_sweep_thread. The step keithley
+	# is armed to take one reading on each Trigger Link pulse from the sweep 
+	# keithley, and readings from both devices are collected in bulk.
+	def exec_sync_sweep_step_thread(self):
+
+		# Source mode and delay for voltage/current mode
+		if self.sweep_src.currentText() == "Voltage":
+			__sweep_mode__  = "VOLT"
+			__sweep_func__  = self.keithley(self.sweep_inst).set_voltage
+			__sweep_delay__ = self.voltage_sweep_delay.value()
+
+		if self.sweep_src.currentText() == "Current":
+			__sweep_mode__  = "CURR"
+			__sweep_func__  = self.keithley(self.sweep_inst).set_current
+			__sweep_delay__ = self.current_sweep_delay.value()
+
+		# Step source function
+		if self.step_src.currentText() == "Voltage":
+			__step_type__ = "v-step"
+			__step_func__ = self.keithley(self.step_inst).set_voltage
+
+		if self.step_src.currentText() == "Current":
+			__step_type__ = "i-step"
+			__step_func__ = self.keithley(self.step_inst).set_current
+
+		# Use generator function so all traces have same color
+		_c = self.plot.gen_next_color()
+		_handle_index = 0 
+
+		# Get data object and master key
+		data  = self._get_data_object()
+		_root = data.add_hash_key("iv-sweep-v-step")
+		data.set_metadata(_root, "__type__", "iv-sweep-v-step")
+
+		# Add key to meta widget (on GUI thread)
+		self.render.push(self.meta_widget.add_meta_key, _root)
+
+		# Master (sweep) and slave (step) keithleys
+		_master = self.keithley(self.sweep_inst)
+		_slave  = self.keithley(self.step_inst)
+
+		# Reading element positions
+		_v0, _i0, _t = [ _master.element_index(_) for _ in ["VOLT", "CURR", "TIME"] ]
+		_v1, _i1     = [ _slave.element_index(_) for _ in ["VOLT", "CURR"] ]
+
+		# Plot axes are taken from master or slave readings
+		_plotx = "__sweep__" if self.plot_x_inst.currentText() == self.sweep_inst.currentText() else "__step__"
+		_ploty = "__sweep__" if self.plot_y_inst.currentText() == self.sweep_inst.currentText() else "__step__"
+		_x = ( _v0 if _plotx == "__sweep__" else _v1 ) if self.plot_x_data.currentText() == "Voltage" else ( _i0 if _plotx == "__sweep__" else _i1 )
+		_y = ( _v0 if _ploty == "__sweep__" else _v1 ) if self.plot_y_data.currentText() == "Voltage" else ( _i0 if _ploty == "__sweep__" else _i1 )
+
+		# Sweep array
+		_sweep  = self._get_app_metadata("__sweep__")
+
+		# Linear sweeps are run in one segment, hysteresis sweeps in list segments
+		if self.sweep_hist.currentText() == "None":
+			__sweep_prog__ = _master.sweep_src
+			_chunks = [ (_sweep[0], _sweep[-1], len(_sweep)) ]
+
+		else:
+			__sweep_prog__ = _master.list_src
+			_chunks = [ (_, ) for _ in _master.split_list(_sweep) ]
+
+		# Fixed source range from sweep extents
+		if self.fixed_range_enabled():
+			_master.fixed_ranges(__sweep_mode__, _sweep)
+
+		# Configure Trigger Link and turn outputs ON
+		_master.source_delay(__sweep_delay__)
+		_master.trigger_link_master()
+		_master.reset_timestamp()
+		_master.output_on()
+		_slave.output_on()
+
+		# Elapsed time when reading timestamps are not enabled
+		start, _now = time.time(), 0.0
+
+		# Loop stage tracing
+		_trace = self._config.get_trace()
+		_lap   = _trace.clock()
+
+		# Loop through step variables and generate subkeys
+		for _step in self._get_app_metadata("__step__"):
+
+			# If thread is running
+			if self.thread_running:
+
+				# Generate data key and set metadata
+				key = data.add_hash_key("iv-sweep-%s%s"%(__step_type__, _step))
+				data.set_metadata(key, "__root__", _root)
+				data.set_metadata(key, "__step__", _step)
+				data.set_subkeys(key, ["t", "V0", "I0", "P0", "V1", "I1", "P1"])
+
+				# Set step voltage/current and add axes handle to root
+				__step_func__(_step)
+				self.render.push(self.plot.add_axes_handle, "111", _root, _c)
+
+				# Loop through sweep segments
+				for _chunk in _chunks:
+
+					# If thread is running
+					if self.thread_running:
+
+						# Arm slave, then run sweep segment on master
+						_slave.trigger_link_slave(len(_chunk[0]) if len(_chunk) == 1 else _chunk[2])
+						_slave.arm()
+						__sweep_prog__(__sweep_mode__, *_chunk)
+						_b0 = _master.read_buffer()
+						_b1 = _slave.fetch_buffer()
+						_lap = _trace.lap("iv-sweep-step", "meas", _lap)
+
+						# Aborted while waiting for readings
+						if ( _b0 is None ) or ( _b1 is None ):
+							break
+
+						# Measure range for next segment
+						if self.fixed_range_enabled():
+							_master.track_range(_master.sense_mode(__sweep_mode__), _b0[:, _i0 if __sweep_mode__ == "VOLT" else _v0])
+
+						# Use reading timestamps if enabled. Otherwise distribute 
+						# segment readings evenly over elapsed time of the segment.
+						if _t is not None:
+							_time = _b0[:, _t]
+
+						else:
+							_time = np.linspace(_now, float(time.time() - start), len(_b0) + 1)[1:]
+							_now  = _time[-1]
+
+						# Append measured values to data arrays
+						data.get_subkey_data(key, "t").extend( _time )
+						data.get_subkey_data(key, "V0").extend( _b0[:, _v0] )
+						data.get_subkey_data(key, "I0").extend( _b0[:, _i0] )
+						data.get_subkey_data(key, "P0").extend( _b0[:, _v0] * _b0[:, _i0] )
+						data.get_subkey_data(key, "V1").extend( _b1[:, _v1] )
+						data.get_subkey_data(key, "I1").extend( _b1[:, _i1] )
+						data.get_subkey_data(key, "P1").extend( _b1[:, _v1] * _b1[:, _i1] )
+						_lap = _trace.lap("iv-sweep-step", "store", _lap)
+
+						# Update the data
+						p0 = _b0[:, _x] if _plotx == "__sweep__" else _b1[:, _x]
+						p1 = _b0[:, _y] if _ploty == "__sweep__" else _b1[:, _y]
+						self.render.append(self.plot, "111", _root, p0, p1, _handle_index)
+						_lap = _trace.lap("iv-sweep-step", "plot", _lap)
+
+				# Increment handle index
+				_handle_index += 1
+
+		# Reset Trigger Link and return master to fixed source mode
+		_master.trigger_link_off()
+		_master.fixed_src(__sweep_mode__)
+		_master.source_delay_restore()
+		_master.range_restore(__sweep_mode__)
+		_slave.trigger_link_off()
+
+		# Reset active keithleys
+		__sweep_func__(0.0)
+		__step_func__(0.0)
+
+		# Turn outputs OFF. This also runs when the sweep is aborted
+		_master.output_off()
+		_slave.output_off()
+
+		# Abort latency
+		self.thread_cancel.set_metadata(data, _root)
+
+		# Reset sweep control and update measurement state to stop. This
+		# runs on the GUI thread after the remaining plot updates
+		self.render.push(self.exec_meas_done)
+
 	# Execute Sweep-Step Measurement
 	def exec_sweep_step_thread(self):
 	
 		# Generate function pointer for sweep voltage/current mode
 		if self.sweep_src.currentText() == "Voltage":
+			__sweep_mode__  = "VOLT"
 			__sweep_func__  = self.keithley(self.sweep_inst).set_voltage
+			__sweep_meas__  = self.keithley(self.sweep_inst).set_voltage_meas
+			__sweep_arm__   = self.keithley(self.sweep_inst).set_voltage_arm
 			__sweep_delay__ = self.voltage_sweep_delay.value()
 
 		if self.sweep_src.currentText() == "Current":
+			__sweep_mode__ = "CURR"
 			__sweep_func__ = self.keithley(self.sweep_inst).set_current
+			__sweep_meas__ = self.keithley(self.sweep_inst).set_current_meas
+			__sweep_arm__  = self.keithley(self.sweep_inst).set_current_arm
 			__sweep_delay__ = self.current_sweep_delay.value()
 
+		# Fixed source range from sweep extents
+		if self.fixed_range_enabled():
+			self.keithley(self.sweep_inst).fixed_ranges(__sweep_mode__, self._get_app_metadata("__sweep__"))
+
+		# Characterize integration time at the operating points of this sweep
+		self.keithley(self.sweep_inst).adapt_reset()
+
 		# Clear plot and zero arrays
 		start  = time.time()
 
@@ -981,8 +1314,8 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			
 			data.set_metadata(_root, "__type__", "iv-sweep-v-step")
 
-		# Add key to meta widget
-		self.meta_widget.add_meta_key(_root)		
+		# Add key to meta widget (on GUI thread)
+		self.render.push(self.meta_widget.add_meta_key, _root)		
 
 		# Create internal data structure for buffers
 		buffers = {
@@ -1015,6 +1348,17 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			if _buffer["inst"] not in ["__sweep__", "__step__"]:
 
 				self.keithley( _buffer["inst"] ).output_on()
+
+		# Buffers acquired on insturments other than the sweep insturment. In 
+		# overlapped mode, each distinct insturment is armed once per point.
+		_overlap_keys = ["__step__"] + [ _ for _ in ["__plotx__", "__ploty__"] if buffers[_]["inst"] not in ["__sweep__", "__step__"] ]
+		_overlap_devices = []
+
+		for _key in _overlap_keys:
+
+			_device = self.keithley( buffers[_key]["inst"] )
+			if ( _device is not self.keithley(self.sweep_inst) ) and ( _device not in _overlap_devices ):
+				_overlap_devices.append(_device)
 		
 
 		# Loop through step variables and generate subkeys
@@ -1055,11 +1399,18 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 				__step_func__(_step)
 
 				# Add axes handle to root
-				self.plot.add_axes_handle("111", _root, _color=_c)
+				self.render.push(self.plot.add_axes_handle, "111", _root, _c)
+
+				# Bias settle (adaptive settling covers the step at the first point)
+				if ( __sweep_delay__ != 0 ) and not self.settle_enabled(): 
+					self.thread_cancel.sleep(__sweep_delay__)
+
+				# Loop stage tracing
+				_trace = self._config.get_trace()
+				_lap   = _trace.clock()
 
-				# Bias settle
-				if __sweep_delay__ != 0: 
-					time.sleep(__sweep_delay__)
+				# Consecutive compliance readings
+				_cmpl_count = 0
 
 				# Loop through sweep variables
 				for _bias in self._get_app_metadata("__sweep__"):
@@ -1067,13 +1418,42 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 					# If thread is running
 					if self.thread_running:
 
-						# Set voltage/current bias
-						__sweep_func__(_bias)			
+						# Settle measured value at new bias
+						if self.settle_enabled():
+
+							if self.keithley(self.sweep_inst).settle(
+								__sweep_mode__, _bias, self.get_settle_tolerance(), __sweep_delay__) is None:
+								break
+
+							_lap = _trace.lap("iv-sweep-step", "settle", _lap)
+
+						# Overlapped acquisition. Set bias and start integration on 
+						# all insturments, then fetch results from each insturment.
+						if self.step_overlap.isChecked():
+
+							__sweep_arm__(_bias)
+							for _device in _overlap_devices:
+								_device.arm()
+
+							# Fetch once per armed insturment. Buffers on the sweep
+							# insturment reuse the sweep reading.
+							buffers["__sweep__"]["data"] = self.keithley( buffers["__sweep__"]["inst"] ).fetch_array()
+							_fetched = [ _device.fetch_array() for _device in _overlap_devices ]
+
+							for _key in _overlap_keys:
+
+								_device = self.keithley( buffers[_key]["inst"] )
+								if _device is self.keithley(self.sweep_inst):
+									buffers[_key]["data"] = buffers["__sweep__"]["data"]
+
+								else:
+									buffers[_key]["data"] = _fetched[ _overlap_devices.index(_device) ]
+
+						# Sequential acquisition. Set voltage/current bias and populate buffers
+						else:
 
-						# Get data from buffer
-						# Populate buffers
-						buffers["__sweep__"]["data"] = self.keithley( buffers["__sweep__"]["inst"] ).meas().split(",")
-						buffers["__step__"]["data"]  = self.keithley( buffers["__step__"]["inst"]  ).meas().split(",")
+							buffers["__sweep__"]["data"] = __sweep_meas__(_bias)
+							buffers["__step__"]["data"]  = self.keithley( buffers["__step__"]["inst"]  ).meas_array()
 
 						# Plot insturments will copy sweep data or meas() if needed
 						for plot_buffer in ["__plotx__", "__ploty__"]:
@@ -1086,25 +1466,46 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 
 								buffers[plot_buffer]["data"] = buffers["__step__"]["data"]
 
-							else: 	
+							# Already fetched in overlapped mode
+							elif not self.step_overlap.isChecked(): 	
 
-								buffers[plot_buffer]["data"] = self.keithley( buffers[plot_buffer]["inst"] ).meas().split(",")
+								buffers[plot_buffer]["data"] = self.keithley( buffers[plot_buffer]["inst"] ).meas_array()
+
+						_lap = _trace.lap("iv-sweep-step", "meas", _lap)
+
+						# Aborted while waiting for readings
+						if any( _buffer["data"] is None for _buffer in buffers.values() ):
+							break
+
+						# Measure range for next point
+						if self.fixed_range_enabled():
+							self.keithley(self.sweep_inst).track_range(
+								self.keithley(self.sweep_inst).sense_mode(__sweep_mode__), 
+								buffers["__sweep__"]["data"][1 if __sweep_mode__ == "VOLT" else 0])
+
+						# Integration time for next point
+						self.keithley(self.sweep_inst).adapt_nplc(
+							self.keithley(self.sweep_inst).sense_mode(__sweep_mode__), 
+							buffers["__sweep__"]["data"][1 if __sweep_mode__ == "VOLT" else 0])
 
 						# Apply delay
-						if __sweep_delay__ != 0: 
-							time.sleep(__sweep_delay__)
+						if ( __sweep_delay__ != 0 ) and not self.settle_enabled(): 
+							self.thread_cancel.sleep(__sweep_delay__)
+
+						_lap = _trace.lap("iv-sweep-step", "delay", _lap)
 
 						# Extract data from buffer
 						_now = float(time.time() - start)
 
 						# Append measured values to data arrays	
 						data.append_subkey_data(key,"t", _now )
-						data.append_subkey_data(key,"V0", float( buffers["__sweep__"]["data"][0]) )
-						data.append_subkey_data(key,"I0", float( buffers["__sweep__"]["data"][1]) )
-						data.append_subkey_data(key,"P0", float( buffers["__sweep__"]["data"][0]) * float(buffers["__sweep__"]["data"][1]) )
-						data.append_subkey_data(key,"V1", float( buffers["__step__"]["data"][0]) )
-						data.append_subkey_data(key,"I1", float( buffers["__step__"]["data"][1]) )
-						data.append_subkey_data(key,"P1", float( buffers["__step__"]["data"][0]) * float(buffers["__step__"]["data"][1]) )
+						data.append_subkey_data(key,"V0", buffers["__sweep__"]["data"][0] )
+						data.append_subkey_data(key,"I0", buffers["__sweep__"]["data"][1] )
+						data.append_subkey_data(key,"P0", buffers["__sweep__"]["data"][0] * buffers["__sweep__"]["data"][1] )
+						data.append_subkey_data(key,"V1", buffers["__step__"]["data"][0] )
+						data.append_subkey_data(key,"I1", buffers["__step__"]["data"][1] )
+						data.append_subkey_data(key,"P1", buffers["__step__"]["data"][0] * buffers["__step__"]["data"][1] )
+						_lap = _trace.lap("iv-sweep-step", "store", _lap)
 
 						# Sync x-axis data
 						if self.plot_x_data.currentText() == "Voltage":
@@ -1125,8 +1526,23 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 							p1 = buffers["__ploty__"]["data"][1]
 
 						# Update the data
-						self.plot.append_handle_data("111", _root, float(p0), float(p1), _handle_index)
-						self.plot.update_canvas()
+						self.render.append(self.plot, "111", _root, p0, p1, _handle_index)
+						_lap = _trace.lap("iv-sweep-step", "plot", _lap)
+
+						# Skip to next step after consecutive compliance readings on 
+						# the sweep or step device
+						if self.get_compliance_stop() > 0:
+
+							if ( self.keithley(self.sweep_inst).in_compliance(buffers["__sweep__"]["data"]) or 
+								self.keithley(self.step_inst).in_compliance(buffers["__step__"]["data"]) ):
+								_cmpl_count += 1
+
+							else:
+								_cmpl_count = 0
+
+							if _cmpl_count >= self.get_compliance_stop():
+								data.set_metadata(key, "__truncated__", _bias)
+								break
 				
 					else: 
 
@@ -1142,6 +1558,8 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		# Reset active keithleys
 		__sweep_func__(0.0)
 		__step_func__(0.0)
+		self.keithley(self.sweep_inst).range_restore(__sweep_mode__)
+		self.keithley(self.sweep_inst).nplc_restore()
 
 		# Loop throgh all insurments and disable outputs
 		for _key, _buffer in buffers.items():
@@ -1150,39 +1568,57 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 
 				self.keithley( _buffer["inst"] ).output_off()
 
+		# Abort latency
+		self.thread_cancel.set_metadata(data, _root)
 
-		# Reset sweep control and update measurement state to stop. 
-		# Post a button click event to the QStateMachine to trigger 
-		# a state transition if thread is still running (not aborted)
-		if self.thread_running:
-			self.meas_button.click()			
+		# Reset sweep control and update measurement state to stop. This
+		# runs on the GUI thread after the remaining plot updates
+		self.render.push(self.exec_meas_done)
 
 
-	# Execute Sweep Measurement
-	def exec_sweep_thread(self):
+	# Execute Sweep Measurement. In parallel mode, _name is the swept device
+	def exec_sweep_thread(self, _name=None):
 
-		# Generate data key 
+		# Sweep keithley
+		_keithley = self.keithley(self.sweep_inst) if _name is None else self.get_device_by_name(_name)
+
+		# Generate data key. Keys of parallel sweeps are salted with the
+		# device name, since they are generated at the same time.
 		data = self._get_data_object()
-		key  = data.add_hash_key("iv-sweep")
+		key  = data.add_hash_key("iv-sweep%s"%( _name or "" ))
 
 		# Add data fields to key	
 		data.set_subkeys(key, ["t", "V", "I", "P"])
 		data.set_metadata(key, "__type__", "iv-sweep")
 
-		# Add key to meta widget
-		self.meta_widget.add_meta_key(key)
+		if _name is not None:
+			data.set_metadata(key, "__device__", _name)
+
+		# Add key to meta widget (on GUI thread)
+		self.render.push(self.meta_widget.add_meta_key, key)
 
 		# Generate function pointer for voltage/current mode
 		if self.sweep_src.currentText() == "Voltage":
-			__sweep_func__  = self.keithley(self.sweep_inst).set_voltage
+			__sweep_mode__  = "VOLT"
+			__sweep_func__  = _keithley.set_voltage
+			__sweep_meas__  = _keithley.set_voltage_meas
 			__sweep_delay__ = self.voltage_sweep_delay.value()
 
 		if self.sweep_src.currentText() == "Current":
-			__sweep_func__  = self.keithley(self.sweep_inst).set_current
+			__sweep_mode__  = "CURR"
+			__sweep_func__  = _keithley.set_current
+			__sweep_meas__  = _keithley.set_current_meas
 			__sweep_delay__ = self.current_sweep_delay.value()
 
+		# Fixed source range from sweep extents
+		if self.fixed_range_enabled():
+			_keithley.fixed_ranges(__sweep_mode__, self._get_app_metadata("__sweep__"))
+
+		# Characterize integration time at the operating points of this sweep
+		_keithley.adapt_reset()
+
 		# Clear plot and zero arrays
-		handle = self.plot.add_axes_handle("111", key)
+		self.render.push(self.plot.add_axes_handle, "111", key)
 		start  = time.time()
 		
 		# Create internal data structure for buffers
@@ -1195,7 +1631,7 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		# x-axis insturment
 		for plot_key, plot_inst in zip( ["__plotx__", "__ploty__" ], [self.plot_x_inst, self.plot_y_inst] ):
 
-			if self.sweep_inst.currentText() == plot_inst.currentText():
+			if ( self.sweep_inst.currentText() == plot_inst.currentText() ) or ( _name is not None ):
 
 				buffers[plot_key] = {"inst" : "__sweep__", "data" : None }
 
@@ -1207,22 +1643,39 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 		# Loop throgh all insurments and enable outputs
 		for _key, _buffer in buffers.items():
 
-			if _buffer["inst"] not in ["__sweep__"]:
+			if _key == "__sweep__":
+
+				_keithley.output_on()
+
+			elif _buffer["inst"] not in ["__sweep__"]:
 
 				self.keithley( _buffer["inst"] ).output_on()
 
 
+		# Loop stage tracing
+		_trace = self._config.get_trace()
+		_lap   = _trace.clock()
+
+		# Consecutive compliance readings
+		_cmpl_count = 0
+
 		# Loop through sweep variables
 		for _bias in self._get_app_metadata("__sweep__"):
 
 			# If thread is running
 			if self.thread_running:
 
-				# Set voltage/current bias
-				__sweep_func__(_bias)			
+				# Settle measured value at new bias
+				if self.settle_enabled():
+
+					if _keithley.settle(
+						__sweep_mode__, _bias, self.get_settle_tolerance(), __sweep_delay__) is None:
+						break
 
-				# Populate buffers
-				buffers["__sweep__"]["data"] = self.keithley( buffers["__sweep__"]["inst"] ).meas().split(",")
+					_lap = _trace.lap("iv-sweep", "settle", _lap)
+
+				# Set voltage/current bias and populate buffers
+				buffers["__sweep__"]["data"] = __sweep_meas__(_bias)
 
 				# Plot insturments will copy sweep data or meas() if needed
 				for plot_buffer in ["__plotx__", "__ploty__"]:
@@ -1233,19 +1686,39 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 
 					else: 	
 
-						buffers[plot_buffer]["data"] = self.keithley( buffers[plot_buffer]["inst"] ).meas().split(",")
+						buffers[plot_buffer]["data"] = self.keithley( buffers[plot_buffer]["inst"] ).meas_array()
+
+				_lap = _trace.lap("iv-sweep", "meas", _lap)
+
+				# Aborted while waiting for readings
+				if any( _buffer["data"] is None for _buffer in buffers.values() ):
+					break
 
-				if __sweep_delay__ != 0: 
-					time.sleep(__sweep_delay__)
+				# Measure range for next point
+				if self.fixed_range_enabled():
+					_keithley.track_range(
+						_keithley.sense_mode(__sweep_mode__), 
+						buffers["__sweep__"]["data"][1 if __sweep_mode__ == "VOLT" else 0])
+
+				# Integration time for next point
+				_keithley.adapt_nplc(
+					_keithley.sense_mode(__sweep_mode__), 
+					buffers["__sweep__"]["data"][1 if __sweep_mode__ == "VOLT" else 0])
+
+				if ( __sweep_delay__ != 0 ) and not self.settle_enabled(): 
+					self.thread_cancel.sleep(__sweep_delay__)
+
+				_lap = _trace.lap("iv-sweep", "delay", _lap)
 
 				# Extract data from buffer
 				_now = float(time.time() - start)
 
 				# Append measured values to data arrays	
 				data.append_subkey_data(key,"t", _now )
-				data.append_subkey_data(key,"V", float( buffers["__sweep__"]["data"][0]) )
-				data.append_subkey_data(key,"I", float( buffers["__sweep__"]["data"][1]) )
-				data.append_subkey_data(key,"P", float( buffers["__sweep__"]["data"][0]) * float(buffers["__sweep__"]["data"][1]) )
+				data.append_subkey_data(key,"V", buffers["__sweep__"]["data"][0] )
+				data.append_subkey_data(key,"I", buffers["__sweep__"]["data"][1] )
+				data.append_subkey_data(key,"P", buffers["__sweep__"]["data"][0] * buffers["__sweep__"]["data"][1] )
+				_lap = _trace.lap("iv-sweep", "store", _lap)
 
 				# Sync x-axis data
 				if self.plot_x_data.currentText() == "Voltage":
@@ -1266,25 +1739,202 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 					p1 = buffers["__ploty__"]["data"][1]
 
 				# Update the data
-				self.plot.append_handle_data("111", key, float(p0), float(p1))
-				self.plot.update_canvas()
+				self.render.append(self.plot, "111", key, p0, p1)
+				_lap = _trace.lap("iv-sweep", "plot", _lap)
+
+				# End sweep after consecutive compliance readings
+				if self.get_compliance_stop() > 0:
+
+					if _keithley.in_compliance(buffers["__sweep__"]["data"]):
+						_cmpl_count += 1
+
+					else:
+						_cmpl_count = 0
+
+					if _cmpl_count >= self.get_compliance_stop():
+						data.set_metadata(key, "__truncated__", _bias)
+						break
 		
 		# Reset Keithley
 		__sweep_func__(0.0)
+		_keithley.range_restore(__sweep_mode__)
+		_keithley.nplc_restore()
 	
 		# Loop throgh all insurments and enable outputs
 		for _key, _buffer in buffers.items():
 
-			if _buffer["inst"] not in ["__sweep__"]:
+			if _key == "__sweep__":
+
+				_keithley.output_off()
+
+			elif _buffer["inst"] not in ["__sweep__"]:
 
 				self.keithley( _buffer["inst"] ).output_off()
 
+		# Abort latency
+		self.thread_cancel.set_metadata(data, key)
 
-		# Reset sweep control and update measurement state to stop. 
-		# Post a button click event to the QStateMachine to trigger 
-		# a state transition if thread is still running (not aborted)
-		if self.thread_running:
-			self.meas_button.click()
+		# Reset sweep control and update measurement state to stop. This
+		# runs on the GUI thread after the remaining plot updates. Parallel
+		# sweeps are completed by exec_parallel_sweep_thread.
+		if _name is None:
+			self.render.push(self.exec_meas_done)
+
+	# Execute Sweep Measurement (instrument triggered). The sweep array is split 
+	# into chunks. Each chunk is programmed into the insturment, run on a single
+	# trigger and read back in one transfer. Linear sweeps are programmed into
+	# the source-sweep subsystem, and hysteresis sweeps are uploaded as source
+	# lists which are run back-to-back. In parallel mode, _name is the swept
+	# device.
+	def exec_hw_sweep_thread(self, _name=None):
+
+		# Sweep keithley
+		_keithley = self.keithley(self.sweep_inst) if _name is None else self.get_device_by_name(_name)
+
+		# Generate data key (see exec_sweep_thread)
+		data = self._get_data_object()
+		key  = data.add_hash_key("iv-sweep%s"%( _name or "" ))
+
+		# Add data fields to key	
+		data.set_subkeys(key, ["t", "V", "I", "P"])
+		data.set_metadata(key, "__type__", "iv-sweep")
+
+		if _name is not None:
+			data.set_metadata(key, "__device__", _name)
+
+		# Add key to meta widget (on GUI thread)
+		self.render.push(self.meta_widget.add_meta_key, key)
+
+		# Source mode and delay for voltage/current mode
+		if self.sweep_src.currentText() == "Voltage":
+			__sweep_mode__  = "VOLT"
+			__sweep_func__  = _keithley.set_voltage
+			__sweep_delay__ = self.voltage_sweep_delay.value()
+
+		if self.sweep_src.currentText() == "Current":
+			__sweep_mode__  = "CURR"
+			__sweep_func__  = _keithley.set_current
+			__sweep_delay__ = self.current_sweep_delay.value()
+
+		# Add axes handle
+		self.render.push(self.plot.add_axes_handle, "111", key)
+
+		# Reading element positions
+		_v, _i, _t = [ _keithley.element_index(_) for _ in ["VOLT", "CURR", "TIME"] ]
+
+		# Sweep array
+		_sweep  = self._get_app_metadata("__sweep__")
+
+		# Split linear sweep into (approximately) ten chunks for plot updates
+		if self.sweep_hist.currentText() == "None":
+			__sweep_prog__ = _keithley.sweep_src
+			_chunks = [ (_[0], _[-1], len(_)) for _ in np.array_split(_sweep, min( len(_sweep), 10 ) ) ]
+
+		# Split hysteresis sweep into source list segments
+		else:
+			__sweep_prog__ = _keithley.list_src
+			_chunks = [ (_, ) for _ in _keithley.split_list(_sweep) ]
+
+		# Fixed source range from sweep extents
+		if self.fixed_range_enabled():
+			_keithley.fixed_ranges(__sweep_mode__, _sweep)
+
+		# Measurement interval is applied as source delay on each point
+		_keithley.source_delay(__sweep_delay__)
+		_keithley.reset_timestamp()
+		_keithley.output_on()
+
+		# Elapsed time when reading timestamps are not enabled
+		start, _now = time.time(), 0.0
+
+		# Loop stage tracing
+		_trace = self._config.get_trace()
+		_lap   = _trace.clock()
+
+		# Loop through sweep chunks
+		for _chunk in _chunks:
+
+			# If thread is running
+			if self.thread_running:
+
+				# Program chunk and read back all readings
+				__sweep_prog__(__sweep_mode__, *_chunk)
+				_buffer = _keithley.read_buffer()
+				_lap = _trace.lap("iv-sweep", "meas", _lap)
+
+				# Aborted while waiting for readings
+				if _buffer is None:
+					break
+
+				# Measure range for next chunk
+				if self.fixed_range_enabled():
+					_keithley.track_range(_keithley.sense_mode(__sweep_mode__), _buffer[:, _i if __sweep_mode__ == "VOLT" else _v])
+
+				# Use reading timestamps if enabled. Otherwise distribute chunk 
+				# readings evenly over the elapsed time of the chunk.
+				if _t is not None:
+					_time = _buffer[:, _t]
+
+				else:
+					_time = np.linspace(_now, float(time.time() - start), len(_buffer) + 1)[1:]
+					_now  = _time[-1]
+
+				# Append measured values to data arrays
+				data.get_subkey_data(key, "t").extend( _time )
+				data.get_subkey_data(key, "V").extend( _buffer[:, _v] )
+				data.get_subkey_data(key, "I").extend( _buffer[:, _i] )
+				data.get_subkey_data(key, "P").extend( _buffer[:, _v] * _buffer[:, _i] )
+				_lap = _trace.lap("iv-sweep", "store", _lap)
+
+				# Sync axes data
+				p0 = _buffer[:, _v] if self.plot_x_data.currentText() == "Voltage" else _buffer[:, _i]
+				p1 = _buffer[:, _v] if self.plot_y_data.currentText() == "Voltage" else _buffer[:, _i]
+
+				# Update the data
+				self.render.append(self.plot, "111", key, p0, p1)
+				_lap = _trace.lap("iv-sweep", "plot", _lap)
+
+		# Reset Keithley to fixed source mode
+		_keithley.fixed_src(__sweep_mode__)
+		_keithley.source_delay_restore()
+		_keithley.range_restore(__sweep_mode__)
+		__sweep_func__(0.0)
+		_keithley.output_off()
+
+		# Abort latency
+		self.thread_cancel.set_metadata(data, key)
+
+		# Reset sweep control and update measurement state to stop. This
+		# runs on the GUI thread after the remaining plot updates. Parallel
+		# sweeps are completed by exec_parallel_sweep_thread.
+		if _name is None:
+			self.render.push(self.exec_meas_done)
+
+	# Execute Parallel Sweep Measurement. The sweep is run concurrently on all
+	# swept devices, one thread per device, such that the total time is that
+	# of a single sweep. Results are stored under separate keys and overlaid
+	# on the plot.
+	def exec_parallel_sweep_thread(self):
+
+		# Instrument or software sweep on each device
+		if self.sweep_mode.currentText() == "Instrument":
+			__sweep_thread__ = self.exec_hw_sweep_thread
+
+		else:
+			__sweep_thread__ = self.exec_sweep_thread
+
+		_threads = [ threading.Thread(target=__sweep_thread__, args=(_name, )) for _name in self.get_sweep_names() ]
+
+		for _thread in _threads:
+			_thread.daemon = True
+			_thread.start()
+
+		# Wait for all sweeps to complete
+		for _thread in _threads:
+			_thread.join()
+
+		# Reset sweep control and update measurement state to stop
+		self.render.push(self.exec_meas_done)
 
 	# Function we run when we enter run state
 	def exec_meas_run(self):
@@ -1302,11 +1952,20 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			# Disable controls (sweep)
 			self.sweep_src.setEnabled(False)
 			self.sweep_inst.setEnabled(False)
+			self.sweep_mode.setEnabled(False)
+			self.sweep_range.setEnabled(False)
+			self.sweep_settle.setEnabled(False)
+			self.sweep_settle_tol.setEnabled(False)
+			self.sweep_cmpl_stop.setEnabled(False)
+			self.sweep_parallel.setEnabled(False)
+			self.sweep_parallel_inst.setEnabled(False)
 			
 			# Disable controls (step)
 			self.step_src.setEnabled(False)
 			self.step_inst.setEnabled(False)
 			self.step_button.setEnabled(False)
+			self.step_overlap.setEnabled(False)
+			self.step_sync.setEnabled(False)
 
 			# Disable controls (save)
 			self.save_widget.setEnabled(False)
@@ -1318,17 +1977,50 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			self.plot_y_inst.setEnabled(False)
 			self.plot_y_data.setEnabled(False)
 
+			# Program reading elements on all devices in measurement. The status 
+			# word is needed to detect compliance.
+			_elements = self._get_app_metadata("__elements__")
+			if self.get_compliance_stop() > 0:
+				_elements = _elements + ["STAT"]
+
+			self.thread_cancel.reset()
+			_names = [ _.currentText() for _ in [self.sweep_inst, self.step_inst, self.plot_x_inst, self.plot_y_inst] ]
+			self._config.rewind_replay(_names + self.get_sweep_names())
+			for _name in _names + self.get_sweep_names():
+				self._config.update_elements(_name, _elements)
+
+				# Waits for readings are cancelled on abort
+				if self.get_device_by_name(_name) is not None:
+					self.get_device_by_name(_name).set_cancel(self.thread_cancel)
+
 	 		# Check app meta and run sweep or sweep-step tread
-			if self._get_app_metadata("__exec_step__") == True:
+			if self.parallel_enabled():
+				self.thread = threading.Thread(target=self.exec_parallel_sweep_thread, args=())
+
+			elif ( self._get_app_metadata("__exec_step__") == True ) and self.sync_enabled():
+				self.thread = threading.Thread(target=self.exec_sync_sweep_step_thread, args=())
+
+			elif self._get_app_metadata("__exec_step__") == True:
 				self.thread = threading.Thread(target=self.exec_sweep_step_thread, args=())
 
+			elif self.hw_sweep_enabled():
+				self.thread = threading.Thread(target=self.exec_hw_sweep_thread, args=())
+
 			else:	
 				self.thread = threading.Thread(target=self.exec_sweep_thread, args=())
 
 
 			self.thread.daemon = True						# Daemonize thread
-			self.thread.start()         					# Start the execution
 			self.thread_running = True
+			self.thread.start()         					# Start the execution
+
+	# Measurement thread completed. Post a button click event to the 
+	# QStateMachine to trigger a state transition if thread is still 
+	# running (not aborted)
+	def exec_meas_done(self):
+
+		if self.thread_running:
+			self.meas_button.click()
 
 	# Function we run when we enter abort state
 	def exec_meas_stop(self):
@@ -1343,11 +2035,20 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			# Enable controls (sweep)
 			self.sweep_src.setEnabled(True)
 			self.sweep_inst.setEnabled(True)
+			self.sweep_mode.setEnabled(True)
+			self.sweep_range.setEnabled(True)
+			self.sweep_settle.setEnabled(True)
+			self.sweep_settle_tol.setEnabled(True)
+			self.sweep_cmpl_stop.setEnabled(True)
+			self.sweep_parallel.setEnabled(True)
+			self.sweep_parallel_inst.setEnabled(True)
 
 			# Enable controls (step)
 			self.step_src.setEnabled(True)
 			self.step_inst.setEnabled(True)
 			self.step_button.setEnabled(True)
+			self.step_overlap.setEnabled(True)
+			self.step_sync.setEnabled(True)
 
 			# Enable controls (save)
 			self.save_widget.setEnabled(True)
@@ -1359,6 +2060,10 @@ class QKeithleySweep(QVisaApplication.QVisaApplication):
 			self.plot_y_inst.setEnabled(True)
 			self.plot_y_data.setEnabled(True)
 			
-			# Kill measurement thread
+			# Kill measurement thread. Cancelling wakes the thread from waits
+			self.thread_cancel.cancel()
 			self.thread_running = False
 			self.thread.join()  # Waits for thread to complete
+
+			# Draw remaining samples
+			self.render.drain()
@@ -0,0 +1,262 @@
+# ---------------------------------------------------------------------------------
+# 	devicemodels
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import numpy as np
+
+# Thermal voltage at 300K
+__vt__ = 0.025852
+
+# Device models for the simulated keithley2400. Each model is a device under 
+# test with one or more terminals referenced to ground. Simulated sourcemeters
+# are connected to a terminal and source a voltage or current into it. Models
+# with several terminals (MOSFET, BJT) can be shared between sourcemeters so
+# that e.g. one sourcemeter sweeps the drain while another steps the gate.
+
+# Limit exponent arguments to avoid overflow 
+def _exp(_x):
+	return np.exp( min(_x, 200.0) )
+
+# Solve _func(_x) = _y for a monotonically increasing function by bisection on 
+# the interval [_lo, _hi]. Returns the nearest endpoint if there is no solution.
+def _solve(_func, _y, _lo, _hi, _iter=64):
+
+	if _func(_lo) >= _y:
+		return _lo
+
+	if _func(_hi) <= _y:
+		return _hi
+
+	for _ in range(_iter):
+
+		_mid = 0.5 * ( _lo + _hi )
+
+		if _func(_mid) < _y:
+			_lo = _mid
+		else:
+			_hi = _mid
+
+	return 0.5 * ( _lo + _hi )
+
+
+####################################
+#	BASE MODEL
+#
+
+class device:
+
+	# Terminal names. Two terminal devices have a single terminal
+	terminals = ["+"]
+
+	def __init__(self):
+
+		# Voltage applied to each terminal
+		self._bias = {_ : 0.0 for _ in self.terminals}
+
+	# Terminal bias 
+	def set_bias(self, _terminal, _voltage):
+		self._bias[_terminal] = float(_voltage)
+
+	def get_bias(self, _terminal):
+		return self._bias[_terminal]
+
+	# Terminal voltages with _terminal held at _voltage
+	def _with_bias(self, _terminal, _voltage):
+		_bias = dict(self._bias)
+		_bias[_terminal] = float(_voltage)
+		return _bias
+
+	# Current flowing into _terminal when it is held at _voltage. Other 
+	# terminals remain at their present bias. Overridden by each model. 
+	def current(self, _terminal, _voltage):
+		return 0.0
+
+	# Voltage on _terminal which drives _current into it. The result is limited 
+	# to +/-_limit (the voltage compliance of the sourcemeter). 
+	def voltage(self, _terminal, _current, _limit):
+		return _solve(lambda _v: self.current(_terminal, _v), _current, -abs(_limit), abs(_limit))
+
+
+####################################
+#	TWO TERMINAL MODELS
+#
+
+# Linear resistor
+class resistor(device):
+
+	def __init__(self, _r=1e3):
+
+		super(resistor, self).__init__()
+		self._r = float(_r)
+
+	def current(self, _terminal, _voltage):
+		return _voltage / self._r
+
+	def voltage(self, _terminal, _current, _limit):
+		return float( np.clip(_current * self._r, -abs(_limit), abs(_limit)) )
+
+
+# Ideal diode (Shockley equation)
+class diode(device):
+
+	def __init__(self, _is=1e-12, _n=1.5):
+
+		super(diode, self).__init__()
+		self._is = float(_is)
+		self._n  = float(_n)
+
+	def current(self, _terminal, _voltage):
+		return self._is * ( _exp( _voltage / ( self._n * __vt__ ) ) - 1.0 )
+
+
+# Diode with series resistance. Voltage is explicit in the current, so 
+# the current is obtained by solving for the applied voltage.
+class diode_resistor(diode):
+
+	def __init__(self, _is=1e-12, _n=1.5, _r=10.0):
+
+		super(diode_resistor, self).__init__(_is, _n)
+		self._r = float(_r)
+
+	def _voltage(self, _current):
+		return _current * self._r + self._n * __vt__ * np.log( max( 1.0 + _current / self._is, 1e-300) )
+
+	def current(self, _terminal, _voltage):
+		_imax = abs(_voltage) / self._r + self._is
+		return _solve(self._voltage, _voltage, -self._is, _imax)
+
+
+# Solar cell (single diode model with series and shunt resistance). Current 
+# flowing into the cell is positive, so the cell delivers power in the fourth
+# quadrant. Irradiance is specified in suns (1 sun = 1000W/m^2).
+class solar_cell(device):
+
+	def __init__(self, _isc=35e-3, _is=1e-10, _n=1.5, _rs=1.0, _rsh=1e4, _irradiance=1.0):
+
+		super(solar_cell, self).__init__()
+		self._isc = float(_isc)
+		self._is  = float(_is)
+		self._n   = float(_n)
+		self._rs  = float(_rs)
+		self._rsh = float(_rsh)
+		self._irradiance = float(_irradiance)
+
+	# Irradiance in suns
+	def set_irradiance(self, _irradiance):
+		self._irradiance = float(_irradiance)
+
+	def get_irradiance(self):
+		return self._irradiance
+
+	def current(self, _terminal, _voltage):
+
+		_iph = self._isc * self._irradiance
+
+		# Junction current for a given terminal current 
+		def _residual(_current):
+			_vj = _voltage - _current * self._rs
+			return _current - ( self._is * ( _exp( _vj / ( self._n * __vt__ ) ) - 1.0 ) + _vj / self._rsh - _iph )
+
+		_imax = _iph + abs(_voltage) / self._rs + 1.0
+		return _solve(_residual, 0.0, -_imax, _imax)
+
+
+####################################
+#	THREE TERMINAL MODELS
+#
+
+# n-channel MOSFET with grounded source. Square law model with channel length 
+# modulation. The overdrive voltage is smoothed to give a subthreshold tail.
+class mosfet(device):
+
+	terminals = ["Drain", "Gate"]
+
+	def __init__(self, _vth=1.0, _k=1e-3, _lambda=0.02, _n=1.5, _rg=1e12):
+
+		super(mosfet, self).__init__()
+		self._vth = float(_vth)
+		self._k   = float(_k)
+		self._lambda = float(_lambda)
+		self._n   = float(_n)
+		self._rg  = float(_rg)
+
+	def current(self, _terminal, _voltage):
+
+		_bias = self._with_bias(_terminal, _voltage)
+
+		# Gate leakage
+		if _terminal == "Gate":
+			return _bias["Gate"] / self._rg
+
+		# Drain current
+		_vd  = _bias["Drain"]
+		_vov = 2.0 * self._n * __vt__ * np.log1p( _exp( ( _bias["Gate"] - self._vth ) / ( 2.0 * self._n * __vt__ ) ) )
+
+		if abs(_vd) < _vov:
+			_id = self._k * ( _vov * _vd - 0.5 * _vd * abs(_vd) )
+
+		else: 
+			_id = np.sign(_vd) * 0.5 * self._k * _vov**2
+
+		return _id * ( 1.0 + self._lambda * abs(_vd) )
+
+
+# NPN bipolar transistor with grounded emitter (Ebers-Moll forward active
+# model with Early effect)
+class bjt(device):
+
+	terminals = ["Collector", "Base"]
+
+	def __init__(self, _is=1e-14, _beta=100.0, _va=50.0):
+
+		super(bjt, self).__init__()
+		self._is   = float(_is)
+		self._beta = float(_beta)
+		self._va   = float(_va)
+
+	def current(self, _terminal, _voltage):
+
+		_bias = self._with_bias(_terminal, _voltage)
+		_ibe  = self._is * ( _exp( _bias["Base"] / __vt__ ) - 1.0 )
+
+		# Base current
+		if _terminal == "Base":
+			return _ibe / self._beta
+
+		# Collector current
+		_vce = _bias["Collector"]
+		return _ibe * ( 1.0 - _exp( -_vce / __vt__ ) ) * ( 1.0 + max(_vce, -0.5 * self._va) / self._va )
+
+
+# Model registry (display name -> class)
+models = {
+	"Resistor"		: resistor,
+	"Diode"			: diode,
+	"Diode-Resistor": diode_resistor,
+	"Solar Cell"	: solar_cell,
+	"MOSFET"		: mosfet,
+	"BJT"			: bjt,
+}
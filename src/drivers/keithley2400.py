@@ -0,0 +1,992 @@
+# ---------------------------------------------------------------------------------
+# 	keithley2400 -> PyQtVisa.drivers.keithley2400
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import time
+import pyvisa
+import threading
+import contextlib
+import numpy as np
+
+# Import upstream driver
+from PyQtVisa.drivers import keithley2400 as _keithley2400
+
+# Extended keithley2400 driver. Adds access to the source-sweep and trigger
+# subsystems of the 2400 so that applications can hand entire sweeps to the
+# insturment rather than making one bus round trip per bias point. Source
+# and measurement settings are cached so that redundant writes are skipped.
+class keithley2400(_keithley2400.keithley2400):
+
+	# Initialize Driver
+	def __init__(self, _resource):
+
+		# Bus lock, thread with a pending reading and number of waiting 
+		# clients (see SHARED ACCESS)
+		self._lock = threading.Condition(threading.RLock())
+		self._owner = None
+		self._waiting = 0
+
+		# Call super
+		super(keithley2400, self).__init__(_resource)
+
+		# Reading elements returned by the insturment (*RST default)
+		self._elements = ["VOLT", "CURR", "RES", "TIME", "STAT"]
+
+		# Maximum number of points in a source list
+		self._list_limit = 100
+
+		# Reading transfer format ("ASCII" or "REAL32")
+		self._format = "ASCII"
+
+		# Write-through shadow of insturment state
+		self._state = {}
+
+		# Reading completion ("BLOCK" or "SRQ") and cancellation callback
+		self._completion = "BLOCK"
+		self._cancel = None
+
+		# Programmed trigger model (trigger count, trigger delay and source 
+		# delay). Used to bound waits for readings (see read_timeout)
+		self._trigger = {"count" : 1, "delay" : 0.0, "source" : None}
+
+		# Throughput profile settings (*RST defaults)
+		self._profile = {"nplc" : 1.0, "azer" : "ON", "display" : "ON", "range" : "AUTO", "delay" : "AUTO", "filter" : 0}
+
+		# Power line frequency (queried on first use)
+		self._line_freq = None
+
+		# Adaptive integration. Relative noise target (None = fixed NPLC) and 
+		# integration time selected for each decade of the measured value
+		self._noise_target = None
+		self._nplc_map = {}
+
+		# Source and measure ranges of the insturment
+		self._ranges = {
+			"VOLT" : [0.2, 2.0, 20.0, 200.0],
+			"CURR" : [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0]
+		}
+
+	####################################
+	#	GENERAL
+	#
+
+	# Reset command. Reading format and elements return to *RST defaults
+	def RST(self):
+		super(keithley2400, self).RST()
+		self._profile = {"nplc" : 1.0, "azer" : "ON", "display" : "ON", "range" : "AUTO", "delay" : "AUTO", "filter" : 0}
+		self._format = "ASCII"
+		self._elements = ["VOLT", "CURR", "RES", "TIME", "STAT"]
+		self._trigger = {"count" : 1, "delay" : 0.0, "source" : None}
+		self.invalidate()
+
+	# Write command. Cached state is invalidated on bus errors since we no
+	# longer know which settings reached the insturment.
+	def write(self, _data):
+
+		try:
+			with self._lock:
+				super(keithley2400, self).write(_data)
+
+		except pyvisa.VisaIOError:
+			self.invalidate()
+			raise
+
+	def query(self, _data, print_buffer=False):
+
+		with self._lock:
+			return super(keithley2400, self).query(_data, print_buffer)
+
+	####################################
+	#	SHARED ACCESS
+	#
+
+	# Bus transactions are serialized on self._lock so that the insturment 
+	# server (QKeithleyBroker) can interleave client commands with traffic 
+	# from applications. A thread which triggers a reading and fetches it 
+	# later (arm/fetch, SRQ completion) holds the insturment until the 
+	# reading has been fetched, so that no client command is sent in between.
+	# The lock is not fair, so applications let waiting clients go first 
+	# before starting a transaction (_yield).
+	def _yield(self):
+
+		if self._waiting and ( self._owner != threading.get_ident() ):
+			with self._lock:
+				self._lock.wait_for(lambda: self._waiting == 0)
+
+	def _hold(self):
+
+		self._yield()
+		with self._lock:
+			self._owner = threading.get_ident()
+
+	def _release(self):
+		with self._lock:
+			self._owner = None
+			self._lock.notify_all()
+
+	# Acquire the insturment for a transaction from another client. Waits
+	# until no reading is pending on another thread. Yields False if this 
+	# did not happen within _timeout seconds.
+	@contextlib.contextmanager
+	def acquire(self, _timeout=None):
+
+		with self._lock:
+
+			self._waiting += 1
+			try:
+				_acquired = self._lock.wait_for(lambda: self._owner in [None, threading.get_ident()], _timeout)
+
+			finally:
+				self._waiting -= 1
+				self._lock.notify_all()
+
+			yield _acquired
+
+	####################################
+	#	STATE CACHE
+	#
+
+	# Clear cached state. The next write of every setting is sent to the insturment
+	def invalidate(self):
+		self._state = {}
+
+	# Check if a setting already holds a value
+	def _cached(self, _key, _value):
+		return ( _key in self._state ) and ( self._state[_key] == _value )
+
+	# Write-through update of a setting. __func__ writes the setting to the 
+	# insturment and is skipped if the setting would not change.
+	def _update_state(self, _key, _value, __func__, *args):
+
+		if not self._cached(_key, _value):
+			__func__(*args)
+			self._state[_key] = _value
+
+	# Drop settings which are modified by the insturment itself
+	def _drop_state(self, *_keys):
+		for _key in _keys:
+			self._state.pop(_key, None)
+
+	####################################
+	#	CACHED SETTINGS
+	#
+
+	# Two/four wire sense mode
+	def four_wire_sense_on(self):
+		self._update_state("sense", "4-wire", super(keithley2400, self).four_wire_sense_on)
+
+	def four_wire_sense_off(self):
+		self._update_state("sense", "2-wire", super(keithley2400, self).four_wire_sense_off)
+
+	# Front versus rear output
+	def output_route_front(self):
+		self._update_state("route", "FRON", super(keithley2400, self).output_route_front)
+
+	def output_route_rear(self):
+		self._update_state("route", "REAR", super(keithley2400, self).output_route_rear)
+
+	# Integration time nPLCs
+	def update_nplc(self, _value):
+		self._update_state("nplc", float(_value), super(keithley2400, self).update_nplc, _value)
+
+	# Source mode (fixed)
+	def voltage_src(self):
+		self._update_state("src", "VOLT", super(keithley2400, self).voltage_src)
+
+	def current_src(self):
+		self._update_state("src", "CURR", super(keithley2400, self).current_src)
+
+	# Source level
+	def set_voltage(self, _level):
+		self._update_state("level:VOLT", float(_level), super(keithley2400, self).set_voltage, _level)
+
+	def set_current(self, _level):
+		self._update_state("level:CURR", float(_level), super(keithley2400, self).set_current, _level)
+
+	# Compliance. Note that setting compliance also enables measure autorange.
+	# If the throughput profile uses fixed ranges, the measure range is fixed 
+	# to the range containing the compliance level.
+	def current_cmp(self, _level):
+
+		if not self._cached("cmpl:CURR", float(_level)):
+			super(keithley2400, self).current_cmp(_level)
+			self._state["cmpl:CURR"] = float(_level)
+			self._state["range:SENS:CURR"] = "AUTO"
+
+		if self._profile["range"] == "FIXED":
+			self.sense_range("CURR", float(_level))
+
+	def voltage_cmp(self, _level):
+
+		if not self._cached("cmpl:VOLT", float(_level)):
+			super(keithley2400, self).voltage_cmp(_level)
+			self._state["cmpl:VOLT"] = float(_level)
+			self._state["range:SENS:VOLT"] = "AUTO"
+
+		if self._profile["range"] == "FIXED":
+			self.sense_range("VOLT", float(_level))
+
+	# Source range. _mode is "VOLT" or "CURR" and _range is "AUTO" or range value
+	def source_range(self, _mode, _range):
+
+		if not self._cached("range:SOUR:%s"%_mode, _range):
+
+			if _range == "AUTO":
+				self.write(':SOUR:%s:RANG:AUTO ON'%str(_mode))
+
+			else:
+				self.write(':SOUR:%s:RANG %s'%(str(_mode), str(_range)))
+
+			self._state["range:SOUR:%s"%_mode] = _range
+
+	# Measure range. _mode is "VOLT" or "CURR" and _range is "AUTO" or range value
+	def sense_range(self, _mode, _range):
+
+		if not self._cached("range:SENS:%s"%_mode, _range):
+
+			if _range == "AUTO":
+				self.write(':SENS:%s:RANG:AUTO ON'%str(_mode))
+
+			else:
+				self.write(':SENS:%s:RANG %s'%(str(_mode), str(_range)))
+
+			self._state["range:SENS:%s"%_mode] = _range
+
+	####################################
+	#	RANGE SELECTION
+	#
+
+	# Smallest range containing _level. _mode is "VOLT" or "CURR"
+	def best_range(self, _mode, _level):
+
+		for _range in self._ranges[_mode]:
+			if abs(float(_level)) <= _range:
+				return _range
+
+		return self._ranges[_mode][-1]
+
+	# The measured function when sourcing _mode
+	def sense_mode(self, _mode):
+		return "CURR" if _mode == "VOLT" else "VOLT"
+
+	# Fix the source range to the extents of a sweep (_values) so that the 
+	# source does not re-range between points. The measure range is set by 
+	# track_range() once readings are available.
+	def fixed_ranges(self, _mode, _values):
+		self.source_range(_mode, self.best_range(_mode, np.max(np.abs(_values))))
+		self.sense_range(self.sense_mode(_mode), "AUTO")
+
+	# Select the measure range from the last reading(s). The measure range is
+	# held at the range containing the compliance level, which is the lowest 
+	# fixed range that does not clamp compliance. Readings more than _decades
+	# below this range lose resolution (range offset error), so autorange is
+	# used for them instead.
+	def track_range(self, _mode, _values, _decades=1):
+
+		_cmpl = self._state.get("cmpl:%s"%_mode)
+		if _cmpl is None:
+			return
+
+		_range = self.best_range(_mode, _cmpl)
+		if np.min(np.abs(_values)) < _range * 10**(-_decades):
+			self.sense_range(_mode, "AUTO")
+
+		else:
+			self.sense_range(_mode, _range)
+
+	# Restore source autorange and the measure range of the active profile
+	def range_restore(self, _mode):
+
+		_sense = self.sense_mode(_mode)
+		self.source_range(_mode, "AUTO")
+
+		if ( self._profile["range"] == "FIXED" ) and ( self._state.get("cmpl:%s"%_sense) is not None ):
+			self.sense_range(_sense, self._state["cmpl:%s"%_sense])
+
+		else:
+			self.sense_range(_sense, "AUTO")
+
+	####################################
+	#	THROUGHPUT PROFILE
+	#
+
+	# Apply speed related settings in a single compound command. _profile is 
+	# a dictionary containing:
+	#
+	#	"nplc"		: integration time (PLC)
+	#	"azer"		: auto zero ("ON", "OFF" or "ONCE")
+	#	"display"	: front panel display ("ON" or "OFF")
+	#	"range"		: measure range ("AUTO" or "FIXED" at compliance)
+	#	"delay"		: source delay ("AUTO" or seconds)
+	#	"filter"	: repeat average filter count (0 = off)
+	#
+	# Settings which already hold their value are skipped.
+	def apply_profile(self, _profile):
+
+		_commands = []
+
+		if not self._cached("nplc", float(_profile["nplc"])):
+			_commands += [':SENS:CURR:NPLC %s'%str(_profile["nplc"]), ':SENS:VOLT:NPLC %s'%str(_profile["nplc"])]
+			self._state["nplc"] = float(_profile["nplc"])
+
+		if not self._cached("azer", _profile["azer"]):
+			_commands += [':SYST:AZER:STAT %s'%str(_profile["azer"])]
+			self._state["azer"] = _profile["azer"] if _profile["azer"] != "ONCE" else "OFF"
+
+		if not self._cached("display", _profile["display"]):
+			_commands += [':DISP:ENAB %s'%str(_profile["display"])]
+			self._state["display"] = _profile["display"]
+
+		if not self._cached("delay", _profile["delay"]):
+			_commands += [':SOUR:DEL:AUTO ON' if _profile["delay"] == "AUTO" else ':SOUR:DEL %s'%str(_profile["delay"])]
+			self._state["delay"] = _profile["delay"]
+
+		if not self._cached("filter", int(_profile["filter"])):
+
+			if int(_profile["filter"]) > 1:
+				_commands += [':SENS:AVER:TCON REP', ':SENS:AVER:COUN %s'%str(int(_profile["filter"])), ':SENS:AVER:STAT ON']
+
+			else:
+				_commands += [':SENS:AVER:STAT OFF']
+
+			self._state["filter"] = int(_profile["filter"])
+
+		# Measure autorange. Fixed ranges are set when compliance is programmed
+		if _profile["range"] == "AUTO":
+			for _mode in ["CURR", "VOLT"]:
+				if not self._cached("range:SENS:%s"%_mode, "AUTO"):
+					_commands += [':SENS:%s:RANG:AUTO ON'%_mode]
+					self._state["range:SENS:%s"%_mode] = "AUTO"
+
+		else:
+			for _mode in ["CURR", "VOLT"]:
+				if self._state.get("range:SENS:%s"%_mode) in [None, "AUTO"]:
+					_commands += [':SENS:%s:RANG:AUTO OFF'%_mode]
+					self._state["range:SENS:%s"%_mode] = "HOLD"
+
+		if _commands != []:
+			self.write(";".join(_commands))
+
+		self._profile = dict(_profile)
+
+	# Return the active throughput profile
+	def get_profile(self):
+		return dict(self._profile)
+
+	# Power line frequency (Hz)
+	def get_line_frequency(self):
+
+		if self._line_freq is None:
+			self._line_freq = float(self.query(':SYST:LFR?'))
+
+		return self._line_freq
+
+	# Estimate readings/second for a profile. Auto zero measures reference and
+	# zero in addition to the signal for each reading. Autorange and display
+	# updates add a fixed overhead per reading.
+	def estimate_rate(self, _profile):
+
+		_time = float(_profile["nplc"]) / self.get_line_frequency()
+		_time *= 3.0 if _profile["azer"] == "ON" else 1.0
+		_time *= max(int(_profile["filter"]), 1)
+		_time += 1e-3 if _profile["delay"] == "AUTO" else float(_profile["delay"])
+		_time += 1e-3 if _profile["range"] == "AUTO" else 0.0
+		_time += 3e-3 if _profile["display"] == "ON" else 0.0
+		_time += 5e-4
+
+		return 1.0 / _time
+
+	# Restore the source delay of the active profile (after sweeps)
+	def source_delay_restore(self):
+		self.write(':SOUR:DEL:AUTO ON' if self._profile["delay"] == "AUTO" else ':SOUR:DEL %s'%str(self._profile["delay"]))
+		self._state["delay"] = self._profile["delay"]
+		self._trigger["source"] = None
+
+	####################################
+	#	ADAPTIVE INTEGRATION
+	#
+
+	# Set the relative noise target (e.g. 1e-4) for adaptive integration. 
+	# None selects the fixed integration time of the active profile.
+	def set_noise_target(self, _target):
+		self._noise_target = _target
+		self._nplc_map = {}
+
+	def get_noise_target(self):
+		return self._noise_target
+
+	# Measure relative noise (standard deviation over mean) of the measured 
+	# function _mode at the present operating point. _samples readings are 
+	# taken in a single burst. Returns None if the wait was cancelled.
+	def measure_noise(self, _mode, _nplc, _samples=10):
+
+		self.update_nplc(_nplc)
+		self._trigger["count"] = int(_samples)
+		_buffer = self._read(':TRIG:COUN %s;'%str(int(_samples)))
+		self.write(':TRIG:COUN 1')
+		self._trigger["count"] = 1
+
+		if _buffer is None:
+			return None
+
+		_values = _buffer[:, self.element_index(_mode)]
+		_mean = np.abs(np.mean(_values))
+
+		return np.std(_values) / _mean if _mean > 0.0 else float("inf")
+
+	# Smallest integration time in _nplcs meeting the noise target at the 
+	# present operating point. Noise is measured at the shortest integration 
+	# time and extrapolated assuming white noise (which averages down as 
+	# 1/sqrt(NPLC)). Candidates from the estimate upwards are then verified, 
+	# so long integration times are only measured when needed.
+	def select_nplc(self, _mode, _nplcs=(0.01, 0.1, 1.0, 10.0)):
+
+		_nplcs = sorted(_nplcs)
+
+		_noise = self.measure_noise(_mode, _nplcs[0])
+		if ( _noise is None ) or ( _noise <= self._noise_target ):
+			return _nplcs[0]
+
+		_estimate = _nplcs[0] * ( _noise / self._noise_target )**2
+		for _nplc in [ _ for _ in _nplcs[1:-1] if _ >= _estimate ]:
+
+			_noise = self.measure_noise(_mode, _nplc)
+			if ( _noise is None ) or ( _noise <= self._noise_target ):
+				return _nplc
+
+		return _nplcs[-1]
+
+	# Select integration time for the next reading from the last measured 
+	# value _value. Noise is characterized once per decade of the measured 
+	# value, so the integration time adapts as a sweep crosses decades.
+	def adapt_nplc(self, _mode, _value):
+
+		if self._noise_target is None:
+			return
+
+		_decade = int(np.floor(np.log10(max(abs(float(_value)), 1e-15))))
+		if _decade not in self._nplc_map:
+			self._nplc_map[_decade] = self.select_nplc(_mode)
+
+		self.update_nplc(self._nplc_map[_decade])
+
+	# Clear characterized integration times (e.g. for a new device)
+	def adapt_reset(self):
+		self._nplc_map = {}
+
+	# Restore the integration time of the active profile
+	def nplc_restore(self):
+		self.update_nplc(self._profile["nplc"])
+
+	####################################
+	#	SETTLING
+	#
+
+	# Set source level _level and wait for the measured function to settle.
+	# Readings are taken at a short integration time (_nplc) until the change
+	# over the last _window readings (from a linear fit) is within _tolerance
+	# of their mean, or until _timeout seconds have passed. Readings near zero
+	# are compared to the resolution of the lowest range instead. The previous
+	# integration time is restored for the final reading. Returns True if the
+	# reading settled, False on timeout and None if the wait was cancelled
+	# (see set_cancel).
+	def settle(self, _mode, _level, _tolerance, _timeout, _window=5, _nplc=0.01):
+
+		_sense = self.sense_mode(_mode)
+		_index = self.element_index(_sense)
+		_floor = self._ranges[_sense][0] * 1e-5
+
+		# Integration time of the final reading
+		_nplc_prev = self._state.get("nplc", self._profile["nplc"])
+
+		if _mode == "VOLT":
+			self.set_voltage(_level)
+
+		else:
+			self.set_current(_level)
+
+		self.update_nplc(_nplc)
+
+		_times, _values = [], []
+		_start, _settled = time.perf_counter(), False
+
+		while True:
+
+			# Cancelled by application
+			if ( self._cancel is not None ) and self._cancel():
+				_settled = None
+				break
+
+			_buffer = self._read()
+			if _buffer is None:
+				_settled = None
+				break
+
+			_times.append(time.perf_counter())
+			_values.append(_buffer[0][_index])
+
+			if len(_values) >= _window:
+
+				_t = np.array(_times[-_window:]) - _times[-_window]
+				_v = np.array(_values[-_window:])
+
+				_drift = abs(np.polyfit(_t, _v, 1)[0]) * _t[-1]
+				if _drift <= _tolerance * max(abs(np.mean(_v)), _floor):
+					_settled = True
+					break
+
+			if time.perf_counter() - _start >= _timeout:
+				break
+
+		self.update_nplc(_nplc_prev)
+		return _settled
+
+	####################################
+	#	READING ELEMENTS
+	#
+
+	# Return the list of elements in each reading
+	def get_elements(self):
+		return self._elements
+
+	# Select reading elements. The 2400 always returns elements in a fixed 
+	# order regardless of the order in which they are requested.
+	def set_elements(self, _elements):
+
+		_elements = [_ for _ in ["VOLT", "CURR", "RES", "TIME", "STAT"] if _ in _elements]
+
+		if not self._cached("elements", _elements):
+			self.write(':FORM:ELEM %s'%",".join(_elements))
+			self._elements = self._state["elements"] = _elements
+
+	# Return the position of an element in each reading
+	def element_index(self, _element):
+		return self._elements.index(_element) if _element in self._elements else None
+
+	# Check the compliance bit (bit 3) of the status word of a reading. Always 
+	# False if the status element is not returned.
+	def in_compliance(self, _reading):
+
+		_index = self.element_index("STAT")
+		if ( _reading is None ) or ( _index is None ):
+			return False
+
+		return bool( int(_reading[_index]) & 0x08 )
+
+	####################################
+	#	READING TRANSFER
+	#
+
+	# Select reading transfer format. "REAL32" transfers readings as binary 
+	# single precision floats (4 bytes per element). Binary transfers rely on 
+	# EOI to terminate the message, so serial devices always fall back to ASCII.
+	def data_format(self, _format):
+
+		if ( _format == "REAL32" ) and ( self.get_property("comm") != "ASRL" ):
+			self.write(':FORM:BORD SWAP')
+			self.write(':FORM:DATA SREAL')
+			self._format = "REAL32"
+
+		else: 
+			self.write(':FORM:DATA ASC')
+			self._format = "ASCII"
+
+	# Return the reading transfer format
+	def get_data_format(self):
+		return self._format
+
+	# Upper bound of the wait for readings of the programmed trigger model 
+	# (seconds). This is twice the expected duration plus _margin for bus and 
+	# settling overhead. The line frequency is not queried here, since it is 
+	# called with a response pending (50Hz is the slower case).
+	def read_timeout(self, _margin=10.0):
+
+		_delay = self._profile["delay"] if self._trigger["source"] is None else self._trigger["source"]
+
+		_time  = 3.0 * float(self._state.get("nplc", self._profile["nplc"])) / ( self._line_freq or 50.0 )
+		_time *= max(int(self._profile["filter"]), 1)
+		_time += self._trigger["delay"] + ( 0.01 if _delay == "AUTO" else float(_delay) )
+
+		return 2.0 * self._trigger["count"] * _time + _margin
+
+	# Read raw response bytes. Long integration times and sweeps can run past 
+	# the VISA timeout so we keep reading until the response arrives. Reading 
+	# gives up after _timeout seconds (see read_timeout) and the bus error is
+	# raised, since the insturment is not going to respond.
+	#
+	# While a cancellation callback is set (see set_cancel), the VISA timeout
+	# is shortened to _poll seconds so that blocking reads check it between
+	# attempts. If cancelled, the trigger model is aborted, the device is 
+	# cleared to discard the pending response, and None is returned.
+	def read_raw(self, _timeout=None, _poll=0.1):
+
+		_timeout = self.read_timeout() if _timeout is None else _timeout
+		_start = time.perf_counter()
+
+		with self._lock:
+
+			_inst = self.get_property("inst")
+			_visa = _inst.timeout
+
+			if self._cancel is not None:
+				_inst.timeout = min(_visa, int(1000 * _poll))
+
+			try:
+
+				while True:
+
+					try:
+						return _inst.read_raw()
+
+					except pyvisa.VisaIOError:
+
+						if ( self._cancel is not None ) and self._cancel():
+							self.write(':ABOR')
+							_inst.clear()
+							return None
+
+						if time.perf_counter() - _start >= _timeout:
+							raise
+
+						if self._cancel is None:
+							time.sleep(0.1)
+
+			finally:
+				_inst.timeout = _visa
+
+	# Decode raw response bytes into a (nreadings, nelements) array
+	def decode(self, _raw):
+
+		# Binary block: "#0" header followed by little endian floats and terminator
+		if self._format == "REAL32":
+			_n = 4 * ( ( len(_raw) - 2 ) // 4 )
+			_data = np.frombuffer(_raw[2:2 + _n], dtype="<f4").astype(float)
+
+		# ASCII: comma separated values
+		else:
+			_data = np.fromstring(_raw.decode("ascii"), sep=",")
+
+		return _data.reshape(-1, len(self._elements))
+
+	# Send a reading query and return the raw response
+	def query_raw(self, _query):
+
+		self._yield()
+		with self._lock:
+			self.write(_query)
+			return self.read_raw()
+
+	# Send a reading query and decode the response
+	def query_array(self, _query):
+		_raw = self.query_raw(_query)
+		return self.decode(_raw) if _raw is not None else None
+
+	# Run the trigger model and return all readings. _prefix is sent ahead 
+	# of the trigger in the same message. In blocking mode this is a single 
+	# :READ? (which implies :INIT). In SRQ mode the trigger is followed by 
+	# *OPC and readings are fetched once the operation has completed. Returns 
+	# None if the wait was cancelled.
+	def _read_raw(self, _prefix=""):
+
+		if self._completion == "SRQ":
+
+			self._hold()
+			try:
+				self.write('%s:INIT;*OPC'%_prefix)
+				return self.query_raw(':FETC?') if self.wait_complete() else None
+
+			finally:
+				self._release()
+
+		return self.query_raw('%s:READ?'%_prefix)
+
+	def _read(self, _prefix=""):
+		_raw = self._read_raw(_prefix)
+		return self.decode(_raw) if _raw is not None else None
+
+	# Trigger a single reading and return it as an array of elements
+	def meas_array(self):
+		_buffer = self._read()
+		return _buffer[0] if _buffer is not None else None
+
+	# Trigger a single reading and return the raw response (see decode). This
+	# allows acquisition loops to defer parsing to another thread.
+	def meas_raw(self):
+		return self._read_raw()
+
+	# Set source level and trigger a reading in a single compound command. 
+	# This saves one bus transaction per point in sweep and tracking loops.
+	def set_voltage_meas(self, _level):
+		_buffer = self._read(':SOUR:VOLT:LEV %s;'%str(_level))
+		self._state["level:VOLT"] = float(_level)
+		return _buffer[0] if _buffer is not None else None
+
+	def set_current_meas(self, _level):
+		_buffer = self._read(':SOUR:CURR:LEV %s;'%str(_level))
+		self._state["level:CURR"] = float(_level)
+		return _buffer[0] if _buffer is not None else None
+
+	# Overlapped readings. arm() starts integration and returns immediately so
+	# that several insturments can integrate concurrently. fetch_array() waits 
+	# for the pending reading to complete and returns it.
+	def arm(self):
+		self._arm('')
+
+	def set_voltage_arm(self, _level):
+		self._arm(':SOUR:VOLT:LEV %s;'%str(_level))
+		self._state["level:VOLT"] = float(_level)
+
+	def set_current_arm(self, _level):
+		self._arm(':SOUR:CURR:LEV %s;'%str(_level))
+		self._state["level:CURR"] = float(_level)
+
+	# Hold the insturment and start the trigger model. _prefix is sent ahead
+	# of the trigger in the same message. The insturment is released again if
+	# the trigger could not be sent, since no fetch will follow.
+	def _arm(self, _prefix):
+
+		self._hold()
+		try:
+			self.write(_prefix + ( ':INIT;*OPC' if self._completion == "SRQ" else ':INIT' ))
+
+		except Exception:
+			self._release()
+			raise
+
+	def fetch_array(self):
+		_buffer = self.fetch_buffer()
+		return _buffer[0] if _buffer is not None else None
+
+	####################################
+	#	READING COMPLETION
+	#
+
+	# Select how reading completion is detected. In "BLOCK" mode readings are
+	# queried directly and the calling thread waits in the bus read until the
+	# insturment responds (polling for cancellation, see read_raw). In "SRQ" mode each trigger is followed by *OPC, and 
+	# the insturment requests service (ESB -> RQS) once readings are complete.
+	# The status byte is serial polled, which does not block the bus, and the
+	# wait can be cancelled (see set_cancel).
+	def set_completion(self, _completion):
+
+		if _completion == "SRQ":
+			self.write('*CLS')
+			self.write('*ESE 1')
+			self.write('*SRE 32')
+
+		self._completion = _completion
+
+	def get_completion(self):
+		return self._completion
+
+	# Cancellation callback for SRQ waits and blocking reads. __func__ returns
+	# True to cancel.
+	# Cancellation tokens (QKeithleyCancel) also wake the wait between polls.
+	def set_cancel(self, __func__):
+		self._cancel = __func__
+
+	# Sleep between polls. Returns early if the token is cancelled
+	def _sleep(self, _time):
+
+		if hasattr(self._cancel, "sleep"):
+			self._cancel.sleep(_time)
+
+		else:
+			time.sleep(_time)
+
+	# Wait for the pending operation to complete. Returns False if the wait 
+	# was cancelled, in which case the trigger model is aborted. The wait is
+	# bounded like blocking reads (see read_timeout). If operation complete 
+	# is not requested in time, the trigger model is aborted and a timeout 
+	# error is raised.
+	def wait_complete(self, _poll=0.005):
+
+		if self._completion != "SRQ":
+			return True
+
+		_timeout = self.read_timeout()
+		_start = time.perf_counter()
+
+		while True:
+
+			# Operation complete sets ESB (bit 5) and RQS (bit 6)
+			if int(self.get_property("inst").read_stb()) & 96:
+				self.query('*ESR?')
+				return True
+
+			if ( self._cancel is not None ) and self._cancel():
+				self.abort()
+				return False
+
+			if time.perf_counter() - _start >= _timeout:
+				self.abort()
+				raise pyvisa.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+
+			self._sleep(_poll)
+
+	# Abort the trigger model and clear pending operation complete
+	def abort(self):
+		self.write(':ABOR')
+		self.write('*CLS')
+		self._release()
+
+	####################################
+	#	SOURCE SWEEP SUBSYSTEM
+	#
+
+	# Program a linear staircase sweep. _mode is "VOLT" or "CURR". The trigger
+	# count is matched to the number of sweep points so that a single :READ?
+	# runs the complete sweep.
+	def sweep_src(self, _mode, _start, _stop, _npts):
+		self._drop_state("src", "level:%s"%_mode, "range:SOUR:%s"%_mode)
+		self.write(':SOUR:%s:MODE SWE'%str(_mode))
+		self.write(':SOUR:SWE:RANG BEST')
+		self.write(':SOUR:SWE:SPAC LIN')
+		self.write(':SOUR:%s:STAR %s'%(str(_mode), str(_start)))
+		self.write(':SOUR:%s:STOP %s'%(str(_mode), str(_stop)))
+		self.write(':SOUR:SWE:POIN %s'%str(int(_npts)))
+		self.write(':TRIG:COUN %s'%str(int(_npts)))
+		self._trigger["count"] = int(_npts)
+
+	# Program an arbitrary source list. _mode is "VOLT" or "CURR". Lists are 
+	# limited to self._list_limit points (see split_list).
+	def list_src(self, _mode, _values):
+
+		if len(_values) > self._list_limit:
+			raise ValueError("Source list exceeds %s points"%str(self._list_limit))
+
+		self._drop_state("src", "level:%s"%_mode)
+		self.write(':SOUR:%s:MODE LIST'%str(_mode))
+		self.write(':SOUR:LIST:%s %s'%(str(_mode), ",".join(["%.6e"%_ for _ in _values])))
+		self.write(':TRIG:COUN %s'%str(len(_values)))
+		self._trigger["count"] = len(_values)
+
+	# Split an array into back-to-back segments which fit into a source list
+	def split_list(self, _values):
+		return np.array_split(_values, int(np.ceil(len(_values) / float(self._list_limit))))
+
+	# Return source to fixed mode with a single trigger per :READ?
+	def fixed_src(self, _mode):
+		self._drop_state("src", "level:%s"%_mode)
+		self.write(':SOUR:%s:MODE FIX'%str(_mode))
+		self.write(':TRIG:COUN 1')
+		self._trigger["count"] = 1
+
+	# Settling time applied after each source level change
+	def source_delay(self, _delay):
+		self._drop_state("delay")
+		self.write(':SOUR:DEL %s'%str(_delay))
+		self._trigger["source"] = float(_delay)
+
+	# Restore automatic source delay (*RST default)
+	def source_delay_auto(self):
+		self._drop_state("delay")
+		self.write(':SOUR:DEL:AUTO ON')
+		self._trigger["source"] = "AUTO"
+
+	####################################
+	#	TRIGGER LINK
+	#
+
+	# Trigger Link master. Output a trigger on _line after the source delay of
+	# each point, i.e. when the master starts its measurement.
+	def trigger_link_master(self, _line=1):
+		self.write(':TRIG:OLIN %s'%str(int(_line)))
+		self.write(':TRIG:OUTP DEL')
+
+	# Trigger Link slave. Take _npts readings, each waiting for a trigger on 
+	# input _line. The slave must be armed (see arm()) before the master runs.
+	def trigger_link_slave(self, _npts, _line=1):
+		self.write(':TRIG:SOUR TLIN')
+		self.write(':TRIG:ILIN %s'%str(int(_line)))
+		self.write(':TRIG:INP SENS')
+		self.write(':TRIG:COUN %s'%str(int(_npts)))
+		self._trigger["count"] = int(_npts)
+
+	# Return to immediate triggering without Trigger Link
+	def trigger_link_off(self):
+		self.write(':TRIG:SOUR IMM')
+		self.write(':TRIG:OUTP NONE')
+		self.write(':TRIG:COUN 1')
+		self._trigger["count"] = 1
+
+	# Read back all readings of the last trigger model run
+	def fetch_buffer(self):
+
+		try:
+			return self.query_array('*WAI;:FETC?') if self.wait_complete() else None
+
+		finally:
+			self._release()
+
+	####################################
+	#	TRACE BUFFER
+	#
+
+	# Arm a burst of _npts readings into the trace buffer. Readings are
+	# triggered by the insturment with _delay seconds between readings. 
+	def trace_arm(self, _npts, _delay=0.0):
+		self.write(':TRAC:FEED:CONT NEV')
+		self.write(':TRAC:CLE')
+		self.write(':TRAC:POIN %s'%str(int(_npts)))
+		self.write(':TRAC:FEED SENS')
+		self.write(':TRAC:FEED:CONT NEXT')
+		self.write(':TRIG:COUN %s'%str(int(_npts)))
+		self.write(':TRIG:DEL %s'%str(_delay))
+		self._trigger.update({"count" : int(_npts), "delay" : float(_delay)})
+		self.arm()
+
+	# Read back the trace buffer. Commands are not processed until the burst 
+	# is complete, so this returns once all readings are available.
+	def trace_fetch(self):
+		_raw = self.trace_fetch_raw()
+		return self.decode(_raw) if _raw is not None else None
+
+	# Read back the trace buffer as a raw response (see decode)
+	def trace_fetch_raw(self):
+
+		try:
+			return self.query_raw(':TRAC:DATA?') if self.wait_complete() else None
+
+		finally:
+			self._release()
+
+	# Disable trace buffer and return to a single trigger per :READ?
+	def trace_clear(self):
+		self.write(':TRAC:FEED:CONT NEV')
+		self.write(':TRAC:CLE')
+		self.write(':TRIG:COUN 1')
+		self.write(':TRIG:DEL 0')
+		self._trigger.update({"count" : 1, "delay" : 0.0})
+
+	# Zero the reading timestamp
+	def reset_timestamp(self):
+		self.write(':SYST:TIME:RES')
+
+	# Run the armed trigger model and read back all readings in one transfer.
+	# Returns a (npts, nelements) array.
+	def read_buffer(self):
+		return self._read()
@@ -0,0 +1,225 @@
+# ---------------------------------------------------------------------------------
+# 	keithley2400replay -> keithley2400
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import re
+import time
+
+# Import drivers
+from src.drivers import keithley2400
+
+# Replays the traffic of one insturment recorded by QKeithleyRecorder.
+# Implements the same subset of the VISA resource interface as sim2400.
+# Responses are returned in recorded order, and every bus transaction takes
+# its recorded duration divided by _speed (_speed = 0 replays without delay).
+# Time spent between transactions is not replayed, such that the run time of
+# a replayed measurement minus the replayed bus time is the software overhead
+# of the application loop.
+#
+# Writes are matched against the recorded writes up to the next response.
+# Writes which were not recorded (e.g. settings skipped by the state cache
+# of the recorded run) are ignored, and recorded writes which are not sent
+# again are skipped on the next read. Replay therefore only stays in step
+# with applications which read responses in the recorded order.
+#
+# At the end of the recording, reads return None at once, the same way as a
+# cancelled read in the driver, so that measurement threads stop cleanly.
+# Pending operations complete immediately. Use rewind() to replay again.
+class replay2400:
+
+	def __init__(self, _records, _speed=0.0):
+
+		# Records (op, data, raw, start, duration) and replay position
+		self._records = _records
+		self._index = 0
+		self._speed = float(_speed)
+
+		# VISA timeout (ms)
+		self.timeout = 10000
+
+		# Last status byte (repeated when polled more often than recorded)
+		self._stb = 0
+
+		# Replay statistics
+		self._stats = {"writes" : 0, "reads" : 0, "unmatched" : 0, "skipped" : 0, "bus_time" : 0.0}
+
+	####################################
+	#	REPLAY
+	#
+
+	def get_speed(self):
+		return self._speed
+
+	def set_speed(self, _speed):
+		self._speed = float(_speed)
+
+	# Replay statistics. Bus time is the recorded time of all replayed
+	# transactions (independent of replay speed)
+	def get_stats(self):
+		return dict(self._stats, position=self._index, length=len(self._records))
+
+	# Rewind to the start of the recording
+	def rewind(self):
+
+		self._index = 0
+		self._stb = 0
+		self._stats = {"writes" : 0, "reads" : 0, "unmatched" : 0, "skipped" : 0, "bus_time" : 0.0}
+
+	# Take the recorded duration of a transaction
+	def _delay(self, _duration):
+
+		self._stats["bus_time"] += _duration
+		if self._speed > 0.0:
+			time.sleep(_duration / self._speed)
+
+	# Advance to the next record of kind _op. Records of other kinds are
+	# skipped. Returns None at the end of the recording.
+	def _next(self, _op):
+
+		while self._index < len(self._records):
+
+			_record = self._records[self._index]
+			self._index += 1
+
+			if _record[0] == _op:
+				return _record
+
+			self._stats["skipped"] += 1
+
+		return None
+
+	####################################
+	#	VISA RESOURCE INTERFACE
+	#
+
+	def write(self, _data):
+
+		# Search for the write among records up to the next response
+		_index = self._index
+		while _index < len(self._records) and self._records[_index][0] in ["write", "clear"]:
+
+			if self._records[_index][0] == "write" and self._records[_index][1] == str(_data):
+
+				self._stats["skipped"] += _index - self._index
+				self._stats["writes"] += 1
+				self._index = _index + 1
+				self._delay(self._records[_index][4])
+				return
+
+			_index += 1
+
+		self._stats["unmatched"] += 1
+
+	# Check if all records have been replayed
+	def at_end(self):
+		return self._index >= len(self._records)
+
+	def read_raw(self):
+
+		_record = self._next("read")
+
+		# End of recording
+		if _record is None:
+			return None
+
+		self._stats["reads"] += 1
+		self._delay(_record[4])
+
+		# Responses recorded by read() have the termination stripped
+		_raw = _record[1].encode("latin-1")
+		return _raw if _record[2] else _raw + b"\n"
+
+	def read(self):
+		_raw = self.read_raw()
+		return _raw.decode("ascii").rstrip("\n") if _raw is not None else None
+
+	# Serial poll. Polls beyond the recorded polls repeat the last status byte.
+	# At the end of the recording, operations complete (ESB and RQS) at once.
+	def read_stb(self):
+
+		if self.at_end():
+			return 96
+
+		if self._index < len(self._records) and self._records[self._index][0] == "stb":
+
+			_record = self._records[self._index]
+			self._index += 1
+
+			self._stb = int(_record[1])
+			self._delay(_record[4])
+
+		return self._stb
+
+	def query(self, _data):
+		self.write(_data)
+		return self.read()
+
+	def clear(self):
+
+		if self._index < len(self._records) and self._records[self._index][0] == "clear":
+
+			self._delay(self._records[self._index][4])
+			self._index += 1
+
+	def close(self):
+		pass
+
+
+# Keithley 2400 driver on a replayed insturment. The power line frequency of
+# the recorded insturment is preset, and no commands are sent on init, such
+# that the replay starts in step with the recording.
+class keithley2400replay(keithley2400.keithley2400):
+
+	def __init__(self, _resource, _records, _speed=0.0, _line_freq=None):
+
+		# Cache replay for parse_resource
+		self._replay = replay2400(_records, _speed)
+
+		# Call super
+		super(keithley2400replay, self).__init__(_resource)
+
+		# Recorded power line frequency
+		self._line_freq = float(_line_freq) if _line_freq is not None else None
+
+	# Bind the replay in place of a VISA resource
+	def parse_resource(self, _resource, _type):
+
+		m = re.match(r'REPLAY::(\d+)::INSTR$', _resource, re.ASCII)
+		if m is None:
+			raise ValueError("Invalid replay resource %s"%str(_resource))
+
+		self._QVisaDevice__resource = {
+			"inst"		: self._replay,
+			"resource"	: m[0],
+			"comm"		: "REPLAY",
+			"addr"		: m[1],
+			"type"		: _type,
+			"name"		: "%s REPLAY::%s"%(_type, str(m[1])),
+		}
+
+	# Access to the replay (speed, statistics)
+	def get_replay(self):
+		return self._replay
@@ -0,0 +1,678 @@
+# ---------------------------------------------------------------------------------
+# 	keithley2400sim -> keithley2400
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import re
+import time
+import threading
+import pyvisa
+import numpy as np
+
+# Import drivers
+from src.drivers import keithley2400
+
+# Trigger Link bus shared by all simulated insturments. Maps each trigger 
+# line to the list of insturments armed to take readings on that line.
+_trigger_link = {}
+_trigger_link_lock = threading.Lock()
+
+
+# Software model of a Keithley 2400 on the bus. Implements the subset of 
+# the VISA resource interface used by the drivers (write, read, read_raw, 
+# read_stb, query, clear and close) and interprets the SCPI commands sent 
+# by keithley2400. Readings are computed from a device model, and each 
+# reading takes the time it would take on the insturment (source delay, 
+# trigger delay and integration time). Every bus transaction is delayed 
+# by _latency seconds. 
+class sim2400:
+
+	def __init__(self, _model, _terminal=None, _latency=0.0, _line_freq=50.0, _noise=1e-5):
+
+		# Device under test and terminal the sourcemeter is connected to
+		self._model = _model
+		self._terminal = _terminal if _terminal is not None else _model.terminals[0]
+
+		# Bus latency (s), power line frequency (Hz) and relative reading noise
+		self._latency = float(_latency)
+		self._line_freq = float(_line_freq)
+		self._noise = float(_noise)
+
+		# Fixed overhead per reading (A/D conversion and processing)
+		self._overhead = 2e-4
+
+		# VISA timeout (ms)
+		self.timeout = 10000
+
+		# Output queue and error queue
+		self._output = []
+		self._errors = []
+
+		# Status registers. Event status enable and service request enable are
+		# not affected by *RST. 
+		self._esr = 0
+		self._ese = 0
+		self._sre = 0
+		self._opc_pending = False
+
+		# Serialize bus access (the trigger link can call in from other threads)
+		self._lock = threading.RLock()
+
+		# Command table: regex on command header -> handler(args)
+		self._commands = [
+			(r'\*IDN\?$'					, self._idn),
+			(r'\*RST$'						, self._rst),
+			(r'\*CLS$'						, self._cls),
+			(r'\*WAI$'						, self._wai),
+			(r'\*OPC\?$'					, self._opc_query),
+			(r'\*OPC$'						, self._opc),
+			(r'\*TST\?$'					, lambda _args: self._respond("0")),
+			(r'\*TRG$'						, self._ignore),
+			(r'\*ESE$'						, self._status("ese")),
+			(r'\*SRE$'						, self._status("sre")),
+			(r'\*ESR\?$'					, self._esr_query),
+			(r'\*STB\?$'					, lambda _args: self._respond( str(self._stb()) )),
+			(r'\*ESE\?$'					, lambda _args: self._respond( str(self._ese) )),
+			(r'\*SRE\?$'					, lambda _args: self._respond( str(self._sre) )),
+			(r'SYST:ERR\?$'					, self._syst_err),
+			(r'SYST:TIME:RES$'				, self._time_reset),
+			(r'SYST:RSEN$'					, self._set("rsen")),
+			(r'SYST:LFR\?$'				, lambda _args: self._respond( str(self._line_freq) )),
+			(r'SYST:AZER(:STAT)?$'			, self._set("azer")),
+			(r'DISP:ENAB$'					, self._set("display")),
+			(r'SENS:AVER:TCON$'				, self._ignore),
+			(r'SENS:AVER:COUN$'				, self._set("filter_count", int)),
+			(r'SENS:AVER(:STAT)?$'			, self._set("filter")),
+			(r'ROUT:TERM$'					, self._set("route")),
+			(r'OUTP(:STAT)?$'				, self._outp),
+			(r'SENS:FUNC$'					, self._ignore),
+			(r'SENS:(VOLT|CURR):NPLC$'		, self._nplc),
+			(r'SENS:(VOLT|CURR):PROT$'		, self._prot),
+			(r'SENS:(VOLT|CURR):RANG(:AUTO)?$', self._ignore),
+			(r'SOUR:FUNC$'					, self._set("func")),
+			(r'SOUR:(VOLT|CURR):MODE$'		, self._source_mode),
+			(r'SOUR:(VOLT|CURR):LEV$'		, self._level),
+			(r'SOUR:(VOLT|CURR):RANG(:AUTO)?$', self._ignore),
+			(r'SOUR:(VOLT|CURR):STAR$'		, self._sweep("start")),
+			(r'SOUR:(VOLT|CURR):STOP$'		, self._sweep("stop")),
+			(r'SOUR:SWE:POIN$'				, self._sweep("points")),
+			(r'SOUR:SWE:(RANG|SPAC)$'		, self._ignore),
+			(r'SOUR:LIST:(VOLT|CURR)$'		, self._list),
+			(r'SOUR:DEL$'					, self._source_delay),
+			(r'SOUR:DEL:AUTO$'				, self._source_delay_auto),
+			(r'FORM:ELEM$'					, self._elements),
+			(r'FORM:DATA$'					, self._set("format")),
+			(r'FORM:BORD$'					, self._set("border")),
+			(r'TRIG:COUN$'					, self._set("count", int)),
+			(r'TRIG:DEL$'					, self._set("trig_delay", float)),
+			(r'TRIG:SOUR$'					, self._set("trig_source")),
+			(r'TRIG:ILIN$'					, self._set("ilin", int)),
+			(r'TRIG:OLIN$'					, self._set("olin", int)),
+			(r'TRIG:INP$'					, self._ignore),
+			(r'TRIG:OUTP$'					, self._set("trig_output")),
+			(r'TRAC:FEED:CONT$'				, self._set("trace_cont")),
+			(r'TRAC:FEED$'					, self._ignore),
+			(r'TRAC:POIN$'					, self._set("trace_points", int)),
+			(r'TRAC:CLE$'					, self._trace_clear),
+			(r'TRAC:DATA\?$'				, self._trace_data),
+			(r'INIT$'						, self._initiate),
+			(r'ABOR$'						, self._abort),
+			(r'FETC\?$'						, self._fetch),
+			(r'READ\?$'						, self._read),
+		]
+
+		# Initialize insturment state
+		self._rst(None)
+
+
+	####################################
+	#	VISA RESOURCE INTERFACE
+	#
+
+	def write(self, _data):
+
+		time.sleep(self._latency)
+
+		with self._lock:
+
+			# Compound commands are separated by semicolons
+			for _command in str(_data).strip().split(";"):
+
+				_header, _, _args = _command.strip().partition(" ")
+				if _header == "":
+					continue
+
+				self._dispatch(_header.lstrip(":").upper(), _args.strip())
+
+	# Reading responses waits for the trigger model to complete
+	def read_raw(self):
+
+		time.sleep(self._latency)
+
+		# Trigger model running past the VISA timeout. The response is kept
+		# and returned by the next read.
+		if not self._wait(self.timeout / 1000.0):
+			raise pyvisa.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+
+		with self._lock:
+
+			# Nothing to read results in a timeout
+			if self._output == []:
+				time.sleep( min(self.timeout / 1000.0, 1.0) )
+				raise pyvisa.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+
+			# Responses to reading queries are formatted on read
+			_raw = [ _() if callable(_) else _ for _ in self._output ]
+			self._output = []
+
+		# Join responses of compound queries 
+		return b";".join(_raw) + b"\n"
+
+	def read(self):
+		return self.read_raw().decode("ascii").rstrip("\n")
+
+	# Serial poll. Does not wait for the trigger model
+	def read_stb(self):
+
+		time.sleep(self._latency)
+
+		with self._lock:
+			return self._stb()
+
+	def query(self, _data):
+		self.write(_data)
+		return self.read()
+
+	# Device clear. Clears the output queue and pending operation complete
+	def clear(self):
+
+		time.sleep(self._latency)
+
+		with self._lock:
+			self._output = []
+			self._opc_pending = False
+
+	def close(self):
+		self._abort(None)
+
+
+	####################################
+	#	COMMAND DISPATCH
+	#
+
+	def _dispatch(self, _header, _args):
+
+		for _regex, __func__ in self._commands:
+
+			_m = re.match(_regex, _header)
+			if _m:
+				self._header = _m
+				__func__(_args)
+				return
+
+		self._error(-113, "Undefined header")
+
+	# Queue a response. _data may be a callable which generates the response 
+	# once the trigger model has completed. 
+	def _respond(self, _data):
+
+		if callable(_data):
+			self._output.append(lambda: self._encode(_data()))
+
+		else:
+			self._output.append(self._encode(_data))
+
+	def _encode(self, _data):
+		return _data if isinstance(_data, bytes) else str(_data).encode("ascii")
+
+	def _error(self, _code, _message):
+		self._errors.append('%s,"%s"'%(str(_code), _message))
+
+	def _ignore(self, _args):
+		pass
+
+	# Generate handler which stores the command argument in a state field
+	def _set(self, _field, _type=str):
+
+		def __func__(_args):
+			self._state[_field] = _type(_args.strip('"').upper()) if _type is str else _type(_args)
+
+		return __func__
+
+	# Generate handler for sweep parameters
+	def _sweep(self, _field):
+
+		def __func__(_args):
+			self._state["sweep"][_field] = float(_args)
+
+		return __func__
+
+
+	####################################
+	#	GENERAL
+	#
+
+	def _idn(self, _args):
+		self._respond("KEITHLEY INSTRUMENTS INC.,MODEL 2400,0000000,C30 SIMULATED")
+
+	def _rst(self, _args):
+
+		self._disarm()
+		self._state = {
+			"func"			: "VOLT",
+			"mode"			: {"VOLT" : "FIX", "CURR" : "FIX"},
+			"level"			: {"VOLT" : 0.0, "CURR" : 0.0},
+			"prot"			: {"VOLT" : 21.0, "CURR" : 1.05e-4},
+			"sweep"			: {"start" : 0.0, "stop" : 0.0, "points" : 2500.},
+			"list"			: {"VOLT" : [0.0], "CURR" : [0.0]},
+			"source_delay"	: 1e-3,
+			"nplc"			: 1.0,
+			"azer"			: "ON",
+			"display"		: "ON",
+			"filter"		: "OFF",
+			"filter_count"	: 10,
+			"output"		: False,
+			"rsen"			: "OFF",
+			"route"			: "FRON",
+			"elements"		: ["VOLT", "CURR", "RES", "TIME", "STAT"],
+			"format"		: "ASC",
+			"border"		: "NORM",
+			"count"			: 1,
+			"trig_delay"	: 0.0,
+			"trig_source"	: "IMM",
+			"trig_output"	: "NONE",
+			"ilin"			: 1,
+			"olin"			: 2,
+			"trace_cont"	: "NEV",
+			"trace_points"	: 100,
+		}
+
+		# Trace buffer and readings of the last trigger model run
+		self._trace = []
+		self._readings = []
+
+		# Time at which the trigger model completes and timestamp origin
+		self._busy_until = 0.0
+		self._time_origin = time.time()
+		self._model.set_bias(self._terminal, 0.0)
+
+	def _cls(self, _args):
+		self._errors = []
+		self._esr = 0
+		self._opc_pending = False
+
+
+	####################################
+	#	STATUS REGISTERS
+	#
+
+	# Generate handler for status enable registers
+	def _status(self, _field):
+
+		def __func__(_args):
+			setattr(self, "_%s"%_field, int(float(_args)) if _args != "" else 0)
+
+		return __func__
+
+	# Set operation complete once the trigger model has completed
+	def _update_status(self):
+
+		if self._opc_pending and ( self._armed is None ) and ( time.time() >= self._busy_until ):
+			self._opc_pending = False
+			self._esr |= 1
+
+	# Status byte. ESB (bit 5) summarizes enabled events, and MSS (bit 6) 
+	# summarizes enabled status bits.
+	def _stb(self):
+
+		self._update_status()
+
+		_stb = 32 if ( self._esr & self._ese ) else 0
+		_stb |= 64 if ( _stb & self._sre ) else 0
+		return _stb
+
+	def _opc(self, _args):
+		self._opc_pending = True
+
+	def _esr_query(self, _args):
+
+		self._update_status()
+		_esr, self._esr = self._esr, 0
+		self._respond(str(_esr))
+
+	def _syst_err(self, _args):
+		self._respond( self._errors.pop(0) if self._errors != [] else '0,"No error"')
+
+	def _time_reset(self, _args):
+		self._time_origin = time.time()
+
+	def _outp(self, _args):
+
+		self._state["output"] = _args.upper() in ["ON", "1"]
+
+		# Output off disconnects the device under test
+		if not self._state["output"]:
+			self._model.set_bias(self._terminal, 0.0)
+
+	def _nplc(self, _args):
+		self._state["nplc"] = float(_args)
+
+	def _prot(self, _args):
+		self._state["prot"][ "VOLT" if self._header.group(1) == "VOLT" else "CURR" ] = abs(float(_args))
+
+	def _source_mode(self, _args):
+		self._state["mode"][ self._header.group(1) ] = _args.upper()[:4]
+
+	def _level(self, _args):
+		self._state["level"][ self._header.group(1) ] = float(_args)
+
+	def _list(self, _args):
+		self._state["list"][ self._header.group(1) ] = [ float(_) for _ in _args.split(",") ]
+
+	def _source_delay(self, _args):
+		self._state["source_delay"] = float(_args)
+
+	def _source_delay_auto(self, _args):
+		self._state["source_delay"] = 1e-3
+
+	def _elements(self, _args):
+		_elements = [ _.strip()[:4] for _ in _args.upper().split(",") ]
+		self._state["elements"] = [ _ for _ in ["VOLT", "CURR", "RES", "TIME", "STAT"] if _ in _elements ]
+
+
+	####################################
+	#	TRIGGER MODEL
+	#
+
+	# Source levels for each trigger of the trigger model
+	def _source_levels(self):
+
+		_func = self._state["func"]
+		_mode = self._state["mode"][_func]
+
+		if _mode == "SWE":
+			_sweep  = self._state["sweep"]
+			_levels = np.linspace( _sweep["start"], _sweep["stop"], int(_sweep["points"]) )
+
+		elif _mode == "LIST":
+			_levels = self._state["list"][_func]
+
+		else:
+			_levels = [ self._state["level"][_func] ]
+
+		# Source levels repeat if the trigger count exceeds the sweep points
+		return [ _levels[_ % len(_levels)] for _ in range(self._state["count"]) ]
+
+	# Time to take a single reading. Auto zero measures reference and zero in 
+	# addition to the signal, and the display adds a fixed update overhead.
+	def _integration_time(self):
+
+		_time = self._state["nplc"] / self._line_freq
+		_time *= 3.0 if self._state["azer"] in ["ON", "1"] else 1.0
+		_time *= self._state["filter_count"] if self._state["filter"] in ["ON", "1"] else 1.0
+		_time += 3e-3 if self._state["display"] in ["ON", "1"] else 0.0
+
+		return _time + self._overhead
+
+	# Apply a source level to the device under test and compute a reading
+	def _reading(self, _level, _time):
+
+		_status = 0.0
+		_func   = self._state["func"]
+
+		# Voltage source. Clamp current at compliance
+		if _func == "VOLT":
+
+			_v = _level
+			_i = self._model.current(self._terminal, _v)
+			_cmpl = self._state["prot"]["CURR"]
+
+			if abs(_i) > _cmpl:
+				_i = np.sign(_i) * _cmpl
+				_v = self._model.voltage(self._terminal, _i, abs(_level))
+				_status = 8.0
+
+		# Current source. Clamp voltage at compliance
+		else:
+
+			_i = _level
+			_cmpl = self._state["prot"]["VOLT"]
+			_v = self._model.voltage(self._terminal, _i, _cmpl)
+
+			_actual = self._model.current(self._terminal, _v)
+			if abs(_actual - _i) > 1e-12 + 1e-6 * abs(_i):
+				_i = _actual
+				_status = 8.0
+
+		self._model.set_bias(self._terminal, _v)
+
+		# Reading noise scales with the inverse square root of integration time
+		_scale = self._noise / np.sqrt( max(self._state["nplc"], 0.01) )
+		_v += np.random.normal(0.0, _scale * ( abs(_v) + 1e-3 ))
+		_i += np.random.normal(0.0, _scale * ( abs(_i) + 1e-9 ))
+
+		return {
+			"VOLT" : _v, 
+			"CURR" : _i, 
+			"RES"  : _v / _i if _i != 0.0 else 9.91e37, 
+			"TIME" : _time - self._time_origin, 
+			"STAT" : _status 
+		}
+
+	# Run the trigger model. Readings are computed immediately, and the 
+	# insturment remains busy until they would have been acquired.
+	def _initiate(self, _args):
+
+		# Output must be on to take readings
+		if not self._state["output"]:
+			self._error(803, "Output disabled")
+			return
+
+		# Slaved to the trigger link. Readings are taken on incoming triggers
+		if self._state["trig_source"] == "TLIN":
+
+			self._disarm()
+			self._readings = []
+			self._armed = threading.Event()
+
+			with _trigger_link_lock:
+				_trigger_link.setdefault(self._state["ilin"], []).append(self)
+
+			return
+
+		_time, self._readings = max(time.time(), self._busy_until), []
+
+		for _level in self._source_levels():
+
+			# Trigger delay, source and source delay
+			_time += self._state["trig_delay"] + self._state["source_delay"]
+			self._readings.append( self._reading(_level, _time) )
+
+			# Trigger link output after source delay
+			if self._state["trig_output"] != "NONE":
+				self._trigger_out(_time)
+
+			_time += self._integration_time()
+
+		self._busy_until = _time
+		self._feed_trace(self._readings)
+
+	# Send a trigger to all insturments armed on our output line
+	def _trigger_out(self, _time):
+
+		with _trigger_link_lock:
+			_slaves = list( _trigger_link.get(self._state["olin"], []) )
+
+		for _slave in _slaves:
+			if _slave is not self:
+				_slave._trigger_in(_time)
+
+	# Take one reading on an incoming trigger
+	def _trigger_in(self, _time):
+
+		with self._lock:
+
+			_time += self._state["trig_delay"]
+			self._readings.append( self._reading( self._state["level"][ self._state["func"] ], _time ) )
+			self._busy_until = _time + self._integration_time()
+
+			# Trigger count reached
+			if len(self._readings) >= self._state["count"]:
+				self._feed_trace(self._readings)
+				self._disarm()
+
+	# Remove insturment from the trigger link
+	def _disarm(self):
+
+		with _trigger_link_lock:
+			for _line in _trigger_link.values():
+				if self in _line:
+					_line.remove(self)
+
+		if getattr(self, "_armed", None) is not None:
+			self._armed.set()
+
+		self._armed = None
+
+	def _abort(self, _args):
+		self._disarm()
+		self._busy_until = 0.0
+		self._readings = []
+		self._opc_pending = False
+
+	# Wait for the trigger model to complete. Commands are processed as they
+	# are written, so only reads wait (see read_raw). Returns False if the 
+	# trigger model did not complete within _timeout seconds.
+	def _wait(self, _timeout):
+
+		_start = time.time()
+
+		_armed = self._armed
+		if ( _armed is not None ) and not _armed.wait(_timeout):
+			return False
+
+		_delay = self._busy_until - time.time()
+		if _delay > _timeout - ( time.time() - _start ):
+			time.sleep(max(_timeout - ( time.time() - _start ), 0.0))
+			return False
+
+		if _delay > 0:
+			time.sleep(_delay)
+
+		return True
+
+	def _wai(self, _args):
+		pass
+
+	def _opc_query(self, _args):
+		self._respond("1")
+
+	def _fetch(self, _args):
+
+		if ( self._readings == [] ) and ( self._armed is None ):
+			self._error(-230, "Data corrupt or stale")
+			return
+
+		_readings = self._readings
+		self._respond( lambda: self._format(_readings) )
+
+	def _read(self, _args):
+		self._initiate(_args)
+		self._fetch(_args)
+
+
+	####################################
+	#	TRACE BUFFER
+	#
+
+	def _feed_trace(self, _readings):
+
+		if self._state["trace_cont"] == "NEXT":
+
+			_space = self._state["trace_points"] - len(self._trace)
+			self._trace.extend( _readings[:max(_space, 0)] )
+
+			# Buffer full
+			if len(self._trace) >= self._state["trace_points"]:
+				self._state["trace_cont"] = "NEV"
+
+	def _trace_clear(self, _args):
+		self._trace = []
+
+	def _trace_data(self, _args):
+		_trace = self._trace
+		self._respond( lambda: self._format(_trace) )
+
+
+	####################################
+	#	READING FORMAT
+	#
+
+	def _format(self, _readings):
+
+		_values = [ _r[_e] for _r in _readings for _e in self._state["elements"] ]
+
+		# Binary block with "#0" header
+		if self._state["format"].startswith("SRE"):
+			_dtype = "<f4" if self._state["border"].startswith("SWAP") else ">f4"
+			return b"#0" + np.array(_values, dtype=_dtype).tobytes()
+
+		return ",".join(["%+.6E"%_ for _ in _values])
+
+
+# Simulated keithley2400. The driver is identical to keithley2400, and only 
+# the VISA resource is replaced by a sim2400 insturment. Simulated resources
+# are addressed as "SIM::<addr>::INSTR".
+class keithley2400sim(keithley2400.keithley2400):
+
+	# Initialize Driver. _model is a devicemodels.device instance which may be 
+	# shared between several simulated insturments.
+	def __init__(self, _resource, _model, _terminal=None, _latency=0.0, _line_freq=50.0):
+
+		# Cache simulation parameters for parse_resource
+		self._sim = sim2400(_model, _terminal, _latency, _line_freq)
+
+		# Call super
+		super(keithley2400sim, self).__init__(_resource)
+
+	# Bind the simulated insturment in place of a VISA resource
+	def parse_resource(self, _resource, _type):
+
+		m = re.match(r'SIM::(\d+)::INSTR$', _resource, re.ASCII)
+		if m is None:
+			raise ValueError("Invalid simulated resource %s"%str(_resource))
+
+		self._QVisaDevice__resource = {
+			"inst"		: self._sim,
+			"resource"	: m[0],
+			"comm"		: "SIM",
+			"addr"		: m[1],
+			"type"		: _type,
+			"name"		: "%s SIM::%s"%(_type, str(m[1])),
+		}
+
+	# Access to the simulated insturment (latency, device model)
+	def get_sim(self):
+		return self._sim
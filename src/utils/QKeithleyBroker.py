@@ -0,0 +1,353 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyBroker
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import queue
+import socket
+import pyvisa
+import itertools
+import threading
+import socketserver
+import numpy as np
+
+# Insturment server. The sessions opened by QKeithleyConfig are owned by one
+# process. The broker shares them with other processes (analysis scripts, a
+# second GUI) over a line based protocol on a local TCP socket. Each line
+# sent by a client is answered with exactly one line:
+#
+#	@LIST?				-> resources of all initialized devices (comma separated)
+#	@DEV <resource|name>		-> OK. Select device for following commands
+#	@PRI <n>			-> OK. Priority of following commands (0 is highest)
+#	<SCPI query>			-> response of the insturment
+#	<SCPI command>			-> OK
+#
+# Errors are answered with "@ERR <message>". Client commands are queued per
+# device and served in order of priority. Identical queries which are queued
+# at the same time are sent to the insturment once, and all clients receive
+# the same response. Applications of the owning process access the insturment
+# directly. Client commands are only sent between their bus transactions and
+# never while a reading is pending (see keithley2400.acquire).
+#
+# Server threads are named "QKeithleyBroker*" so that they can be told apart
+# from measurement threads.
+
+class QKeithleyBroker:
+
+	def __init__(self, _config, _host="127.0.0.1", _port=5025, _timeout=30.0):
+
+		# Configuration object holding the devices
+		self._config = _config
+
+		# Server address and time to wait for the insturment (s)
+		self._host = _host
+		self._port = int(_port)
+		self._timeout = float(_timeout)
+
+		# Socket server and per device request queues
+		self._server = None
+		self._queues = {}
+		self._workers = {}
+
+		# Queued queries (for coalescing) and request sequence numbers. The
+		# sequence number keeps requests of equal priority in order.
+		self._queued = {}
+		self._count = itertools.count()
+		self._queue_lock = threading.Lock()
+
+	####################################
+	#	SERVER
+	#
+
+	def is_running(self):
+		return self._server is not None
+
+	def get_address(self):
+		return (self._host, self._port) if self._server is None else self._server.server_address
+
+	# Start server. Raises OSError if the port cannot be bound
+	def start(self):
+
+		if self._server is not None:
+			return
+
+		self._server = QKeithleyBrokerServer( (self._host, self._port), QKeithleyBrokerHandler )
+		self._server.broker = self
+
+		_thread = threading.Thread(target=self._server.serve_forever, name="QKeithleyBroker", daemon=True)
+		_thread.start()
+
+	# Stop server and request workers
+	def stop(self):
+
+		if self._server is None:
+			return
+
+		self._server.shutdown()
+		self._server.server_close()
+		self._server = None
+
+		with self._queue_lock:
+
+			for _queue in self._queues.values():
+				_queue.put( (-1, next(self._count), None) )
+
+			self._queues = {}
+			self._workers = {}
+			self._queued = {}
+
+	####################################
+	#	REQUESTS
+	#
+
+	# Find device by resource string or name
+	def get_device(self, _key):
+
+		for Device in self._config.Devices:
+			if _key in [ Device.get_property("resource"), Device.get_property("name") ]:
+				return Device
+
+		return None
+
+	# Queue a command for a device and return the request. Queries which are
+	# identical to a query still waiting in the queue share its request.
+	def submit(self, Device, _command, _priority=10):
+
+		_resource = Device.get_property("resource")
+		_query = "?" in _command
+
+		with self._queue_lock:
+
+			if _query and (_resource, _command) in self._queued:
+				return self._queued[(_resource, _command)]
+
+			_request = {
+				"device"	: Device,
+				"command"	: _command,
+				"query"		: _query,
+				"response"	: None,
+				"error"		: None,
+				"done"		: threading.Event()
+			}
+
+			if _query:
+				self._queued[(_resource, _command)] = _request
+
+			# Worker thread for device
+			if _resource not in self._queues:
+
+				self._queues[_resource] = queue.PriorityQueue()
+				self._workers[_resource] = threading.Thread(
+					target=self._worker, args=(self._queues[_resource],), name="QKeithleyBroker-%s"%_resource, daemon=True)
+				self._workers[_resource].start()
+
+			self._queues[_resource].put( (int(_priority), next(self._count), _request) )
+
+		return _request
+
+	# Serve requests for one device in order of priority
+	def _worker(self, _queue):
+
+		while True:
+
+			_, _, _request = _queue.get()
+			if _request is None:
+				return
+
+			# Later identical queries are no longer coalesced with this one
+			with self._queue_lock:
+
+				_key = (_request["device"].get_property("resource"), _request["command"])
+				if self._queued.get(_key) is _request:
+					del self._queued[_key]
+
+			try:
+				self._execute(_request)
+
+			except ( pyvisa.VisaIOError, OSError, ValueError ) as e:
+				_request["error"] = str(e)
+
+			_request["done"].set()
+
+	# Send a command to the insturment. Responses are read once, with the VISA
+	# timeout, and the device is cleared on timeout so that late responses do
+	# not reach the application. Binary readings are returned as ASCII.
+	def _execute(self, _request):
+
+		Device = _request["device"]
+
+		with Device.acquire(self._timeout) as _acquired:
+
+			if not _acquired:
+				_request["error"] = "Device busy"
+				return
+
+			Device.write(_request["command"])
+
+			# Client commands may change settings behind the state cache
+			if not _request["query"]:
+				Device.invalidate()
+				_request["response"] = "OK"
+				return
+
+			try:
+				_raw = Device.get_property("inst").read_raw()
+
+			except pyvisa.VisaIOError:
+
+				if hasattr(Device.get_property("inst"), "clear"):
+					Device.get_property("inst").clear()
+				raise
+
+		if _raw[:2] == b"#0":
+			_n = 4 * ( ( len(_raw) - 2 ) // 4 )
+			_data = np.frombuffer(_raw[2:2 + _n], dtype="<f4")
+			_request["response"] = ",".join( [ "%e"%_ for _ in _data ] )
+
+		else:
+			_request["response"] = _raw.decode("ascii").strip()
+
+	# Handle one line from a client. _session holds the device and priority
+	# selected by the client.
+	def handle_line(self, _session, _line):
+
+		_line = _line.strip()
+
+		# Connections may outlive the server
+		if self._server is None:
+			return "@ERR Server stopped"
+
+		if _line == "@LIST?":
+			return ",".join( [ Device.get_property("resource") for Device in self._config.Devices ] )
+
+		if _line.startswith("@DEV"):
+
+			Device = self.get_device( _line[4:].strip() )
+			if Device is None:
+				return "@ERR No such device %s"%_line[4:].strip()
+
+			_session["device"] = Device
+			return "OK"
+
+		if _line.startswith("@PRI"):
+
+			try:
+				_session["priority"] = max(int(_line[4:].strip()), 0)
+
+			except ValueError:
+				return "@ERR Invalid priority"
+
+			return "OK"
+
+		if _line.startswith("@"):
+			return "@ERR Unknown command %s"%_line
+
+		if _session["device"] is None:
+			return "@ERR No device selected"
+
+		# Device removed from configuration
+		if _session["device"] not in self._config.Devices:
+			return "@ERR Device closed"
+
+		_request = self.submit(_session["device"], _line, _session["priority"])
+		_request["done"].wait()
+
+		return "@ERR %s"%_request["error"] if _request["error"] is not None else _request["response"]
+
+
+# Threaded TCP server. Client threads are named so that they are not taken
+# for measurement threads.
+class QKeithleyBrokerServer(socketserver.ThreadingTCPServer):
+
+	allow_reuse_address = True
+	daemon_threads = True
+
+	def process_request(self, _request, _address):
+
+		_thread = threading.Thread(
+			target=self.process_request_thread, args=(_request, _address), name="QKeithleyBroker-client", daemon=True)
+		_thread.start()
+
+
+# Client connection handler
+class QKeithleyBrokerHandler(socketserver.StreamRequestHandler):
+
+	def handle(self):
+
+		_session = {"device" : None, "priority" : 10}
+
+		for _line in self.rfile:
+
+			_response = self.server.broker.handle_line(_session, _line.decode("ascii", "replace"))
+			self.wfile.write( ( "%s\n"%_response ).encode("ascii") )
+
+
+# Client for the insturment server. Usage:
+#
+#	client = QKeithleyBrokerClient()
+#	client.select("GPIB0::24::INSTR")
+#	client.query(":READ?")
+#
+class QKeithleyBrokerClient:
+
+	def __init__(self, _host="127.0.0.1", _port=5025, _timeout=60.0):
+
+		self._socket = socket.create_connection( (_host, int(_port)), _timeout )
+		self._file = self._socket.makefile("rb")
+
+	# Send a line and return the response line. Raises RuntimeError on errors
+	def send(self, _line):
+
+		self._socket.sendall( ( "%s\n"%_line.strip() ).encode("ascii") )
+		_response = self._file.readline().decode("ascii").strip()
+
+		if _response.startswith("@ERR"):
+			raise RuntimeError(_response[4:].strip())
+
+		return _response
+
+	def list(self):
+		_response = self.send("@LIST?")
+		return _response.split(",") if _response != "" else []
+
+	def select(self, _device):
+		self.send("@DEV %s"%_device)
+
+	def priority(self, _priority):
+		self.send("@PRI %s"%str(int(_priority)))
+
+	def write(self, _command):
+		self.send(_command)
+
+	def query(self, _command):
+		return self.send(_command)
+
+	# Query readings and return them as an array
+	def query_array(self, _command):
+		return np.fromstring(self.send(_command), sep=",")
+
+	def close(self):
+		self._file.close()
+		self._socket.close()
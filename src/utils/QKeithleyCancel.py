@@ -0,0 +1,77 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyCancel
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import time
+import threading
+
+# Cancellation token for measurement threads. The GUI thread calls cancel()
+# to abort a measurement. Waits in the measurement thread go through sleep(),
+# which returns as soon as the token is cancelled, so aborting does not wait
+# for the remainder of a measurement interval or settling delay. The token is
+# callable, and can be passed to keithley2400.set_cancel to cancel pending
+# insturment waits.
+#
+# The time of cancellation is kept so that measurement threads can report
+# the abort latency (time from cancel() until the output has been reset).
+class QKeithleyCancel:
+
+	def __init__(self):
+
+		self._event = threading.Event()
+		self._time  = None
+
+	# Re-arm the token for a new measurement
+	def reset(self):
+		self._time = None
+		self._event.clear()
+
+	def cancel(self):
+
+		if self._time is None:
+			self._time = time.perf_counter()
+
+		self._event.set()
+
+	def is_cancelled(self):
+		return self._event.is_set()
+
+	def __call__(self):
+		return self._event.is_set()
+
+	# Sleep for _time seconds. Returns False if the token was cancelled
+	def sleep(self, _time):
+		return not self._event.wait( max(float(_time), 0.0) )
+
+	# Time since cancel() (s). None if not cancelled
+	def latency(self):
+		return time.perf_counter() - self._time if self._time is not None else None
+
+	# Write the abort latency into the metadata of a data key (if cancelled)
+	def set_metadata(self, _data, _key):
+
+		if self._time is not None:
+			_data.set_metadata(_key, "__abort__", "%.3e"%self.latency())
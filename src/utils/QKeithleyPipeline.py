@@ -0,0 +1,192 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyPipeline
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import time
+import queue
+import threading
+
+# Two stage measurement pipeline. The acquisition loop only collects raw 
+# responses and timestamps and hands them to a second stage, which runs on
+# its own thread and parses and stores readings in batches. The insturment
+# is therefore triggered again as soon as a response has been read, instead
+# of after each reading has been parsed, stored and plotted. Usage:
+#
+#	def __store__(_batch):
+#		<decode and store list of items>
+#
+#	_stage = QKeithleyPipeline(__store__)
+#	_stage.start()
+#	while running:
+#		_stage.put( (_time, _keithley.meas_raw()) )
+#	_stage.close()
+#
+# The queue between the stages is bounded (_depth items). If the second 
+# stage falls behind, put() blocks until there is room (back-pressure). The
+# largest queue depth and the time the acquisition loop spent blocked are
+# kept so that back-pressure can be seen in the saved data.
+#
+# If the stage function raises, the second stage stops and the exception is
+# raised again from the next put() or close(), so that acquisition stops.
+class QKeithleyPipeline:
+
+	def __init__(self, __func__, _depth=1024, _batch=256):
+
+		# Stage function. Called with a list of up to _batch items
+		self._func = __func__
+		self._batch = int(_batch)
+		self._queue = queue.Queue(maxsize=int(_depth))
+		self._thread = None
+
+		# Exception raised by the stage function
+		self._error = None
+
+		# Statistics
+		self._items = 0
+		self._batches = 0
+		self._depth_max = 0
+		self._stall = 0.0
+
+	####################################
+	#	ACQUISITION STAGE
+	#
+
+	# Start the second stage
+	def start(self):
+
+		self._thread = threading.Thread(target=self._run, args=())
+		self._thread.daemon = True
+		self._thread.start()
+
+	# Pass an item to the second stage. Blocks while the queue is full. 
+	def put(self, _item):
+
+		self._raise()
+
+		try:
+			self._queue.put_nowait(_item)
+
+		except queue.Full:
+
+			_start = time.perf_counter()
+			while self._thread.is_alive():
+
+				try:
+					self._queue.put(_item, timeout=0.1)
+					break
+
+				except queue.Full:
+					pass
+
+			self._stall += time.perf_counter() - _start
+
+		self._depth_max = max(self._depth_max, self._queue.qsize())
+		self._raise()
+
+	# Wait until all items have been processed and stop the second stage
+	def close(self):
+
+		if self._thread is not None:
+
+			while self._thread.is_alive():
+
+				try:
+					self._queue.put(None, timeout=0.1)
+					break
+
+				except queue.Full:
+					pass
+
+			self._thread.join()
+
+		self._raise()
+
+	# Raise the exception of the second stage in the acquisition stage
+	def _raise(self):
+
+		if self._error is not None:
+			raise self._error
+
+	####################################
+	#	PARSE/STORE STAGE
+	#
+
+	def _run(self):
+
+		while True:
+
+			# Wait for an item, then take everything queued up to batch size
+			_batch = [ self._queue.get() ]
+			while ( len(_batch) < self._batch ) and ( _batch[-1] is not None ):
+
+				try:
+					_batch.append( self._queue.get_nowait() )
+
+				except queue.Empty:
+					break
+
+			# None closes the stage
+			_done = _batch[-1] is None
+			if _done:
+				_batch.pop()
+
+			if len(_batch) > 0:
+
+				# Stop on errors. Acquisition stops on the next put()
+				try:
+					self._func(_batch)
+
+				except Exception as e:
+					self._error = e
+					return
+
+				self._items += len(_batch)
+				self._batches += 1
+
+			if _done:
+				return
+
+	####################################
+	#	STATISTICS
+	#
+
+	# Number of items and batches processed, largest queue depth and time 
+	# (s) the acquisition stage was blocked on a full queue
+	def get_stats(self):
+
+		return {
+			"items"		: self._items,
+			"batches"	: self._batches,
+			"depth_max"	: self._depth_max,
+			"stall"		: self._stall
+		}
+
+	# Write statistics into the metadata of a data key
+	def set_metadata(self, _data, _key):
+
+		_stats = self.get_stats()
+		_data.set_metadata(_key, "__backlog__", str(_stats["depth_max"]))
+		_data.set_metadata(_key, "__stall__", "%.3e"%_stats["stall"])
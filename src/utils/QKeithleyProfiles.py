@@ -0,0 +1,93 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyProfiles
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import os
+import json
+import collections
+
+# Named throughput profiles for keithley2400.apply_profile(). Built-in profiles
+# are always available. Custom profiles are saved to a JSON file in the users
+# home directory and are shared between all devices.
+
+class QKeithleyProfiles:
+
+	# Built-in profiles
+	builtins = collections.OrderedDict([
+		("Default", 		{"nplc" : 1.0 , "azer" : "ON"  , "display" : "ON" , "range" : "AUTO" , "delay" : "AUTO", "filter" : 0 }),
+		("Max Throughput",	{"nplc" : 0.01, "azer" : "OFF" , "display" : "OFF", "range" : "FIXED", "delay" : 0.0   , "filter" : 0 }),
+		("Balanced", 		{"nplc" : 1.0 , "azer" : "ONCE", "display" : "ON" , "range" : "AUTO" , "delay" : "AUTO", "filter" : 0 }),
+		("Max Accuracy", 	{"nplc" : 10.0, "azer" : "ON"  , "display" : "ON" , "range" : "AUTO" , "delay" : "AUTO", "filter" : 10}),
+	])
+
+	def __init__(self, _filename=None):
+
+		# Custom profile file
+		self._filename = _filename if _filename is not None else os.path.join(os.path.expanduser("~"), ".qkeithleycontrol", "profiles.json")
+
+		# Load custom profiles
+		self._custom = collections.OrderedDict()
+		self.load()
+
+	# Profile names (built-in first)
+	def get_names(self):
+		return list(self.builtins.keys()) + [ _ for _ in self._custom.keys() if _ not in self.builtins ]
+
+	# Get profile by name
+	def get_profile(self, _name):
+
+		if _name in self.builtins:
+			return dict(self.builtins[_name])
+
+		if _name in self._custom:
+			return dict(self._custom[_name])
+
+		return None
+
+	def is_builtin(self, _name):
+		return _name in self.builtins
+
+	# Read custom profiles from file
+	def load(self):
+
+		try:
+			with open(self._filename, 'r') as f:
+				self._custom = json.load(f, object_pairs_hook=collections.OrderedDict)
+
+		except ( IOError, ValueError ):
+			self._custom = collections.OrderedDict()
+
+	# Save custom profile. Built-in profiles cannot be overwritten
+	def save_profile(self, _name, _profile):
+
+		if self.is_builtin(_name):
+			raise ValueError("Cannot overwrite built-in profile %s"%str(_name))
+
+		self._custom[_name] = dict(_profile)
+
+		os.makedirs(os.path.dirname(self._filename), exist_ok=True)
+		with open(self._filename, 'w+') as f:
+			json.dump(self._custom, f, indent=4)
@@ -0,0 +1,239 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyRecorder
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import gzip
+import json
+import time
+
+# Import QKeithleyTraceResource
+from src.utils.QKeithleyTrace import QKeithleyTraceResource
+
+# Records every command and response sent to the initialized devices along
+# with its timing, such that a measurement can later be replayed without the
+# insturments (see drivers/keithley2400replay). Records are kept per device:
+#
+#	(op, data, raw, start, duration)
+#
+#	op       = "write" | "read" | "stb" | "clear"
+#	data     = command (write), response (read) or status byte (stb)
+#	raw      = True if a read returned bytes (read_raw)
+#	start    = time since start of recording (s)
+#	duration = duration of the bus transaction (s)
+#
+# Queries are recorded as a write followed by a read. Binary responses are
+# stored as latin-1 strings, which map bytes to characters losslessly.
+# Recordings are saved as gzip compressed JSON.
+
+class QKeithleyRecorder:
+
+	def __init__(self):
+
+		self._recording = False
+		self._devices = []
+
+		# Records and recorded device per device name
+		self._records = {}
+		self._sources = {}
+		self._start = 0.0
+
+	####################################
+	#	START/STOP
+	#
+
+	def is_recording(self):
+		return self._recording
+
+	# Start recording on a list of devices. Previous records are discarded
+	def start(self, _devices):
+
+		self._records = {}
+		self._sources = {}
+		self._start = time.perf_counter()
+		self._recording = True
+
+		for _device in _devices:
+			self.attach(_device)
+
+	# Stop recording and restore the VISA resources of all devices
+	def stop(self):
+
+		self._recording = False
+		for _device in self._devices:
+			self.detach(_device)
+
+		self._devices = []
+
+	# Wrap the VISA resource of a device. The recorder always sits below the
+	# trace wrapper so that either can be removed independently.
+	def attach(self, _device):
+
+		if self._recording and _device not in self._devices:
+
+			_name = _device.get_property("name")
+			_resource = _device.get_resource()
+			_inst = _resource.get("inst")
+
+			if isinstance(_inst, QKeithleyTraceResource):
+				_inst._inst = QKeithleyRecordResource(_inst._inst, _name, self)
+
+			else:
+				_resource["inst"] = QKeithleyRecordResource(_inst, _name, self)
+
+			self._records[_name] = []
+			self._sources[_name] = _device
+			self._devices.append(_device)
+
+	def detach(self, _device):
+
+		_resource = _device.get_resource()
+		_inst = _resource.get("inst")
+
+		if isinstance(_inst, QKeithleyTraceResource) and isinstance(_inst._inst, QKeithleyRecordResource):
+			_inst._inst = _inst._inst._inst
+
+		elif isinstance(_inst, QKeithleyRecordResource):
+			_resource["inst"] = _inst._inst
+
+	####################################
+	#	RECORDING
+	#
+
+	# Time reference for records
+	def clock(self):
+		return time.perf_counter()
+
+	def record(self, _name, _op, _data, _raw, _start, _duration):
+		self._records[_name].append( (_op, _data, _raw, _start - self._start, _duration) )
+
+	# Number of records per device
+	def get_counts(self):
+		return { _name : len(_records) for _name, _records in self._records.items() }
+
+	# Get records of a device
+	def get_records(self, _name):
+		return self._records[_name] if _name in self._records else []
+
+	####################################
+	#	FILE IO
+	#
+
+	# Write recording. The resource and line frequency are saved along with 
+	# the records so that the device can be rebuilt on replay.
+	def write_to_file(self, _filename):
+
+		_devices = {}
+		for _name, _records in self._records.items():
+
+			_devices[_name] = {
+				"resource"	: self._sources[_name].get_property("resource"),
+				"line_freq"	: getattr(self._sources[_name], "_line_freq", None),
+				"records"	: _records
+			}
+
+		with gzip.open(_filename, 'wt', encoding="utf-8") as f:
+			json.dump({"version" : 1, "devices" : _devices}, f, separators=(",", ":"))
+
+	# Read a recording. Returns a dictionary of devices:
+	#
+	#	{ <name> : {"resource" : ..., "line_freq" : ..., "records" : [...]} }
+	#
+	@staticmethod
+	def read_from_file(_filename):
+
+		with gzip.open(_filename, 'rt', encoding="utf-8") as f:
+			_data = json.load(f)
+
+		if _data.get("version") != 1:
+			raise ValueError("Unsupported recording version %s"%str(_data.get("version")))
+
+		return _data["devices"]
+
+
+# Recorded VISA resource. Forwards all calls to the wrapped resource and
+# records commands and responses.
+class QKeithleyRecordResource:
+
+	def __init__(self, _inst, _name, _recorder):
+
+		self._inst  = _inst
+		self._name  = _name
+		self._recorder = _recorder
+
+	def write(self, _data):
+
+		_start = self._recorder.clock()
+		_ = self._inst.write(_data)
+		self._recorder.record(self._name, "write", str(_data), False, _start, self._recorder.clock() - _start)
+		return _
+
+	def read_raw(self, *args, **kwargs):
+
+		_start = self._recorder.clock()
+		_raw = self._inst.read_raw(*args, **kwargs)
+		self._recorder.record(self._name, "read", _raw.decode("latin-1"), True, _start, self._recorder.clock() - _start)
+		return _raw
+
+	def read(self, *args, **kwargs):
+
+		_start = self._recorder.clock()
+		_buffer = self._inst.read(*args, **kwargs)
+		self._recorder.record(self._name, "read", _buffer, False, _start, self._recorder.clock() - _start)
+		return _buffer
+
+	def query(self, _data, *args, **kwargs):
+
+		_start = self._recorder.clock()
+		_buffer = self._inst.query(_data, *args, **kwargs)
+		self._recorder.record(self._name, "write", str(_data), False, _start, 0.0)
+		self._recorder.record(self._name, "read", _buffer, False, _start, self._recorder.clock() - _start)
+		return _buffer
+
+	def read_stb(self):
+
+		_start = self._recorder.clock()
+		_stb = self._inst.read_stb()
+		self._recorder.record(self._name, "stb", int(_stb), False, _start, self._recorder.clock() - _start)
+		return _stb
+
+	def clear(self):
+
+		_start = self._recorder.clock()
+		_ = self._inst.clear()
+		self._recorder.record(self._name, "clear", None, False, _start, self._recorder.clock() - _start)
+		return _
+
+	# Forward everything else (timeout, close, ...)
+	def __getattr__(self, _attr):
+		return getattr(self._inst, _attr)
+
+	def __setattr__(self, _attr, _value):
+
+		if _attr in ["_inst", "_name", "_recorder"]:
+			object.__setattr__(self, _attr, _value)
+
+		else:
+			setattr(self._inst, _attr, _value)
@@ -0,0 +1,139 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyRender
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import queue
+import numpy as np
+
+# Import QT backends
+from PyQt5.QtCore import QObject, QTimer
+
+# Pipeline from measurement threads to the GUI. Widgets and matplotlib are
+# not thread safe, and drawing a canvas inside a measurement loop delays the
+# next reading by the full rendering time. Measurement threads therefore do
+# not touch widgets. Instead they push work items onto a queue:
+#
+#	render.append(plot, axes_key, handle_key, x, y)	# samples for a handle
+#	render.push(func, *args)				# any other GUI call
+#
+# A timer on the GUI thread drains the queue every _interval (ms). Items are
+# run in the order they were pushed. Consecutive samples for the same handle
+# are joined into one batch, and each plot which received samples is drawn
+# once per drain, such that the cost of plotting no longer depends on the
+# sample rate. Samples are copied when pushed, so that the measurement 
+# thread may reuse its buffers.
+class QKeithleyRender(QObject):
+
+	def __init__(self, _parent=None, _interval=50):
+
+		# Inherits QObject. The timer runs on the thread of the parent
+		super(QKeithleyRender, self).__init__(_parent)
+
+		# Thread safe FIFO (no locking on the measurement thread side)
+		self._queue = queue.SimpleQueue()
+		self._draining = False
+
+		# Drain timer
+		self._timer = QTimer(self)
+		self._timer.timeout.connect(self.drain)
+		self._timer.start(int(_interval))
+
+	####################################
+	#	MEASUREMENT THREAD
+	#
+
+	# Queue a GUI call
+	def push(self, _func, *args):
+		self._queue.put( (_func, args) )
+
+	# Queue samples for a plot handle. Scalars or arrays.
+	def append(self, _plot, _axes_key, _handle_key, _x, _y, _handle_index=0):
+
+		_x = np.array(_x, dtype=float).ravel()
+		_y = np.array(_y, dtype=float).ravel()
+		self._queue.put( (None, (_plot, str(_axes_key), _handle_key, _handle_index, _x, _y)) )
+
+	####################################
+	#	GUI THREAD
+	#
+
+	# Run all queued items and draw plots which received samples
+	def drain(self):
+
+		# Calls made while draining (e.g. button clicks) may process events
+		if self._draining:
+			return
+
+		self._draining = True
+		try:
+
+			# Pending samples per handle and plots to draw
+			_batch, _plots = {}, []
+
+			while True:
+
+				try:
+					_func, _args = self._queue.get_nowait()
+
+				except queue.Empty:
+					break
+
+				# Samples. Join with pending samples of the same handle
+				if _func is None:
+
+					_plot, _axes_key, _handle_key, _handle_index, _x, _y = _args
+					_handle = (_plot, _axes_key, _handle_key, _handle_index)
+
+					if _handle in _batch:
+						_batch[_handle][0].append(_x)
+						_batch[_handle][1].append(_y)
+
+					else:
+						_batch[_handle] = ([_x], [_y])
+
+					if _plot not in _plots:
+						_plots.append(_plot)
+
+				# Calls. Pending samples are flushed first to keep order
+				else:
+
+					self._flush(_batch)
+					_batch = {}
+					_func(*_args)
+
+			self._flush(_batch)
+
+			for _plot in _plots:
+				_plot.update_canvas()
+
+		finally:
+			self._draining = False
+
+	# Append pending samples to plot handles
+	def _flush(self, _batch):
+
+		for (_plot, _axes_key, _handle_key, _handle_index), (_x, _y) in _batch.items():
+			_plot.append_handle_data(_axes_key, _handle_key, np.concatenate(_x), np.concatenate(_y), _handle_index)
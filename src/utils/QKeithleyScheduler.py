@@ -0,0 +1,156 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyScheduler
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import time
+import numpy as np
+
+# Sampling clock for measurement loops. Samples are scheduled on a fixed grid
+# of absolute deadlines (origin + n * interval) on the monotonic clock, so the
+# time spent reading, storing and plotting is absorbed in the wait and does
+# not accumulate as drift. Usage:
+#
+#	_clock = QKeithleyScheduler(_interval)
+#	while running:
+#		<measure>
+#		_clock.wait()
+#
+# If a loop iteration overruns its deadline, the missed deadlines are skipped
+# so that samples stay on the grid. Missed deadlines and the lateness of each
+# wake-up (jitter) are counted. An interval of zero runs the loop freely. 
+# Waits return immediately when the cancellation token _cancel (a 
+# QKeithleyCancel) is cancelled.
+class QKeithleyScheduler:
+
+	def __init__(self, _interval=0.0, _cancel=None):
+
+		# Sample interval (s) and cancellation token (see wait)
+		self._interval = max(float(_interval), 0.0)
+		self._cancel = _cancel
+
+		self.start()
+
+	####################################
+	#	CLOCK
+	#
+
+	# Start the clock. The first deadline is one interval from now
+	def start(self):
+
+		self._start = time.monotonic()
+
+		# Origin of the deadline grid and deadlines since origin
+		self._origin = self._start
+		self._count = 0
+
+		# Statistics. Running sums so that hours-long runs use constant memory
+		self._samples = 0
+		self._missed = 0
+		self._late_sum = 0.0
+		self._late_sum2 = 0.0
+		self._late_max = 0.0
+
+	# Time since start (s)
+	def elapsed(self):
+		return time.monotonic() - self._start
+
+	def get_interval(self):
+		return self._interval
+
+	# Change the sample interval. The new grid starts at the last deadline
+	def set_interval(self, _interval):
+
+		_interval = max(float(_interval), 0.0)
+
+		if _interval != self._interval:
+
+			self._origin = max(self._origin + self._count * self._interval, self._start)
+			self._count = 0
+			self._interval = _interval
+
+	# Wait for the next deadline. Returns False if the wait was cancelled
+	def wait(self):
+
+		self._samples += 1
+
+		if self._interval == 0.0:
+			return True
+
+		self._count += 1
+		_deadline = self._origin + self._count * self._interval
+		_now = time.monotonic()
+
+		# Overrun. Skip to the next deadline in the future
+		if _now > _deadline:
+
+			_skip = int( ( _now - _deadline ) / self._interval ) + 1
+			self._missed += _skip
+			self._count += _skip
+			_deadline += _skip * self._interval
+
+		while _now < _deadline:
+
+			if self._cancel is None:
+				time.sleep(_deadline - _now)
+
+			elif not self._cancel.sleep(_deadline - _now):
+				return False
+
+			_now = time.monotonic()
+
+		# Lateness of wake-up
+		_late = _now - _deadline
+		self._late_sum += _late
+		self._late_sum2 += _late * _late
+		self._late_max = max(self._late_max, _late)
+
+		return True
+
+	####################################
+	#	STATISTICS
+	#
+
+	# Number of samples, missed deadlines and wake-up jitter (s). Jitter is
+	# the RMS and maximum lateness of wake-ups relative to their deadlines.
+	def get_stats(self):
+
+		_n = max(self._samples, 1)
+
+		return {
+			"interval"		: self._interval,
+			"samples"		: self._samples,
+			"missed"		: self._missed,
+			"jitter_rms"	: float( np.sqrt(self._late_sum2 / _n) ),
+			"jitter_max"	: self._late_max
+		}
+
+	# Write statistics into the metadata of a data key
+	def set_metadata(self, _data, _key):
+
+		_stats = self.get_stats()
+		_data.set_metadata(_key, "__interval__", "%.6g"%_stats["interval"])
+		_data.set_metadata(_key, "__missed__", str(_stats["missed"]))
+		_data.set_metadata(_key, "__jitter__", "%.3e"%_stats["jitter_rms"])
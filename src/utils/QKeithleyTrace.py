@@ -0,0 +1,281 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyTrace
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+#
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+#
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+#
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python
+import time
+import collections
+import numpy as np
+
+# Opt-in tracing of insturment traffic and application loop stages. When 
+# tracing is enabled, the VISA resource of each device is wrapped so that 
+# every write, read and query is timed. Applications mark the stages of their
+# measurement loops (e.g. "meas", "store", "plot") via lap(). Records are 
+# kept in a fixed size ring:
+#
+#	(kind, source, label, nbytes, start, duration)
+#
+#	kind   = "write" | "read" | "query" | "stage"
+#	source = device name (bus records) or application name (stage records)
+#	label  = command headers (bus records) or stage name (stage records)
+#
+# Appending to a bounded deque is atomic, so measurement threads record 
+# without taking a lock.
+
+class QKeithleyTrace:
+
+	def __init__(self, _size=100000):
+
+		self._ring = collections.deque(maxlen=_size)
+		self._enabled = False
+		self._devices = []
+
+	####################################
+	#	ENABLE/DISABLE
+	#
+
+	def is_enabled(self):
+		return self._enabled
+
+	# Enable tracing on a list of devices
+	def enable(self, _devices):
+
+		self._enabled = True
+		for _device in _devices:
+			self.attach(_device)
+
+	# Disable tracing and restore the VISA resources of all devices
+	def disable(self):
+
+		self._enabled = False
+		for _device in self._devices:
+
+			_resource = _device.get_resource()
+			if isinstance(_resource.get("inst"), QKeithleyTraceResource):
+				_resource["inst"] = _resource["inst"]._inst
+
+		self._devices = []
+
+	# Wrap the VISA resource of a device (if tracing is enabled)
+	def attach(self, _device):
+
+		if self._enabled and _device not in self._devices:
+
+			_resource = _device.get_resource()
+			if not isinstance(_resource.get("inst"), QKeithleyTraceResource):
+				_resource["inst"] = QKeithleyTraceResource(_resource["inst"], _device.get_property("name"), self)
+
+			self._devices.append(_device)
+
+	####################################
+	#	RECORDING
+	#
+
+	# Time reference for records
+	def clock(self):
+		return time.perf_counter()
+
+	def record(self, _kind, _source, _label, _nbytes, _start, _duration):
+		self._ring.append( (_kind, _source, _label, _nbytes, _start, _duration) )
+
+	# Record a loop stage which started at _start and return the current time. 
+	# Calls can be chained to time consecutive stages of a loop:
+	#
+	#	_t = trace.clock()
+	#	... 
+	#	_t = trace.lap("iv-sweep", "meas", _t)
+	#	...
+	#	_t = trace.lap("iv-sweep", "plot", _t)
+	#
+	def lap(self, _app, _stage, _start):
+
+		_now = time.perf_counter()
+		if self._enabled:
+			self._ring.append( ("stage", _app, _stage, 0, _start, _now - _start) )
+
+		return _now
+
+	def clear(self):
+		self._ring.clear()
+
+	def records(self):
+		return list(self._ring)
+
+	####################################
+	#	STATISTICS
+	#
+
+	# Durations grouped by key. _kinds selects record kinds, and _key maps a 
+	# record to its group.
+	def _group(self, _kinds, _key):
+
+		_groups = collections.OrderedDict()
+		for _record in self.records():
+			if _record[0] in _kinds:
+				_groups.setdefault(_key(_record), []).append(_record[5])
+
+		return collections.OrderedDict( (_k, np.array(_v)) for _k, _v in _groups.items() )
+
+	# Bus latency per command ("<kind> <headers>" -> durations)
+	def command_stats(self):
+		return self._group(["write", "read", "query"], lambda _r: "%s %s"%(_r[0], _r[2]))
+
+	# Loop stage durations per application ((app, stage) -> durations)
+	def stage_stats(self):
+		return self._group(["stage"], lambda _r: (_r[1], _r[2]))
+
+	# Bytes transferred per command
+	def command_bytes(self):
+
+		_bytes = collections.OrderedDict()
+		for _record in self.records():
+			if _record[0] != "stage":
+				_key = "%s %s"%(_record[0], _record[2])
+				_bytes[_key] = _bytes.get(_key, 0) + _record[3]
+
+		return _bytes
+
+	# Logarithmic histogram bins for latencies (1us to 100s)
+	def histogram_bins(self):
+		return np.logspace(-6, 2, 41)
+
+	# Summary table rows: (label, count, total, mean, p50, p95, max)
+	def summarize(self, _stats):
+
+		_rows = []
+		for _key, _durations in _stats.items():
+			_rows.append( (
+				_key if isinstance(_key, str) else ":".join(_key),
+				len(_durations),
+				np.sum(_durations),
+				np.mean(_durations),
+				np.percentile(_durations, 50),
+				np.percentile(_durations, 95),
+				np.max(_durations)
+			) )
+
+		return sorted(_rows, key=lambda _r: -_r[2])
+
+	####################################
+	#	EXPORT
+	#
+
+	# Write summary tables, latency histograms and raw records to file 
+	def write_to_file(self, _filename):
+
+		_commands = self.command_stats()
+		_bytes = self.command_bytes()
+		_bins = self.histogram_bins()
+
+		with open(_filename, 'w+') as f:
+
+			f.write("*! QKeithleyTrace\n")
+			f.write("*! records %s\n\n"%str(len(self._ring)))
+
+			# Per command latency
+			f.write("#! __commands__\n")
+			f.write("command\t\tcount\t\tbytes\t\ttotal(s)\t\tmean(s)\t\tp50(s)\t\tp95(s)\t\tmax(s)\n")
+			for _row in self.summarize(_commands):
+				f.write("%s\t%d\t%d\t%.6e\t%.6e\t%.6e\t%.6e\t%.6e\n"%(_row[0], _row[1], _bytes.get(_row[0], 0), *_row[2:]))
+
+			# Per stage breakdown
+			f.write("\n\n#! __stages__\n")
+			f.write("stage\t\tcount\t\ttotal(s)\t\tmean(s)\t\tp50(s)\t\tp95(s)\t\tmax(s)\n")
+			for _row in self.summarize(self.stage_stats()):
+				f.write("%s\t%d\t%.6e\t%.6e\t%.6e\t%.6e\t%.6e\n"%_row)
+
+			# Latency histograms. One column per command
+			f.write("\n\n#! __histogram__\n")
+			f.write("bin(s)\t\t%s\n"%"\t\t".join(_commands.keys()))
+			_counts = [ np.histogram(_d, _bins)[0] for _d in _commands.values() ]
+			for _i, _bin in enumerate(_bins[:-1]):
+				f.write("%.3e\t%s\n"%(_bin, "\t".join([ str(_c[_i]) for _c in _counts ])))
+
+			# Raw records
+			f.write("\n\n#! __records__\n")
+			f.write("kind\t\tsource\t\tlabel\t\tbytes\t\tstart(s)\t\tduration(s)\n")
+			for _record in self.records():
+				f.write("%s\t%s\t%s\t%d\t%.6f\t%.6e\n"%_record)
+
+
+# Traced VISA resource. Forwards all calls to the wrapped resource and 
+# records the duration and size of each bus transaction.
+class QKeithleyTraceResource:
+
+	def __init__(self, _inst, _name, _trace):
+
+		self._inst  = _inst
+		self._name  = _name
+		self._trace = _trace
+
+		# Headers of last write (reads are attributed to the last query)
+		self._last = ""
+
+	# Reduce a command to its headers, e.g. ":SOUR:VOLT:LEV 1.0;:READ?" 
+	# becomes ":SOUR:VOLT:LEV;:READ?"
+	def _headers(self, _data):
+		return ";".join( [ _.strip().split(" ")[0] for _ in str(_data).strip().split(";") ] )
+
+	def write(self, _data):
+
+		_start = time.perf_counter()
+		_ = self._inst.write(_data)
+		self._last = self._headers(_data)
+		self._trace.record("write", self._name, self._last, len(_data), _start, time.perf_counter() - _start)
+		return _
+
+	def read_raw(self, *args, **kwargs):
+
+		_start = time.perf_counter()
+		_raw = self._inst.read_raw(*args, **kwargs)
+		self._trace.record("read", self._name, self._last, len(_raw), _start, time.perf_counter() - _start)
+		return _raw
+
+	def read(self, *args, **kwargs):
+
+		_start = time.perf_counter()
+		_buffer = self._inst.read(*args, **kwargs)
+		self._trace.record("read", self._name, self._last, len(_buffer), _start, time.perf_counter() - _start)
+		return _buffer
+
+	def query(self, _data, *args, **kwargs):
+
+		_start = time.perf_counter()
+		_buffer = self._inst.query(_data, *args, **kwargs)
+		self._last = self._headers(_data)
+		self._trace.record("query", self._name, self._last, len(_data) + len(_buffer), _start, time.perf_counter() - _start)
+		return _buffer
+
+	# Forward everything else (timeout, close, read_stb, ...)
+	def __getattr__(self, _attr):
+		return getattr(self._inst, _attr)
+
+	def __setattr__(self, _attr, _value):
+
+		if _attr in ["_inst", "_name", "_trace", "_last"]:
+			object.__setattr__(self, _attr, _value)
+
+		else:
+			setattr(self._inst, _attr, _value)
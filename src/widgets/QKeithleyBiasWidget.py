@@ -39,6 +39,13 @@ from PyQt5.QtGui import QIcon
 from PyQtVisa.widgets import QVisaUnitSelector
 from PyQtVisa.widgets import QVisaDynamicPlot 
 
+# Import QKeithleyScheduler and QKeithleyCancel
+from src.utils.QKeithleyScheduler import QKeithleyScheduler
+from src.utils.QKeithleyCancel import QKeithleyCancel
+
+# Import QKeithleyPipeline
+from src.utils.QKeithleyPipeline import QKeithleyPipeline
+
 # Container class for Keithley to render keithley controls in the bias appicaton. 
 # QKeithleyBiasWidget is not itself a widget, but it contains several widgets. Note 
 # that _app must be QVisaApplication widget
@@ -54,6 +61,9 @@ class QKeithleyBiasWidget:
 		# Set thread variables 
 		self.thread, self.thread_running = None, False
 
+		# Cancellation token and data key of running measurement
+		self.thread_cancel, self.thread_key = QKeithleyCancel(), None
+
 		# Generate widgets
 		self.gen_ctrl_widget()
 		self.gen_plot_widget()
@@ -133,6 +143,23 @@ class QKeithleyBiasWidget:
 		self.src_select.addItems(["Voltage", "Current"])	
 		self.src_select.currentTextChanged.connect(self.update_bias_ctrl)
 
+		# Acquisition mode. In buffered mode readings are triggered by the 
+		# insturment in bursts and read back from the trace buffer
+		self.acq_select_label = QLabel("Acquisition")
+		self.acq_select = QComboBox()
+		self.acq_select.setFixedWidth(200)
+		self.acq_select.addItems(["Polled", "Buffered"])
+
+		# Burst size for buffered acquisition
+		self.acq_burst_config={
+			"unit" 		: "__INT__", 
+			"label"		: "Burst Size",
+			"signed"	: False,
+			"limit"		: [2500],
+			"default"	: [100]
+		}
+		self.acq_burst = QVisaUnitSelector.QVisaUnitSelector(self.acq_burst_config)
+
 		# Generate voltage and current source widgets
 		self.gen_voltage_src()		# self.voltage_src
 		self.gen_current_src()		# self.current_src
@@ -148,6 +175,11 @@ class QKeithleyBiasWidget:
 			self.src_select_label.setEnabled(False)
 			self.src_select.setEnabled(False)
 			self.src_pages.setEnabled(False)
+			self.acq_select_label.setEnabled(False)
+			self.acq_select.setEnabled(False)
+
+			# Integer selectors have no unit combobox
+			self.acq_burst.unit_value.setEnabled(False)
 
 		#####################################
 		#  ADD CONTROLS
@@ -156,6 +188,8 @@ class QKeithleyBiasWidget:
 		# Main output and controls
 		self.ctl_layout.addWidget(self._app._gen_hbox_widget([self.src_select, self.src_select_label]))
 		self.ctl_layout.addWidget(self.src_pages)
+		self.ctl_layout.addWidget(self._app._gen_hbox_widget([self.acq_select, self.acq_select_label]))
+		self.ctl_layout.addWidget(self.acq_burst)
 		self.ctl_layout.setContentsMargins(0,0,0,0)
 				
 		# Set layouth
@@ -372,8 +406,9 @@ class QKeithleyBiasWidget:
 		data = self._app._get_data_object()
 		key  = data.add_hash_key(_type)
 
-		# Add key to meta widget
-		self._app.meta_widget.add_meta_key(key)
+		# Add key to meta widget (on GUI thread)
+		self._app.render.push(self._app.meta_widget.add_meta_key, key)
+		self.thread_key = key
 
 		# Add data fields to key
 		data.set_subkeys(key, ["t", "V", "I", "P"])
@@ -381,44 +416,218 @@ class QKeithleyBiasWidget:
 	
 		# Voltage and current arrays	
 		_plot  = self.plot_stack.currentWidget()
-		handle = _plot.add_axes_handle("111", key)
-		start  = time.time()
+		self._app.render.push(_plot.add_axes_handle, "111", key)
 
-		# Thread loop
-		while self.thread_running:
+		# Loop stage tracing
+		_trace = self._app._config.get_trace()
+		_lap   = _trace.clock()
 
-			# Get data from buffer
-			_buffer = self.keithley().meas().split(",")
+		# Measured function and adaptive integration time. In current mode
+		# voltage is plotted, in voltage mode current is plotted.
+		_mode = "VOLT" if self.src_select.currentText() == "Current" else "CURR"
+		_p = 0 if self.src_select.currentText() == "Current" else 1
+		_keithley = self.keithley()
+		_keithley.adapt_reset()
 
-			# If in current mode, plot voltage
-			if self.src_select.currentText() == "Current":
-				_p = _buffer[0]
+		# Parse/store stage. Decodes batches of (time, raw) readings and 
+		# appends them to the data arrays in bulk
+		def __store__(_batch):
 
-				# Measurement delay 
-				if self.current_delay.value() != 0: 
-					time.sleep(self.current_delay.value())
+			_lap = _trace.clock()
+			_time = np.array([ _[0] for _ in _batch ])
+			_buffer = np.vstack([ _keithley.decode(_[1]) for _ in _batch ])
+			_lap = _trace.lap(_type, "parse", _lap)
 
-			# It in voltage mode plot current		
-			if self.src_select.currentText() == "Voltage":
-				_p = _buffer[1]
+			# Append measured values to data arrays
+			data.get_subkey_data(key, "t").extend( _time )
+			data.get_subkey_data(key, "V").extend( _buffer[:, 0] )
+			data.get_subkey_data(key, "I").extend( _buffer[:, 1] )
+			data.get_subkey_data(key, "P").extend( _buffer[:, 0] * _buffer[:, 1] ) 
+			_lap = _trace.lap(_type, "store", _lap)
 
-				# Measurement delay 
-				if self.voltage_delay.value() != 0: 
-					time.sleep(self.voltage_delay.value())
+			# Append data to handle. Plot is drawn on the GUI thread
+			self._app.render.append(_plot, "111", key, _time, _buffer[:, _p])
 
-			# Extract data from buffer
-			_now = float(time.time() - start)
+			# Back-pressure so far
+			_stage.set_metadata(data, key)
 
-			# Append measured values to data arrays
-			data.append_subkey_data(key, "t", _now )
-			data.append_subkey_data(key, "V", float(_buffer[0]) )
-			data.append_subkey_data(key, "I", float(_buffer[1]) )
-			data.append_subkey_data(key, "P", float(_buffer[0]) * float(_buffer[1]) ) 
+		_stage = QKeithleyPipeline(__store__)
+		_stage.start()
+
+		# Sampling clock. Readings are started on a fixed grid of deadlines
+		_delay = self.current_delay if self.src_select.currentText() == "Current" else self.voltage_delay
+		_clock = QKeithleyScheduler(_delay.value(), self.thread_cancel)
+
+		# Thread loop. Only acquires raw readings. If a stage fails, acquisition 
+		# stops and the output is turned off
+		try:
+
+			while self.thread_running:
+
+				# Get raw reading. None if aborted while waiting for reading
+				_raw = _keithley.meas_raw()
+				_lap = _trace.lap(_type, "meas", _lap)
+
+				if _raw is None:
+					break
+
+				# Time of reading
+				_now = _clock.elapsed()
+
+				# Pass reading to parse/store stage (blocks if the stage is behind)
+				_stage.put( (_now, _raw) )
+				_lap = _trace.lap(_type, "queue", _lap)
+
+				# Integration time for next reading. Adaptive integration needs 
+				# the measured value, so the reading is decoded here as well.
+				if _keithley.get_noise_target() is not None:
+					_keithley.adapt_nplc(_mode, _keithley.decode(_raw)[0][_p])
+
+				# Measurement interval. Wait for the next deadline
+				_clock.set_interval(_delay.value())
+				if not _clock.wait():
+					break
+
+				_lap = _trace.lap(_type, "delay", _lap)
+
+			# Wait for the parse/store stage
+			_stage.close()
+
+		except Exception:
+			self._app.render.push(self.exec_output_fail)
+			raise
+
+		finally:
+
+			# Restore integration time
+			_keithley.nplc_restore()
+
+			# Sampling statistics (missed deadlines and jitter) and back-pressure
+			_clock.set_metadata(data, key)
+			_stage.set_metadata(data, key)
+
+
+	# Buffered measurement thread. Readings are acquired by the insturment in 
+	# hardware timed bursts. Each completed burst is fetched from the trace
+	# buffer in a single transfer. The measurement interval is applied by the
+	# insturment as trigger delay between readings.
+	def exec_buffer_thread(self):
+
+		# Check mesurement type for datafile
+		if self.src_select.currentText() == "Voltage":
+			_type, _delay = "v-bias", self.voltage_delay.value()
+
+		if self.src_select.currentText() == "Current":
+			_type, _delay = "i-bias", self.current_delay.value()
+
+		# Get QVisaDataObject
+		data = self._app._get_data_object()
+		key  = data.add_hash_key(_type)
+
+		# Add key to meta widget (on GUI thread)
+		self._app.render.push(self._app.meta_widget.add_meta_key, key)
+		self.thread_key = key
 
-			# Append data to handle
-			_plot.append_handle_data("111", key, _now, float(_p))
-			_plot.update_canvas()
+		# Add data fields to key
+		data.set_subkeys(key, ["t", "V", "I", "P"])
+		data.set_metadata(key, "__type__", _type)
+
+		# Voltage and current arrays	
+		_plot  = self.plot_stack.currentWidget()
+		self._app.render.push(_plot.add_axes_handle, "111", key)
+
+		# Reading element positions
+		_keithley = self.keithley()
+		_v, _i, _t = [ _keithley.element_index(_) for _ in ["VOLT", "CURR", "TIME"] ]
+
+		# Zero timestamps and start time
+		_keithley.reset_timestamp()
+		start, _now = time.time(), 0.0
+
+		# Measured function and adaptive integration time. In current mode
+		# voltage is plotted, in voltage mode current is plotted.
+		_mode = "VOLT" if self.src_select.currentText() == "Current" else "CURR"
+		_p = _v if self.src_select.currentText() == "Current" else _i
+		_keithley.adapt_reset()
+
+		# Loop stage tracing
+		_trace = self._app._config.get_trace()
+		_lap   = _trace.clock()
+
+		# Parse/store stage. Decodes batches of (start, end, raw) bursts and
+		# appends them to the data arrays in bulk
+		def __store__(_batch):
+
+			for _start, _end, _raw in _batch:
+
+				_lap = _trace.clock()
+				_buffer = _keithley.decode(_raw)
+				_lap = _trace.lap(_type, "parse", _lap)
+
+				# Use reading timestamps if enabled. Otherwise distribute burst
+				# readings evenly over the elapsed time of the burst.
+				if _t is not None:
+					_time = _buffer[:, _t]
+
+				else:
+					_time = np.linspace(_start, _end, len(_buffer) + 1)[1:]
+
+				# Append measured values to data arrays
+				data.get_subkey_data(key, "t").extend( _time )
+				data.get_subkey_data(key, "V").extend( _buffer[:, _v] )
+				data.get_subkey_data(key, "I").extend( _buffer[:, _i] )
+				data.get_subkey_data(key, "P").extend( _buffer[:, _v] * _buffer[:, _i] )
+				_lap = _trace.lap(_type, "store", _lap)
+
+				# Append data to handle. Plot is drawn on the GUI thread
+				self._app.render.append(_plot, "111", key, _time, _buffer[:, _p])
+
+			# Back-pressure so far
+			_stage.set_metadata(data, key)
 
+		_stage = QKeithleyPipeline(__store__)
+		_stage.start()
+
+		# Thread loop. Only acquires raw bursts. If a stage fails, acquisition 
+		# stops and the output is turned off
+		try:
+
+			while self.thread_running:
+
+				# Arm burst and fetch trace buffer
+				_keithley.trace_arm(self.acq_burst.value(), _delay)
+				_raw = _keithley.trace_fetch_raw()
+				_lap = _trace.lap(_type, "meas", _lap)
+
+				if _raw is None:
+					break
+
+				# Pass burst to parse/store stage (blocks if the stage is behind)
+				_end = float(time.time() - start)
+				_stage.put( (_now, _end, _raw) )
+				_now = _end
+				_lap = _trace.lap(_type, "queue", _lap)
+
+				# Integration time for next burst. Adaptive integration needs the
+				# measured values, so the burst is decoded here as well.
+				if _keithley.get_noise_target() is not None:
+					_keithley.adapt_nplc(_mode, np.mean(_keithley.decode(_raw)[:, _p]))
+
+			# Wait for the parse/store stage
+			_stage.close()
+
+		except Exception:
+			self._app.render.push(self.exec_output_fail)
+			raise
+
+		finally:
+
+			# Disable trace buffer and restore integration time
+			_keithley.trace_clear()
+			_keithley.nplc_restore()
+
+			# Back-pressure
+			_stage.set_metadata(data, key)
 
 	# UI output on state (measurement)
 	def exec_output_on(self):
@@ -431,6 +640,8 @@ class QKeithleyBiasWidget:
 			
 			# Disable controls
 			self.src_select.setEnabled(False)
+			self.acq_select.setEnabled(False)
+			self.acq_burst.unit_value.setEnabled(False)
 			self.voltage_cmpl.setEnabled(False)
 			self.current_cmpl.setEnabled(False)
 			_plot = self.plot_stack.currentWidget()
@@ -440,15 +651,32 @@ class QKeithleyBiasWidget:
 			if hasattr(self._app, 'save_widget'):
 				self._app.save_widget.setEnabled(False)
 
-			# Turn output ON
+			# Program reading elements and turn output ON. Waits for readings
+			# are cancelled when the output is turned off.
+			self._app._config.rewind_replay([self._name])
+			self._app._config.update_elements(self._name, self._app._get_app_metadata("__elements__"))
+			self.thread_cancel.reset()
+			self.thread_key = None
+			self.keithley().set_cancel(self.thread_cancel)
 			self.keithley().output_on()
 
 			# Each output is a list [QPushButton, QStateMachine, thrading.Thread, threadRunning(bool)]
 			# Create execution thread for measurement
-			self.thread = threading.Thread(target=self.exec_output_thread, args=())
+			if self.acq_select.currentText() == "Buffered":
+				self.thread = threading.Thread(target=self.exec_buffer_thread, args=())
+
+			else:
+				self.thread = threading.Thread(target=self.exec_output_thread, args=())
 			self.thread.daemon = True		# Daemonize thread
-			self.thread.start()			# Start the execution
 			self.thread_running = True
+			self.thread.start()			# Start the execution
+
+	# Turn output off after the measurement thread failed (GUI thread). The
+	# output may already have been turned off by the user.
+	def exec_output_fail(self):
+
+		if self.thread_running:
+			self.output_widget[0].click()
 
 	# UI output on state
 	def exec_output_off(self):
@@ -459,15 +687,21 @@ class QKeithleyBiasWidget:
 			self.output_widget[0].setStyleSheet(
 				"background-color: #dddddd; border-style: solid; border-width: 1px; border-color: #aaaaaa; padding: 7px;" )			
 
-			# Set thread halt boolean
+			# Cancel waits and set thread halt boolean
+			self.thread_cancel.cancel()
 			self.thread_running = False
 
 			# Wait for thread termination
 			if self.thread is not None:
 				self.thread.join()
+
+			# Draw remaining samples
+			self._app.render.drain()
 	
 			# Enable controls
 			self.src_select.setEnabled(True)
+			self.acq_select.setEnabled(True)
+			self.acq_burst.unit_value.setEnabled(True)
 			self.voltage_cmpl.setEnabled(True)
 			self.current_cmpl.setEnabled(True)
 			_plot = self.plot_stack.currentWidget()
@@ -480,3 +714,7 @@ class QKeithleyBiasWidget:
 
 			# Turn output OFF
 			self.keithley().output_off()
+
+			# Abort latency (output off after cancel)
+			if self.thread_key is not None:
+				self.thread_cancel.set_metadata(self._app._get_data_object(), self.thread_key)
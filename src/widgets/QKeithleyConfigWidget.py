@@ -27,7 +27,7 @@
 #!/usr/bin/env python 
 
 # Import QT backends
-from PyQt5.QtWidgets import QWidget, QMessageBox, QVBoxLayout, QHBoxLayout, QComboBox, QPushButton, QLabel, QStackedWidget, QDoubleSpinBox
+from PyQt5.QtWidgets import QWidget, QMessageBox, QVBoxLayout, QHBoxLayout, QComboBox, QPushButton, QLabel, QStackedWidget, QDoubleSpinBox, QSpinBox, QCheckBox, QLineEdit
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QIcon
 
@@ -71,6 +71,88 @@ class QKeithleyConfigWidget(QWidget):
 		self.config_nplc.setMaximum(10.0)
 		self.config_nplc.setSingleStep(0.01)
 		self.config_nplc.setValue(1.00)
+		self.config_nplc.valueChanged.connect(self.update_rate)
+
+		# Adaptive integration. Applications choose the smallest integration 
+		# time meeting the relative noise target for each decade of the 
+		# measured value. Noise is characterized at the operating point.
+		self.config_adapt_label = QLabel("Integration Mode")
+		self.config_adapt = QComboBox()
+		self.config_adapt.addItems(["Fixed", "Adaptive"])
+
+		self.config_noise_label = QLabel("Noise Target (%)")
+		self.config_noise = QDoubleSpinBox()
+		self.config_noise.setDecimals(4)
+		self.config_noise.setMinimum(0.0001)
+		self.config_noise.setMaximum(10.0)
+		self.config_noise.setSingleStep(0.001)
+		self.config_noise.setValue(0.01)
+
+		# Throughput profile. Selecting a profile fills in the speed related
+		# settings below, which can then be adjusted and saved as a new profile.
+		self.profile_label = QLabel("<b>Throughput Profile</b>")
+		self.profile = QComboBox()
+		self.profile.addItems(self._app.get_profiles().get_names())
+		self.profile.currentTextChanged.connect(self.update_profile)
+
+		# Auto zero and front panel display
+		self.config_azer_label = QLabel("Auto Zero")
+		self.config_azer = QComboBox()
+		self.config_azer.addItems(["ON", "OFF", "ONCE"])
+		self.config_azer.currentTextChanged.connect(self.update_rate)
+
+		self.config_display = QCheckBox("Front Panel Display")
+		self.config_display.stateChanged.connect(self.update_rate)
+
+		# Measure range. Fixed range holds the range set by the compliance level
+		self.config_range_label = QLabel("Measure Range")
+		self.config_range = QComboBox()
+		self.config_range.addItems(["Auto", "Fixed"])
+		self.config_range.currentTextChanged.connect(self.update_rate)
+
+		# Source delay (minimum value selects auto delay)
+		self.config_delay_label = QLabel("Source Delay (s)")
+		self.config_delay = QDoubleSpinBox()
+		self.config_delay.setDecimals(3)
+		self.config_delay.setMinimum(-0.001)
+		self.config_delay.setMaximum(10.0)
+		self.config_delay.setSingleStep(0.001)
+		self.config_delay.setSpecialValueText("Auto")
+		self.config_delay.valueChanged.connect(self.update_rate)
+
+		# Repeat average filter count (0 = off)
+		self.config_filter_label = QLabel("Filter Count")
+		self.config_filter = QSpinBox()
+		self.config_filter.setMinimum(0)
+		self.config_filter.setMaximum(100)
+		self.config_filter.valueChanged.connect(self.update_rate)
+
+		# Expected reading rate
+		self.config_rate = QLabel("")
+
+		# Save custom profile
+		self.profile_name = QLineEdit()
+		self.profile_name.setPlaceholderText("Profile Name")
+		self.profile_save = QPushButton("Save Profile")
+		self.profile_save.clicked.connect(self.save_profile)
+
+		# Reading transfer format. Binary transfers readings as single 
+		# precision floats and is only available on GPIB devices
+		self.data_format_label = QLabel("<b>Data Format</b>")
+		self.data_format = QComboBox()
+		self.data_format.addItems(["ASCII", "Binary"])
+
+		# Optional reading elements. Voltage and current are always requested 
+		# by applications. Timestamp and status are only requested if enabled
+		self.data_elements_label = QLabel("<b>Reading Elements</b>")
+		self.data_elements_time = QCheckBox("Timestamp")
+		self.data_elements_stat = QCheckBox("Status")
+
+		# Reading completion. In service request mode, threads poll the status
+		# byte for operation complete instead of waiting in a bus read.
+		self.completion_label = QLabel("<b>Reading Completion</b>")
+		self.completion = QComboBox()
+		self.completion.addItems(["Blocking", "Service Request"])
 
 		# Update button
 		self.inst_update = QPushButton("Update Configuration")
@@ -85,11 +167,117 @@ class QKeithleyConfigWidget(QWidget):
 		self.layout.addWidget(self.config_nplc_label)
 		self.layout.addWidget(self.config_nplc_note)
 		self.layout.addWidget(self.config_nplc)
+		self.layout.addWidget(self._app._gen_hbox_widget([
+			self._app._gen_vbox_widget([self.config_adapt_label, self.config_adapt]),
+			self._app._gen_vbox_widget([self.config_noise_label, self.config_noise])
+		]))
+		self.layout.addWidget(self.profile_label)
+		self.layout.addWidget(self.profile)
+		self.layout.addWidget(self._app._gen_hbox_widget([
+			self._app._gen_vbox_widget([self.config_azer_label, self.config_azer]),
+			self._app._gen_vbox_widget([self.config_range_label, self.config_range]),
+			self._app._gen_vbox_widget([self.config_delay_label, self.config_delay]),
+			self._app._gen_vbox_widget([self.config_filter_label, self.config_filter])
+		]))
+		self.layout.addWidget(self._app._gen_hbox_widget([self.config_display, self.config_rate]))
+		self.layout.addWidget(self._app._gen_hbox_widget([self.profile_name, self.profile_save]))
+		self.layout.addWidget(self.data_format_label)
+		self.layout.addWidget(self.data_format)
+		self.layout.addWidget(self.data_elements_label)
+		self.layout.addWidget(self._app._gen_hbox_widget([self.data_elements_time, self.data_elements_stat]))
+		self.layout.addWidget(self.completion_label)
+		self.layout.addWidget(self.completion)
 		self.layout.addWidget(self.inst_update)
 
 		# Set layout
 		self.setLayout(self.layout)
 
+		# Fill in settings from the default profile
+		self.update_profile()
+
+	# Get optional reading elements
+	def get_elements(self):
+
+		_elements = []
+
+		if self.data_elements_time.isChecked():
+			_elements.append("TIME")
+
+		if self.data_elements_stat.isChecked():
+			_elements.append("STAT")
+
+		return _elements
+
+	# Get throughput profile from controls
+	def get_profile(self):
+
+		return {
+			"nplc" 		: self.config_nplc.value(),
+			"azer" 		: self.config_azer.currentText(),
+			"display" 	: "ON" if self.config_display.isChecked() else "OFF",
+			"range" 	: self.config_range.currentText().upper(),
+			"delay" 	: "AUTO" if self.config_delay.value() < 0.0 else self.config_delay.value(),
+			"filter" 	: self.config_filter.value()
+		}
+
+	# Callback for profile selection
+	def update_profile(self):
+
+		_profile = self._app.get_profiles().get_profile(self.profile.currentText())
+		if _profile is None:
+			return
+
+		self.config_nplc.setValue(float(_profile["nplc"]))
+		self.config_azer.setCurrentText(_profile["azer"])
+		self.config_display.setChecked(_profile["display"] == "ON")
+		self.config_range.setCurrentText(_profile["range"].capitalize())
+		self.config_delay.setValue(-0.001 if _profile["delay"] == "AUTO" else float(_profile["delay"]))
+		self.config_filter.setValue(int(_profile["filter"]))
+		self.update_rate()
+
+	# Show expected readings/second for the current settings
+	def update_rate(self):
+
+		Device = self._app.get_device_by_name(self.name)
+		if Device is not None:
+			self.config_rate.setText("<i>~%.3g readings/s</i>"%Device.estimate_rate(self.get_profile()))
+
+	# Reload profile names (after a profile is saved on any page)
+	def update_profile_names(self):
+
+		_name = self.profile.currentText()
+
+		self.profile.blockSignals(True)
+		self.profile.clear()
+		self.profile.addItems(self._app.get_profiles().get_names())
+		self.profile.setCurrentText(_name)
+		self.profile.blockSignals(False)
+
+	# Save current settings as a custom profile
+	def save_profile(self):
+
+		_name = self.profile_name.text().strip()
+
+		msg = QMessageBox()
+		msg.setWindowTitle("QKeithleyControl")
+		msg.setWindowIcon(self._app._icon)
+		msg.setStandardButtons(QMessageBox.Ok)
+
+		try:
+			if _name == "":
+				raise ValueError("Enter a profile name")
+
+			self._app.get_profiles().save_profile(_name, self.get_profile())
+
+		except ( ValueError, OSError ) as e:
+			msg.setIcon(QMessageBox.Warning)
+			msg.setText(str(e))
+			msg.exec_()
+			return
+
+		self._app.update_profile_names()
+		self.profile.setCurrentText(_name)
+
 	# Callback for sense mode
 	def update_config(self):
 
@@ -110,8 +298,29 @@ class QKeithleyConfigWidget(QWidget):
 			if self.output_route.currentText() == "Rear":
 				self._app.get_device_by_name(self.name).output_route_rear()
 
-			# Update integration time
-			self._app.get_device_by_name(self.name).update_nplc(self.config_nplc.value())
+			# Update integration time and speed related settings
+			self._app.get_device_by_name(self.name).apply_profile(self.get_profile())
+
+			# Update adaptive integration
+			if self.config_adapt.currentText() == "Fixed":
+				self._app.get_device_by_name(self.name).set_noise_target(None)
+
+			if self.config_adapt.currentText() == "Adaptive":
+				self._app.get_device_by_name(self.name).set_noise_target(self.config_noise.value() / 100.0)
+
+			# Update reading transfer format
+			if self.data_format.currentText() == "ASCII":
+				self._app.get_device_by_name(self.name).data_format("ASCII")
+
+			if self.data_format.currentText() == "Binary":
+				self._app.get_device_by_name(self.name).data_format("REAL32")
+
+			# Update reading completion
+			if self.completion.currentText() == "Blocking":
+				self._app.get_device_by_name(self.name).set_completion("BLOCK")
+
+			if self.completion.currentText() == "Service Request":
+				self._app.get_device_by_name(self.name).set_completion("SRQ")
 
 		# Message box to indicate successful update
 		msg = QMessageBox()
@@ -0,0 +1,170 @@
+# ---------------------------------------------------------------------------------
+# 	QKeithleyTraceWidget -> QWidget
+#	Copyright (C) 2019 Michael Winters
+#	github: https://github.com/mesoic
+#	email:  mesoic@protonmail.com
+# ---------------------------------------------------------------------------------
+# 
+# 	Permission is hereby granted, free of charge, to any person obtaining a copy
+# 	of this software and associated documentation files (the "Software"), to deal
+# 	in the Software without restriction, including without limitation the rights
+# 	to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# 	copies of the Software, and to permit persons to whom the Software is
+# 	furnished to do so, subject to the following conditions:
+# 	
+# 	The above copyright notice and this permission notice shall be included in all
+# 	copies or substantial portions of the Software.
+# 	
+# 	THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# 	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# 	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# 	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# 	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# 	OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# 	SOFTWARE.
+#
+
+#!/usr/bin/env python 
+import numpy as np
+
+# Import QT backends
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QPlainTextEdit, QFileDialog
+from PyQt5.QtGui import QIcon, QFont
+
+# Import matplotlibQT backends
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+# Viewer for QKeithleyTrace records. Shows bus latency histograms for the 
+# most expensive commands, the loop stage breakdown of each application and 
+# summary tables. Note that _trace is a QKeithleyTrace object.
+class QKeithleyTraceWidget(QWidget):
+
+	def __init__(self, _trace, _icon=None):
+
+		# Extends QWidget
+		QWidget.__init__(self)
+
+		# Cache trace object
+		self._trace = _trace
+
+		# Number of commands to show in histogram
+		self._ncommands = 8
+
+		# Generate main layout
+		self.gen_main_layout()
+		self.setWindowTitle("VISA Trace")
+		self.setWindowIcon(_icon if _icon is not None else QIcon())
+		self.resize(900, 700)
+
+	def gen_main_layout(self):
+
+		self.layout = QVBoxLayout()
+
+		# Histogram and stage axes
+		self.figure = Figure()
+		self.canvas = FigureCanvas(self.figure)
+		self.hist_axes  = self.figure.add_subplot(121)
+		self.stage_axes = self.figure.add_subplot(122)
+
+		# Summary tables
+		self.summary = QPlainTextEdit()
+		self.summary.setReadOnly(True)
+		self.summary.setFont(QFont("Monospace", 9))
+
+		# Control buttons
+		self.refresh_button = QPushButton("Refresh")
+		self.refresh_button.clicked.connect(self.refresh)
+
+		self.export_button = QPushButton("Export Trace")
+		self.export_button.clicked.connect(self.export)
+
+		self.clear_button = QPushButton("Clear Trace")
+		self.clear_button.clicked.connect(self.clear)
+
+		_buttons = QHBoxLayout()
+		_buttons.addWidget(self.refresh_button)
+		_buttons.addWidget(self.export_button)
+		_buttons.addWidget(self.clear_button)
+		_buttons.addStretch(1)
+
+		self.layout.addLayout(_buttons)
+		self.layout.addWidget(self.canvas, 2)
+		self.layout.addWidget(self.summary, 1)
+		self.setLayout(self.layout)
+
+	# Redraw histograms and tables from trace records
+	def refresh(self):
+
+		_commands = self._trace.command_stats()
+		_stages = self._trace.stage_stats()
+
+		# Latency histograms for commands with largest total time
+		self.hist_axes.clear()
+		_rows = self._trace.summarize(_commands)[:self._ncommands]
+		for _row in _rows:
+			self.hist_axes.hist(_commands[_row[0]], bins=self._trace.histogram_bins(), histtype="step", label=_row[0])
+
+		self.hist_axes.set_xscale("log")
+		self.hist_axes.set_xlabel("Latency (s)")
+		self.hist_axes.set_ylabel("Count")
+		self.hist_axes.set_title("Bus Latency")
+		if _rows != []:
+			self.hist_axes.legend(fontsize=7)
+
+		# Stage breakdown. One stacked bar per application
+		self.stage_axes.clear()
+		_apps = list( dict.fromkeys( [ _app for _app, _stage in _stages.keys() ] ) )
+		_left = np.zeros(len(_apps))
+		for _stage in dict.fromkeys( [ _stage for _app, _stage in _stages.keys() ] ):
+
+			_total = np.array([ np.sum( _stages.get( (_app, _stage), [] ) ) for _app in _apps ])
+			self.stage_axes.barh(_apps, _total, left=_left, label=_stage)
+			_left += _total
+
+		self.stage_axes.set_xlabel("Total Time (s)")
+		self.stage_axes.set_title("Loop Stages")
+		if _apps != []:
+			self.stage_axes.legend(fontsize=7)
+
+		self.figure.tight_layout()
+		self.canvas.draw()
+
+		# Summary tables
+		_bytes = self._trace.command_bytes()
+		_text = "%-40s %8s %10s %10s %10s %10s %10s\n"%("Command", "Count", "Bytes", "Total(s)", "Mean(s)", "P95(s)", "Max(s)")
+		for _row in self._trace.summarize(_commands):
+			_text += "%-40s %8d %10d %10.4f %10.2e %10.2e %10.2e\n"%(_row[0][:40], _row[1], _bytes.get(_row[0], 0), _row[2], _row[3], _row[5], _row[6])
+
+		_text += "\n%-40s %8s %10s %10s %10s %10s %10s\n"%("Stage", "Count", "", "Total(s)", "Mean(s)", "P95(s)", "Max(s)")
+		for _row in self._trace.summarize(_stages):
+			_text += "%-40s %8d %10s %10.4f %10.2e %10.2e %10.2e\n"%(_row[0][:40], _row[1], "", _row[2], _row[3], _row[5], _row[6])
+
+		self.summary.setPlainText(_text)
+
+	# Export trace to file
+	def export(self):
+
+		dialog = QFileDialog(self)
+		dialog.setFileMode(QFileDialog.AnyFile)
+		dialog.setViewMode(QFileDialog.Detail)
+		dialog.setAcceptMode(QFileDialog.AcceptSave)
+		filenames = []
+
+		# Select file
+		if dialog.exec_():
+			filenames = dialog.selectedFiles()
+
+		# Check if filenames is not empty 
+		if filenames != []:
+			self._trace.write_to_file(filenames[0])
+
+	# Clear trace records
+	def clear(self):
+		self._trace.clear()
+		self.refresh()
+
+	# Refresh on show
+	def showEvent(self, _event):
+		self.refresh()
+		QWidget.showEvent(self, _event)